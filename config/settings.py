@@ -136,3 +136,102 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 import dj_database_url
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
+
+# Search
+# Number of threads used to query glossaries and translations concurrently
+SEARCH_MAX_WORKERS = env.int("SEARCH_MAX_WORKERS", default=4)
+# Maximum number of (top ranked) results shown for a search
+SEARCH_RESULTS_LIMIT = env.int("SEARCH_RESULTS_LIMIT", default=500)
+# Also match katakana and hiragana forms of the same word (e.g. "カタカナ" and "かたかな").
+# Run "manage.py normalise_search_text" after changing this setting.
+SEARCH_FOLD_KANA = env.bool("SEARCH_FOLD_KANA", default=False)
+# Limits of regular expression and wildcard searches: the number of entries and segments
+# the pattern is applied to, the time after which the search stops (in seconds), and the
+# length above which a source or target is not searched (in characters)
+SEARCH_PATTERN_MAX_CANDIDATES = env.int("SEARCH_PATTERN_MAX_CANDIDATES", default=50000)
+SEARCH_PATTERN_TIMEOUT = env.float("SEARCH_PATTERN_TIMEOUT", default=3.0)
+SEARCH_PATTERN_MAX_TEXT_LENGTH = env.int("SEARCH_PATTERN_MAX_TEXT_LENGTH", default=5000)
+# Number of processes running search patterns, reused by successive searches (per web process)
+SEARCH_PATTERN_WORKERS = env.int("SEARCH_PATTERN_WORKERS", default=4)
+# Number of characters shown on each side of a match in the concordance view of search results
+CONCORDANCE_WIDTH = env.int("CONCORDANCE_WIDTH", default=40)
+# Search logs for the search analytics page: whether searches are recorded, the number of logs
+# saved at once, the time after which queued logs are saved (in seconds), the number of logs
+# which can be waiting to be saved before further logs are dropped, and the number of days
+# after which logs are deleted by "manage.py purge_search_logs"
+SEARCH_LOG_ENABLED = env.bool("SEARCH_LOG_ENABLED", default=True)
+SEARCH_LOG_BATCH_SIZE = env.int("SEARCH_LOG_BATCH_SIZE", default=200)
+SEARCH_LOG_FLUSH_INTERVAL = env.float("SEARCH_LOG_FLUSH_INTERVAL", default=5.0)
+SEARCH_LOG_MAX_QUEUED = env.int("SEARCH_LOG_MAX_QUEUED", default=10000)
+SEARCH_LOG_RETENTION_DAYS = env.int("SEARCH_LOG_RETENTION_DAYS", default=90)
+# Precomputed results of frequent searches (see "manage.py warm_search_cache"): whether they are
+# used, the number of hours after which they are no longer used, the number of days of search
+# logs used to find the frequent searches, the number of searches cached per resource, and the
+# number of entries changed at once above which all cached searches of a glossary are refreshed
+SEARCH_CACHE_ENABLED = env.bool("SEARCH_CACHE_ENABLED", default=True)
+SEARCH_CACHE_MAX_AGE = env.int("SEARCH_CACHE_MAX_AGE", default=24)
+SEARCH_CACHE_DAYS = env.int("SEARCH_CACHE_DAYS", default=7)
+SEARCH_CACHE_QUERIES = env.int("SEARCH_CACHE_QUERIES", default=1000)
+SEARCH_CACHE_MAX_TEXTS = env.int("SEARCH_CACHE_MAX_TEXTS", default=1000)
+# How often (in seconds) the in-memory autocomplete index is checked for changes
+AUTOCOMPLETE_REFRESH_SECONDS = env.int("AUTOCOMPLETE_REFRESH_SECONDS", default=60)
+
+# Background tasks
+# Number of threads used for background tasks such as deleting large resources
+BACKGROUND_TASK_WORKERS = env.int("BACKGROUND_TASK_WORKERS", default=2)
+# Number of entries or segments deleted per transaction when deleting a resource
+DELETE_BATCH_SIZE = env.int("DELETE_BATCH_SIZE", default=5000)
+
+# Imports
+# Number of rows written per query when importing glossaries and translations
+IMPORT_BATCH_SIZE = env.int("IMPORT_BATCH_SIZE", default=2000)
+# Maximum number of rejected lines listed in the report shown after an import
+IMPORT_MAX_REPORTED_REJECTIONS = env.int("IMPORT_MAX_REPORTED_REJECTIONS", default=1000)
+# Imports of zip archives still unfinished this many hours after the upload are finished
+# by "manage.py resume_import_jobs"
+IMPORT_JOB_EXPIRY_HOURS = env.int("IMPORT_JOB_EXPIRY_HOURS", default=24)
+# Languages written to TBX files exported from glossaries
+GLOSSARY_SOURCE_LANGUAGE = env.str("GLOSSARY_SOURCE_LANGUAGE", default="ja")
+GLOSSARY_TARGET_LANGUAGE = env.str("GLOSSARY_TARGET_LANGUAGE", default="en")
+# Languages written to TMX files exported from translations
+TRANSLATION_SOURCE_LANGUAGE = env.str("TRANSLATION_SOURCE_LANGUAGE", default="ja")
+TRANSLATION_TARGET_LANGUAGE = env.str("TRANSLATION_TARGET_LANGUAGE", default="en")
+
+# Chunked uploads of large translation files
+# Files larger than this (in bytes) are uploaded in chunks by the translation upload page
+CHUNKED_UPLOAD_THRESHOLD = env.int("CHUNKED_UPLOAD_THRESHOLD", default=20 * 1024 * 1024)
+# Maximum size of each chunk
+CHUNKED_UPLOAD_CHUNK_SIZE = env.int("CHUNKED_UPLOAD_CHUNK_SIZE", default=8 * 1024 * 1024)
+# Maximum size of a file uploaded in chunks
+CHUNKED_UPLOAD_MAX_SIZE = env.int("CHUNKED_UPLOAD_MAX_SIZE", default=20 * 1024 * 1024 * 1024)
+# Unfinished chunked uploads are deleted after this many hours without a new chunk
+CHUNKED_UPLOAD_EXPIRY_HOURS = env.int("CHUNKED_UPLOAD_EXPIRY_HOURS", default=24)
+# Chunked uploads still being imported after this many hours (e.g. because the server was
+# restarted during the import) are marked as failed
+CHUNKED_UPLOAD_IMPORT_EXPIRY_HOURS = env.int("CHUNKED_UPLOAD_IMPORT_EXPIRY_HOURS", default=72)
+
+# Segment storage
+# "rows" stores imported segments as Segment rows; "compressed" stores them as compressed blocks
+SEGMENT_STORAGE = env.str("SEGMENT_STORAGE", default="rows")
+# Number of segments per compressed block
+SEGMENT_BLOCK_SIZE = env.int("SEGMENT_BLOCK_SIZE", default=1000)
+# Django storage class (e.g. "storages.backends.s3boto3.S3Boto3Storage") keeping the read-only
+# archive files of archived translations. Archiving deletes the segments from the database, so
+# this must be durable and shared by all servers; translations cannot be archived until it is set
+SEGMENT_ARCHIVE_STORAGE = env.str("SEGMENT_ARCHIVE_STORAGE", default="")
+# Folder into which each server copies the archive files it reads
+SEGMENT_ARCHIVE_ROOT = env.str("SEGMENT_ARCHIVE_ROOT", default=os.path.join(BASE_DIR, "segment_archives"))
+
+# Term checks
+# Maximum number of issues saved by a term check (all issues are counted)
+TERM_CHECK_MAX_ISSUES = env.int("TERM_CHECK_MAX_ISSUES", default=10000)
+
+# Term extraction (needs the spacy and numpy packages, and the spaCy models below)
+TERM_EXTRACTION_SOURCE_MODEL = env.str("TERM_EXTRACTION_SOURCE_MODEL", default="ja_core_news_sm")
+TERM_EXTRACTION_TARGET_MODEL = env.str("TERM_EXTRACTION_TARGET_MODEL", default="en_core_web_sm")
+# Number of processes parsing segments
+TERM_EXTRACTION_PROCESSES = env.int("TERM_EXTRACTION_PROCESSES", default=1)
+
+# Duplicate reports
+# Minimum similarity (Jaccard similarity of character pairs, 0-1) of near-duplicate source terms
+DUPLICATE_SIMILARITY = env.float("DUPLICATE_SIMILARITY", default=0.7)
@@ -0,0 +1,129 @@
+"""
+In-memory prefix index used for search-as-you-type completions.
+
+All glossary source and target terms are held in sorted lists of (folded term, term)
+pairs, one list per term length, so the completions for a prefix (shortest terms first)
+are found with a binary search in each list followed by a short forward scan.
+The index is rebuilt when glossary entries have changed since it was built, which is
+checked at most once every AUTOCOMPLETE_REFRESH_SECONDS. The check and the rebuild run
+in a background thread, and requests are answered from the previous index meanwhile, so
+only the first request of a process waits for the index to be built.
+"""
+import logging
+import time
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Count, Max
+
+from .models import Entry
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrefixIndex:
+
+    def __init__(self, terms=()):
+        by_length = defaultdict(set)
+        for term in terms:
+            if term:
+                by_length[len(term)].add((term.casefold(), term))
+        self.groups = [sorted(by_length[length]) for length in sorted(by_length)]
+
+    def complete(self, prefix, limit=10):
+        """ Returns up to limit terms starting with prefix, shortest terms first. """
+        prefix = prefix.casefold()
+        if not prefix:
+            return []
+        matches = []
+        seen = set()
+        # Terms of the same length are in alphabetical order
+        for keys in self.groups:
+            i = bisect_left(keys, (prefix,))
+            while i < len(keys) and keys[i][0].startswith(prefix):
+                key, term = keys[i]
+                if key not in seen:
+                    seen.add(key)
+                    matches.append(term)
+                    if len(matches) == limit:
+                        return matches
+                i += 1
+        return matches
+
+
+_index = None
+_index_stamp = None
+_last_checked = 0
+_refreshing = False
+# Protects the variables above
+_lock = threading.Lock()
+# Held while the first index of the process is built
+_build_lock = threading.Lock()
+
+
+def _current_stamp():
+    """ Cheap summary of the Entry table used to decide if the index is stale. """
+    return Entry.objects.exclude(glossary__is_deleting=True).aggregate(
+        count=Count("id"),
+        last_updated=Max("updated_on"),
+    )
+
+
+def _build_index():
+    """ Builds a prefix index of the current glossary entries. Returns (index, stamp). """
+    stamp = _current_stamp()
+    terms = []
+    entries = Entry.objects.exclude(glossary__is_deleting=True)
+    for source, target in entries.values_list("source", "target").iterator():
+        terms.append(source)
+        terms.append(target)
+    return PrefixIndex(terms), stamp
+
+
+def _refresh_index():
+    """ Rebuilds the index if entries have changed since it was built. Run in a background thread. """
+    global _index, _index_stamp, _refreshing
+    try:
+        if _current_stamp() != _index_stamp:
+            index, stamp = _build_index()
+            with _lock:
+                _index, _index_stamp = index, stamp
+    except Exception:
+        logger.exception("Could not rebuild the autocomplete index")
+    finally:
+        with _lock:
+            _refreshing = False
+        connections.close_all()
+
+
+def get_prefix_index():
+    """
+    Returns the prefix index for this process, building it on first use, and starts
+    a rebuild in the background if it is due to be checked for changes.
+    """
+    global _index, _index_stamp, _last_checked, _refreshing
+
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                index, stamp = _build_index()
+                with _lock:
+                    _index, _index_stamp = index, stamp
+                    _last_checked = time.monotonic()
+        return _index
+
+    refresh_seconds = getattr(settings, "AUTOCOMPLETE_REFRESH_SECONDS", 60)
+    with _lock:
+        now = time.monotonic()
+        refresh = not _refreshing and now - _last_checked > refresh_seconds
+        if refresh:
+            _last_checked = now
+            _refreshing = True
+        index = _index
+    if refresh:
+        threading.Thread(target=_refresh_index, name="autocomplete-index", daemon=True).start()
+    return index
@@ -0,0 +1,175 @@
+"""
+Concordance (keyword in context) display of search results.
+
+Instead of whole segments, each hit shows a window of text around the first match of the
+query in the source or target, with the matching part of the other side alongside it. For
+Segment rows, the windows are cut out in the database with StrIndex and Substr, and the full
+source and target are never fetched. The size of the results therefore depends on the width
+of the window rather than on the length of the segments.
+
+The query is located in the normalised columns (see text.normalise_text). Normalisation
+rarely changes the length of a text, and when it does not, the same position is used in the
+original text. When it does (e.g. half-width "ｶﾞ" becomes "ガ"), positions in the normalised
+column do not match those in the text, so the whole text is fetched instead and the window
+is cut out of it with the positions mapped back (see text.normalised_positions).
+The side not containing the query is aligned by position: the window is taken at the same
+relative position in it (e.g. a match 40% of the way through the source shows the target
+around 40% of the way through).
+"""
+from bisect import bisect_right
+
+from django.db.models import Case, F, IntegerField, TextField, Value, When
+from django.db.models.functions import Greatest, Length, StrIndex, Substr
+
+from .text import normalise_text, normalised_positions
+
+
+def _aligned_position(position, length, other_position, other_length):
+    """ Position of the window in a text: that of its match, or the aligned position of the other side's match. """
+    return Case(
+        When(**{f"{position}__gt": 0}, then=F(position)),
+        default=F(other_position) * F(length) / Greatest(F(other_length), Value(1)),
+        output_field=IntegerField(),
+    )
+
+
+def _window(field, start, span):
+    """ The window of a text, or the whole text if normalisation changes its length. """
+    return Case(
+        When(**{f"{field}_length": F(f"{field}_norm_length")}, then=Substr(field, F(start), span)),
+        default=F(field),
+        output_field=TextField(),
+    )
+
+
+def concordance_queryset(queryset, query, width):
+    """
+    Annotates a queryset of segments with the windows of width characters on each side of the
+    first match of query (kwic_source and kwic_target), their start positions and the lengths
+    of the texts, and defers the full text fields.
+    """
+    query = normalise_text(query)
+    span = len(query) + 2 * width
+    queryset = queryset.annotate(
+        source_position=StrIndex("source_norm", Value(query)),
+        target_position=StrIndex("target_norm", Value(query)),
+        source_length=Length("source"),
+        target_length=Length("target"),
+        source_norm_length=Length("source_norm"),
+        target_norm_length=Length("target_norm"),
+    )
+    queryset = queryset.annotate(
+        source_start=Greatest(
+            _aligned_position("source_position", "source_length", "target_position", "target_length") - width,
+            Value(1),
+        ),
+        target_start=Greatest(
+            _aligned_position("target_position", "target_length", "source_position", "source_length") - width,
+            Value(1),
+        ),
+    )
+    return queryset.annotate(
+        kwic_source=_window("source", "source_start", span),
+        kwic_target=_window("target", "target_start", span),
+    ).defer("source", "target", "source_norm", "target_norm")
+
+
+def _find(text, query):
+    """
+    Returns the start and end of the first match of a normalised query in text, compared
+    after normalisation, or None if it is not found.
+    """
+    normalised, starts, ends = normalised_positions(text)
+    start = normalised.find(query)
+    if start < 0 or not query:
+        return None
+    return starts[start], ends[start + len(query) - 1]
+
+
+class ConcordanceSide:
+    """
+    The window of one side of a hit, split into the text before, of and after the match.
+    A side not containing the query is split at its aligned position instead.
+    """
+    def __init__(self, snippet, query, starts_text, ends_text, centre=0):
+        self.starts_text = starts_text
+        self.ends_text = ends_text
+        match = _find(snippet, query)
+        if match is None:
+            match = (centre, centre)
+        self.before, self.match, self.after = snippet[:match[0]], snippet[match[0]:match[1]], snippet[match[1]:]
+
+
+def _aligned(position, length, other_position, other_length):
+    """ Python version of _aligned_position(). """
+    return position or other_position * length // max(other_length, 1)
+
+
+def _chunk_start(mapping, position):
+    """ Moves a position (from 1) back to the start of the characters normalised together that it is in. """
+    _, starts, ends = mapping
+    i = bisect_right(ends, position - 1)
+    return min(position, starts[i] + 1) if i < len(starts) else position
+
+
+def _chunk_end(mapping, end):
+    """ Moves the end of a slice forward to the end of the characters normalised together that it cuts. """
+    _, starts, ends = mapping
+    i = bisect_right(ends, end)
+    return max(end, ends[i]) if i < len(ends) and starts[i] < end else end
+
+
+def add_concordance(segment, query, width):
+    """
+    Sets the concordance_source and concordance_target attributes of a segment, either
+    from the windows annotated by concordance_queryset(), or by cutting the windows out of
+    the full text of segments (read from compressed blocks or archives, or fetched because
+    normalisation changes their length).
+    """
+    query = normalise_text(query)
+    if hasattr(segment, "kwic_source"):
+        texts = (segment.kwic_source, segment.kwic_target)
+        lengths = (segment.source_length, segment.target_length)
+        # Windows cut out in the database; the others are whole texts
+        windowed = (
+            segment.source_length == segment.source_norm_length,
+            segment.target_length == segment.target_norm_length,
+        )
+        positions = [
+            segment.source_position if windowed[0] else 0,
+            segment.target_position if windowed[1] else 0,
+        ]
+        window_starts = (segment.source_start, segment.target_start)
+    else:
+        texts = (segment.source, segment.target)
+        lengths = tuple(len(text) for text in texts)
+        windowed = (False, False)
+        positions = [0, 0]
+        window_starts = None
+
+    # Length of each match in the original text
+    spans = [len(query), len(query)]
+    mappings = [None, None]
+    for side in (0, 1):
+        if not windowed[side]:
+            mappings[side] = normalised, starts, ends = normalised_positions(texts[side])
+            match = normalised.find(query)
+            if match >= 0 and query:
+                positions[side] = starts[match] + 1
+                spans[side] = ends[match + len(query) - 1] - starts[match]
+
+    sides = []
+    for side in (0, 1):
+        other = 1 - side
+        position = _aligned(positions[side], lengths[side], positions[other], lengths[other])
+        if windowed[side]:
+            start = window_starts[side]
+            snippet = texts[side]
+        else:
+            start = _chunk_start(mappings[side], max(position - width, 1))
+            snippet = texts[side][start - 1:_chunk_end(mappings[side], position + spans[side] + width - 1)]
+        sides.append(ConcordanceSide(
+            snippet, query, start <= 1, start - 1 + len(snippet) >= lengths[side], max(position - start, 0),
+        ))
+    segment.concordance_source, segment.concordance_target = sides
+    return segment
@@ -0,0 +1,146 @@
+"""
+Detection of duplicate and near-duplicate source terms across glossaries.
+
+1. Entries are grouped by normalise_key() of their source term, which finds the exact
+   duplicates (ignoring case, full-width/half-width forms and spacing).
+2. Near duplicates (e.g. "コンピュータ" and "コンピューター", "electrode layer" and
+   "electrode layers") are found between the distinct keys with MinHash and
+   locality-sensitive hashing: each key gets a signature of minimum hash values of its
+   character pairs, the signature is cut into bands, and only keys sharing a whole band with
+   another key are compared. The number of comparisons therefore grows with the number of
+   likely matches rather than with the square of the number of terms.
+3. Keys whose sets of character pairs have a Jaccard similarity of at least the threshold,
+   and which contain the same numbers (so that "layer 1" and "layer 2" are not duplicates),
+   are similar. Starting from the keys having the most entries, each key not yet in a group
+   starts a group with the similar keys not yet in one, so every key of a group is similar
+   to the first one and long chains of slightly different terms are not joined together.
+
+A group has conflicting targets when its entries do not all have the same target term
+(compared by normalise_key()).
+"""
+import hashlib
+import random
+import re
+from collections import defaultdict
+
+from .text import normalise_key
+
+
+# Mersenne prime used by the MinHash permutations
+PRIME = (1 << 61) - 1
+# Number of rows per LSH band. With 32 hashes, 8 bands of 4 rows make keys with a Jaccard
+# similarity of 0.6 likely (about 70%) to share a band, and keys under 0.3 unlikely (6%) to.
+BAND_ROWS = 4
+NUM_HASHES = 32
+# In large LSH buckets (e.g. of keys made of a few very common characters), each key is only
+# compared with this many of the keys added to the bucket before it.
+MAX_BUCKET_COMPARISONS = 50
+
+
+def shingles(key):
+    """ Returns the character pairs of a key, or the key itself if it is a single character. """
+    if len(key) < 2:
+        return {key}
+    return {key[i:i + 2] for i in range(len(key) - 1)}
+
+
+def numbers(key):
+    return re.findall(r"\d+", key)
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHasher:
+    """
+    Computes MinHash signatures. Each of the hash functions is a random permutation
+    (a * x + b) mod PRIME of a 64-bit hash of the shingle; the seed makes them reproducible.
+    """
+    def __init__(self, num_hashes=NUM_HASHES, seed=1):
+        rng = random.Random(seed)
+        self.permutations = [(rng.randrange(1, PRIME), rng.randrange(0, PRIME)) for _ in range(num_hashes)]
+
+    def signature(self, shingle_set):
+        hashes = [_shingle_hash(shingle) for shingle in shingle_set]
+        return tuple(min((a * h + b) % PRIME for h in hashes) for a, b in self.permutations)
+
+
+class DuplicateEntry:
+    def __init__(self, entry_id, glossary_id, source, target):
+        self.entry_id = entry_id
+        self.glossary_id = glossary_id
+        self.source = source
+        self.target = target
+
+
+class DuplicateGroup:
+    """ Entries having the same or similar source terms. """
+    def __init__(self, entries):
+        self.entries = entries
+        self.is_exact = len({normalise_key(entry.source) for entry in entries}) == 1
+        self.has_conflict = len({normalise_key(entry.target) for entry in entries}) > 1
+
+
+def similar_keys(keys, threshold, num_hashes=NUM_HASHES, band_rows=BAND_ROWS, seed=1):
+    """
+    Yields the (index, index) pairs of keys whose character pairs have a Jaccard similarity
+    of at least threshold and which contain the same numbers, using MinHash/LSH (with hash
+    functions chosen by seed) to choose the pairs compared.
+    """
+    hasher = MinHasher(num_hashes, seed)
+    key_shingles = [shingles(key) for key in keys]
+    buckets = defaultdict(list)
+    for index, shingle_set in enumerate(key_shingles):
+        signature = hasher.signature(shingle_set)
+        for band_start in range(0, num_hashes, band_rows):
+            buckets[(band_start, signature[band_start:band_start + band_rows])].append(index)
+
+    compared = set()
+    for members in buckets.values():
+        for position, a in enumerate(members):
+            for b in members[max(0, position - MAX_BUCKET_COMPARISONS):position]:
+                pair = (b, a)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                if (jaccard(key_shingles[a], key_shingles[b]) >= threshold
+                        and numbers(keys[a]) == numbers(keys[b])):
+                    yield pair
+
+
+def find_duplicates(entries, threshold=0.7, near=True, seed=1):
+    """
+    Returns the DuplicateGroup objects of an iterable of (entry id, glossary id, source, target)
+    tuples, conflicting groups first, then larger groups first.
+    If near is False, only exact duplicates are found. The same seed always gives the same groups.
+    """
+    entries_by_key = defaultdict(list)
+    for entry_id, glossary_id, source, target in entries:
+        key = normalise_key(source)
+        if key:
+            entries_by_key[key].append(DuplicateEntry(entry_id, glossary_id, source, target))
+
+    keys = list(entries_by_key)
+    neighbours = defaultdict(list)
+    if near:
+        for a, b in similar_keys(keys, threshold, seed=seed):
+            neighbours[a].append(b)
+            neighbours[b].append(a)
+
+    members = []
+    grouped = set()
+    for index in sorted(range(len(keys)), key=lambda index: -len(entries_by_key[keys[index]])):
+        if index in grouped:
+            continue
+        group_keys = [index] + [other for other in neighbours[index] if other not in grouped]
+        grouped.update(group_keys)
+        members.append([entry for key_index in group_keys for entry in entries_by_key[keys[key_index]]])
+
+    result = [DuplicateGroup(group_entries) for group_entries in members if len(group_entries) > 1]
+    result.sort(key=lambda group: (not group.has_conflict, -len(group.entries)))
+    return result
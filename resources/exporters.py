@@ -0,0 +1,235 @@
+"""
+Writers for exported glossary and translation files.
+
+Each glossary writer takes a Glossary object and a binary file object, and writes the
+glossary's entries to the file one at a time as they are read from the database, so memory
+use does not depend on the size of the glossary.
+
+Translation writers are generators yielding the file in chunks of bytes as segments are
+read from the database, so that large translations can be streamed to the browser.
+
+Writers are registered by format in GLOSSARY_WRITERS and TRANSLATION_WRITERS.
+"""
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from django.conf import settings
+
+from . import optional
+from .segment_store import iter_segments
+
+
+def iter_entries(glossary):
+    """ Yields (source, target, notes) tuples for all entries of a glossary. """
+    entries = glossary.entries.order_by("pk").values_list("source", "target", "notes")
+    return entries.iterator()
+
+
+def _single_line(text):
+    """ Replaces any newline and carriage return chars with spaces. """
+    text = text.replace("\r", " ")
+    text = text.replace("\n", " ")
+    return text.replace("  ", " ")
+
+
+def _quote(field):
+    """
+    Quotes a field containing a quote or a tab, as spreadsheet applications do,
+    so that the tab-delimited readers read it back unchanged.
+    """
+    if '"' in field or "\t" in field:
+        return '"' + field.replace('"', '""') + '"'
+    return field
+
+
+def write_tab_delimited(glossary, f):
+    """ One "source(tab)target(tab)notes" line per entry, in UTF-8. """
+    for source, target, notes in iter_entries(glossary):
+        line = _quote(source) + "\t" + _quote(target)
+        if notes:
+            line += "\t" + _quote(_single_line(notes))
+        f.write((line + "\n").encode("utf-8"))
+
+
+def write_csv(glossary, f):
+    """ Comma-separated values, with a BOM so that Excel recognises the file as UTF-8. """
+    text_file = io.TextIOWrapper(f, encoding="utf-8-sig", newline="")
+    writer = csv.writer(text_file)
+    for source, target, notes in iter_entries(glossary):
+        writer.writerow([source, target, notes] if notes else [source, target])
+    # Don't let the wrapper close the underlying file
+    text_file.flush()
+    text_file.detach()
+
+
+def write_xlsx(glossary, f):
+    """
+    An Excel workbook having a single worksheet.
+    The workbook is created in write-only mode, in which rows are written out as they
+    are added rather than the whole worksheet being kept in memory.
+    """
+    openpyxl = optional.load("openpyxl")
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=glossary.title[:31])  # Excel's limit on sheet names
+    for source, target, notes in iter_entries(glossary):
+        worksheet.append([source, target, notes] if notes else [source, target])
+    workbook.save(f)
+
+
+def write_tbx(glossary, f):
+    """
+    A TermBase eXchange (TBX 2) file having one termEntry per entry.
+    The languages are taken from the GLOSSARY_SOURCE_LANGUAGE and
+    GLOSSARY_TARGET_LANGUAGE settings.
+    """
+    source_lang = quoteattr(getattr(settings, "GLOSSARY_SOURCE_LANGUAGE", "ja"))
+    target_lang = quoteattr(getattr(settings, "GLOSSARY_TARGET_LANGUAGE", "en"))
+
+    def write(text):
+        f.write(text.encode("utf-8"))
+
+    write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    write(f'<martif type="TBX" xml:lang={source_lang}>\n')
+    write('<martifHeader><fileDesc><titleStmt>')
+    write(f'<title>{escape(glossary.title)}</title>')
+    write('</titleStmt><sourceDesc><p>Honyaku Archive</p></sourceDesc></fileDesc></martifHeader>\n')
+    write('<text><body>\n')
+    for number, (source, target, notes) in enumerate(iter_entries(glossary), start=1):
+        write(f'<termEntry id="e{number}">')
+        if notes:
+            write(f'<note>{escape(notes)}</note>')
+        write(f'<langSet xml:lang={source_lang}><tig><term>{escape(source)}</term></tig></langSet>')
+        write(f'<langSet xml:lang={target_lang}><tig><term>{escape(target)}</term></tig></langSet>')
+        write('</termEntry>\n')
+    write('</body></text>\n</martif>\n')
+
+
+# Format -> (writer function, file extension, description)
+GLOSSARY_WRITERS = {
+    "txt": (write_tab_delimited, "txt", "Tab-delimited text (.txt)"),
+    "csv": (write_csv, "csv", "CSV (.csv)"),
+    "xlsx": (write_xlsx, "xlsx", "Excel (.xlsx)"),
+    "tbx": (write_tbx, "tbx", "TBX (.tbx)"),
+}
+
+
+def available_export_formats():
+    """ Returns (format, description) pairs for the formats that can be exported on this server. """
+    return [
+        (name, description)
+        for name, (writer, extension, description) in GLOSSARY_WRITERS.items()
+        if name != "xlsx" or optional.is_installed("openpyxl")
+    ]
+
+
+# Size of the chunks yielded by the translation writers
+CHUNK_SIZE = 64 * 1024
+
+
+def _chunked(pieces):
+    """ Joins an iterable of strings into chunks of about CHUNK_SIZE bytes. """
+    buffer = []
+    size = 0
+    for piece in pieces:
+        data = piece.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= CHUNK_SIZE:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def translation_languages(translation):
+    """
+    Returns the main source and target languages of a translation,
+    used for segments imported without language codes.
+    """
+    return (
+        translation.source_lang or getattr(settings, "TRANSLATION_SOURCE_LANGUAGE", "ja"),
+        translation.target_lang or getattr(settings, "TRANSLATION_TARGET_LANGUAGE", "en"),
+    )
+
+
+def tmx_chunks(translation):
+    """
+    A TMX 1.4 file having one translation unit per segment.
+    Each unit keeps the language codes of its segment.
+    """
+    default_source_lang, default_target_lang = translation_languages(translation)
+
+    def pieces():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<tmx version="1.4">\n'
+        yield (
+            '<header creationtool="Honyaku Archive" creationtoolversion="1.0" '
+            'segtype="sentence" o-tmf="Honyaku Archive" adminlang="en" '
+            f'srclang={quoteattr(default_source_lang)} datatype="plaintext"/>\n'
+        )
+        yield '<body>\n'
+        for source, target, source_lang, target_lang in iter_segments(translation):
+            source_lang = quoteattr(source_lang or default_source_lang)
+            target_lang = quoteattr(target_lang or default_target_lang)
+            yield (
+                f'<tu srclang={source_lang}><tuv xml:lang={source_lang}><seg>{escape(source)}</seg></tuv>'
+                f'<tuv xml:lang={target_lang}><seg>{escape(target)}</seg></tuv></tu>\n'
+            )
+        yield '</body>\n</tmx>\n'
+
+    return _chunked(pieces())
+
+
+def tab_delimited_chunks(translation):
+    """ One "source(tab)target" line per segment, in UTF-8. """
+    return _chunked(
+        _quote(_single_line(source)) + "\t" + _quote(_single_line(target)) + "\n"
+        for source, target, source_lang, target_lang in iter_segments(translation)
+    )
+
+
+# Format -> (writer function, file extension, description)
+TRANSLATION_WRITERS = {
+    "tmx": (tmx_chunks, "tmx", "TMX (.tmx)"),
+    "txt": (tab_delimited_chunks, "txt", "Tab-delimited text (.txt)"),
+}
+
+
+class _ZipBuffer:
+    """ Write-only file object whose content is taken away by zip_chunks() as it is written. """
+    def __init__(self):
+        self.data = bytearray()
+
+    def write(self, data):
+        self.data += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = bytes(self.data)
+        self.data.clear()
+        return data
+
+
+def zip_chunks(files):
+    """
+    A zip file containing the given files, generated as it is written.
+    Receives an iterable of (filename, iterable of bytes) pairs.
+    The zip file is written to a buffer that is emptied after each chunk of input,
+    so only one chunk of the archive is held in memory at a time.
+    """
+    buffer = _ZipBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for filename, chunks in files:
+            with archive.open(filename, "w", force_zip64=True) as member:
+                for chunk in chunks:
+                    member.write(chunk)
+                    if len(buffer.data) >= CHUNK_SIZE:
+                        yield buffer.take()
+            yield buffer.take()
+    yield buffer.take()
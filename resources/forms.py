@@ -1,7 +1,21 @@
+import os
+import zipfile
+from datetime import datetime, time, timedelta
+
 from django import forms
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
+from django.utils import timezone
+
+from .models import ChunkedUpload, Entry, Glossary, TermCandidate, Translation
+from .importers import available_glossary_formats, TRANSLATION_READERS
+from .exporters import available_export_formats, TRANSLATION_WRITERS
+
 
-from .models import Entry, Glossary, Translation
+def is_archive(uploaded_file):
+    """ Returns True if an uploaded file is a zip archive of files to be imported. """
+    return uploaded_file.name.lower().endswith(".zip")
 
 
 class CreateEntryForm(forms.ModelForm):
@@ -9,7 +23,7 @@ class CreateEntryForm(forms.ModelForm):
     target = forms.CharField(label='Target language term')
     glossary = forms.ModelChoiceField(
         label='Add to an existing glossary?',
-        queryset=Glossary.objects.all().order_by('title'),
+        queryset=Glossary.objects.available().order_by('title'),
         required=False
     )
     new_glossary = forms.CharField(
@@ -54,7 +68,7 @@ class CreateEntryForm(forms.ModelForm):
         # If new term is to be added to a new glossary
         if not existing_glossary and new_glossary:
             # If input title for new glossary already exists, output error
-            if Glossary.objects.filter(title__iexact=new_glossary).exists():
+            if Glossary.objects.available().filter(title__iexact=new_glossary).exists():
                 msg = 'A glossary with that title already exists.'
                 self.add_error('new_glossary', msg)
             else:
@@ -81,6 +95,138 @@ class AddEntryToGlossaryForm(forms.ModelForm):
         fields = ('source', 'target', 'notes')
 
 
+class EntryBulkActionForm(forms.Form):
+    """
+    Form for applying one action to several entries of a glossary at once.
+    The entries field is filled in by the checkboxes on the glossary entries page.
+    """
+    ACTION_CHOICES = (
+        ("update", "Update selected entries"),
+        ("move", "Move selected entries to another glossary"),
+        ("delete", "Delete selected entries"),
+    )
+
+    entries = forms.ModelMultipleChoiceField(
+        queryset=Entry.objects.none(),
+        error_messages={
+            "required": "Please select at least one entry.",
+        },
+    )
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    target = forms.CharField(
+        label='New target language term',
+        max_length=250,
+        required=False
+    )
+    notes = forms.CharField(
+        label='New notes',
+        required=False
+    )
+    clear_notes = forms.BooleanField(
+        label='Clear notes',
+        required=False
+    )
+    glossary = forms.ModelChoiceField(
+        label='Move to glossary',
+        queryset=Glossary.objects.available().order_by('title'),
+        required=False
+    )
+
+    def __init__(self, *args, glossary=None, **kwargs):
+        """ Only entries belonging to the given glossary can be selected. """
+        super().__init__(*args, **kwargs)
+        self.fields['entries'].queryset = Entry.objects.filter(glossary=glossary)
+        self.fields['glossary'].queryset = self.fields['glossary'].queryset.exclude(pk=glossary.pk)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        action = cleaned_data.get('action')
+
+        if action == 'move' and not cleaned_data.get('glossary'):
+            self.add_error('glossary', 'Please select the glossary to move the entries to.')
+
+        if action == 'update':
+            if not (cleaned_data.get('target') or cleaned_data.get('notes') or cleaned_data.get('clear_notes')):
+                self.add_error('target', 'Please enter a new target term or notes.')
+            if cleaned_data.get('notes') and cleaned_data.get('clear_notes'):
+                self.add_error('notes', 'Please enter new notes or clear the notes, not both.')
+
+        return cleaned_data
+
+
+def _start_of_day(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+class EntryFilterForm(forms.Form):
+    """
+    Form for sorting and filtering the entries on the glossary entries page.
+    Every sort order is supported by an index on Entry starting with the glossary,
+    so a page of entries is read by walking the index.
+    """
+    SORT_CHOICES = (
+        ("source", "Source term (A-Z)"),
+        ("-source", "Source term (Z-A)"),
+        ("target", "Target term (A-Z)"),
+        ("-target", "Target term (Z-A)"),
+        ("-created_on", "Newest first"),
+        ("created_on", "Oldest first"),
+        ("-updated_on", "Recently updated first"),
+    )
+    NOTES_CHOICES = (
+        ("", "With or without notes"),
+        ("yes", "With notes"),
+        ("no", "Without notes"),
+    )
+
+    sort = forms.ChoiceField(choices=SORT_CHOICES, required=False)
+    author = forms.ModelChoiceField(
+        label='Created by',
+        queryset=get_user_model().objects.none(),
+        empty_label='Anyone',
+        required=False
+    )
+    created_from = forms.DateField(
+        label='Created from',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False
+    )
+    created_to = forms.DateField(
+        label='Created until',
+        widget=forms.DateInput(attrs={'type': 'date'}),
+        required=False
+    )
+    notes = forms.ChoiceField(choices=NOTES_CHOICES, required=False)
+
+    def __init__(self, *args, glossary=None, **kwargs):
+        """ Only the users who have created entries in the glossary are listed as authors. """
+        super().__init__(*args, **kwargs)
+        self.fields['author'].queryset = get_user_model().objects.filter(
+            created_entries__glossary=glossary
+        ).distinct().order_by('username')
+
+    def filter(self, entries):
+        """ Returns the entries filtered and sorted as set in the form, or sorted by source term if it is invalid. """
+        if not self.is_valid():
+            return entries.order_by("source", "pk")
+
+        data = self.cleaned_data
+        if data["author"]:
+            entries = entries.filter(created_by=data["author"])
+        # Compared as datetimes rather than with __date, which would stop the index being used
+        if data["created_from"]:
+            entries = entries.filter(created_on__gte=_start_of_day(data["created_from"]))
+        if data["created_to"]:
+            entries = entries.filter(created_on__lt=_start_of_day(data["created_to"] + timedelta(days=1)))
+        if data["notes"] == "yes":
+            entries = entries.exclude(notes="")
+        elif data["notes"] == "no":
+            entries = entries.filter(notes="")
+
+        sort = data["sort"] or "source"
+        return entries.order_by(sort, "-pk" if sort.startswith("-") else "pk")
+
+
 class GlossaryUploadForm(forms.ModelForm):
 
     glossary_file = forms.FileField(
@@ -88,22 +234,44 @@ class GlossaryUploadForm(forms.ModelForm):
         error_messages={
             "empty": "The selected file is empty.",
             "missing": "A file has not been provided.",
-            "invalid": "The file format is not correct. Please select a text file (.txt).",
+            "invalid": "The file format is not correct. Please select a glossary file.",
         },
         validators=[
             FileExtensionValidator(
-                allowed_extensions=[
-                    "txt",
-                ],
+                allowed_extensions=available_glossary_formats() + ["zip"],
                 message=[
-                    'Please select a file having a ".txt" file extension.'
+                    'Please select a file having one of the following file extensions: '
+                    + ", ".join(f'".{ext}"' for ext in available_glossary_formats() + ["zip"])
                 ],
             )
         ],
     )
 
+    mode = forms.ChoiceField(
+        label='Import into',
+        choices=(
+            ("new", "A new glossary"),
+            ("merge", "An existing glossary (update it to match the file)"),
+        ),
+        initial="new",
+        widget=forms.RadioSelect,
+    )
+
     title = forms.CharField(
         label='New glossary name',
+        required=False
+    )
+
+    glossary = forms.ModelChoiceField(
+        label='Existing glossary',
+        queryset=Glossary.objects.available().order_by('title'),
+        required=False
+    )
+
+    delete_missing = forms.BooleanField(
+        label='Delete entries that are not in the file',
+        initial=True,
+        required=False
     )
 
     notes = forms.CharField(
@@ -117,13 +285,32 @@ class GlossaryUploadForm(forms.ModelForm):
         fields = ("glossary_file", "title", "notes")
 
     def clean(self):
-        """ Check to prevent using a glossary name that already exists. """
+        """
+        A new glossary needs a name that does not already exist.
+        Merging needs an existing glossary to be selected.
+        """
         cleaned_data = super().clean()
+        mode = cleaned_data.get('mode')
         title = cleaned_data.get('title')
-        if title:
-            if Glossary.objects.filter(title__iexact=title).exists():
-                msg = 'A glossary with that title already exists.'
-                self.add_error('title', msg)
+        glossary_file = cleaned_data.get('glossary_file')
+
+        # Each file in a zip archive is imported as a new glossary named after the file
+        if glossary_file and is_archive(glossary_file):
+            if mode == 'merge':
+                self.add_error('glossary_file', 'A zip archive can only be imported as new glossaries.')
+            elif not zipfile.is_zipfile(glossary_file):
+                self.add_error('glossary_file', 'The selected file is not a valid zip archive.')
+            return cleaned_data
+
+        if mode == 'merge':
+            if not cleaned_data.get('glossary'):
+                self.add_error('glossary', 'Please select the glossary to be updated.')
+        elif not title:
+            self.add_error('title', 'Please enter a name for the new glossary.')
+        elif Glossary.objects.available().filter(title__iexact=title).exists():
+            msg = 'A glossary with that title already exists.'
+            self.add_error('title', msg)
+        return cleaned_data
 
 
 class CreateGlossaryForm(forms.ModelForm):
@@ -141,7 +328,7 @@ class CreateGlossaryForm(forms.ModelForm):
 
 class GlossaryExportForm(forms.ModelForm):
     glossaries = forms.ModelMultipleChoiceField(
-        queryset=Glossary.objects.all(),
+        queryset=Glossary.objects.available(),
         label='Select glossaries to be exported',
         required=True,
         widget=forms.SelectMultiple(attrs={'size': 20}),
@@ -150,11 +337,34 @@ class GlossaryExportForm(forms.ModelForm):
         },
     )
 
+    file_format = forms.ChoiceField(
+        label='File format',
+        choices=available_export_formats(),
+        initial='txt',
+    )
+
     class Meta:
         model = Glossary
         fields = ('glossaries',)
 
 
+class TranslationExportForm(forms.Form):
+    translations = forms.ModelMultipleChoiceField(
+        queryset=Translation.objects.available().order_by('job_number'),
+        label='Select translations to be exported',
+        required=True,
+        widget=forms.SelectMultiple(attrs={'size': 20}),
+        error_messages={
+            "required": "Please select at least one translation.",
+        },
+    )
+    file_format = forms.ChoiceField(
+        label='File format',
+        choices=[(name, description) for name, (writer, ext, description) in TRANSLATION_WRITERS.items()],
+        initial='tmx',
+    )
+
+
 class TranslationUploadForm(forms.ModelForm):
 
     translation_file = forms.FileField(
@@ -162,21 +372,24 @@ class TranslationUploadForm(forms.ModelForm):
         error_messages={
             "empty": "The selected file is empty.",
             "missing": "A file has not been provided.",
-            "invalid": "Please select a file with a '.tmx' file extension.",
+            "invalid": "Please select a TMX, XLIFF or SDLXLIFF file.",
         },
         validators=[
             FileExtensionValidator(
-                allowed_extensions=[
-                    "tmx",
-                ],
+                allowed_extensions=list(TRANSLATION_READERS) + ["zip"],
                 message=[
-                    'Please select a file with a ".tmx" file extension.'
+                    'Please select a file having one of the following file extensions: '
+                    + ", ".join(f'".{ext}"' for ext in list(TRANSLATION_READERS) + ["zip"])
                 ],
             )
         ],
     )
 
-    job_number = forms.CharField(label='Job number')
+    job_number = forms.CharField(
+        label='Job number',
+        help_text='Not needed for zip archives, whose files are named after their job numbers.',
+        required=False
+    )
 
     field = forms.CharField(
         label='Field (optional)',
@@ -202,7 +415,119 @@ class TranslationUploadForm(forms.ModelForm):
         ''' Check to prevent assigning a job number that already exists. '''
         cleaned_data = super().clean()
         job_number = cleaned_data.get('job_number')
-        if job_number:
-            if Translation.objects.filter(job_number__iexact=job_number).exists():
-                msg = 'A translation with that job number already exists.'
-                self.add_error('job_number', msg)
+        translation_file = cleaned_data.get('translation_file')
+
+        # Each file in a zip archive is imported as a translation named after the file
+        if translation_file and is_archive(translation_file):
+            if not zipfile.is_zipfile(translation_file):
+                self.add_error('translation_file', 'The selected file is not a valid zip archive.')
+            return cleaned_data
+
+        if not job_number:
+            self.add_error('job_number', 'Please enter the job number.')
+        elif Translation.objects.available().filter(job_number__iexact=job_number).exists():
+            msg = 'A translation with that job number already exists.'
+            self.add_error('job_number', msg)
+        return cleaned_data
+
+
+class ChunkedUploadForm(forms.ModelForm):
+    """
+    Starts a chunked upload of a translation file (or zip archive of translation files).
+    Only the file's name, size and checksum are sent; the content is sent in chunks afterwards.
+    """
+    filename = forms.CharField(max_length=255)
+
+    size = forms.IntegerField(min_value=1)
+
+    checksum = forms.RegexField(
+        regex=r'^[0-9a-fA-F]{64}$',
+        error_messages={"invalid": "The checksum must be a SHA-256 hash in hexadecimal."},
+        required=False
+    )
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ('filename', 'size', 'checksum', 'job_number', 'field', 'client', 'notes')
+
+    def clean_filename(self):
+        filename = self.cleaned_data['filename']
+        allowed_extensions = list(TRANSLATION_READERS) + ["zip"]
+        if os.path.splitext(filename)[1].lstrip(".").lower() not in allowed_extensions:
+            raise forms.ValidationError(
+                'Please select a file having one of the following file extensions: '
+                + ", ".join(f'".{ext}"' for ext in allowed_extensions)
+            )
+        return filename
+
+    def clean_checksum(self):
+        return self.cleaned_data['checksum'].lower()
+
+    def clean(self):
+        ''' Check to prevent assigning a job number that already exists. '''
+        cleaned_data = super().clean()
+        job_number = cleaned_data.get('job_number')
+        filename = cleaned_data.get('filename')
+
+        size = cleaned_data.get('size')
+        max_size = getattr(settings, "CHUNKED_UPLOAD_MAX_SIZE", 20 * 1024 ** 3)
+        if size and size > max_size:
+            self.add_error('size', f'The file is too large. The maximum size is {max_size // 1024 ** 2:,} MB.')
+
+        # Each file in a zip archive is imported as a translation named after the file
+        if not filename or filename.lower().endswith(".zip"):
+            return cleaned_data
+
+        if not job_number:
+            self.add_error('job_number', 'Please enter the job number.')
+        elif Translation.objects.available().filter(job_number__iexact=job_number).exists():
+            msg = 'A translation with that job number already exists.'
+            self.add_error('job_number', msg)
+        return cleaned_data
+
+
+class TermCheckForm(forms.Form):
+    glossaries = forms.ModelMultipleChoiceField(
+        queryset=Glossary.objects.available().order_by('title'),
+        label='Select the glossaries to check the translation against',
+        required=True,
+        widget=forms.SelectMultiple(attrs={'size': 20}),
+        error_messages={
+            "required": "Please select at least one glossary.",
+        },
+    )
+
+
+class TermCandidateReviewForm(forms.Form):
+    """
+    Form for accepting or rejecting several term candidates at once.
+    The candidates field is filled in by the checkboxes on the term extraction page.
+    """
+    ACTION_CHOICES = (
+        ("accept", "Add selected terms to a glossary"),
+        ("reject", "Reject selected terms"),
+    )
+
+    candidates = forms.ModelMultipleChoiceField(
+        queryset=TermCandidate.objects.none(),
+        error_messages={
+            "required": "Please select at least one term.",
+        },
+    )
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    glossary = forms.ModelChoiceField(
+        label='Add to glossary',
+        queryset=Glossary.objects.available().order_by('title'),
+        required=False
+    )
+
+    def __init__(self, *args, extraction=None, **kwargs):
+        """ Only candidates of the given extraction not yet reviewed can be selected. """
+        super().__init__(*args, **kwargs)
+        self.fields['candidates'].queryset = extraction.candidates.filter(status=TermCandidate.PROPOSED)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') == 'accept' and not cleaned_data.get('glossary'):
+            self.add_error('glossary', 'Please select the glossary to add the terms to.')
+        return cleaned_data
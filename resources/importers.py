@@ -0,0 +1,497 @@
+"""
+Readers for uploaded glossary and translation files.
+
+Files are read as a stream (of lines, rows or XML elements), so memory use does not depend
+on the size of the file. For text formats, the encoding is detected from a byte order mark
+if there is one, otherwise from a sample of the start of the file. Rows that cannot be
+imported are not silently dropped but are recorded, with the reason, in the reader's report.
+
+Readers are registered by file extension in GLOSSARY_READERS and TRANSLATION_READERS.
+"""
+import codecs
+import csv
+import os
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+
+from . import optional
+
+
+# Checked in this order, as the UTF-32 LE BOM starts with the UTF-16 LE BOM
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+# Encodings tried in turn for files without a BOM
+FALLBACK_ENCODINGS = ("utf-8", "cp932", "euc-jp")
+
+SAMPLE_SIZE = 64 * 1024
+
+# Maximum lengths of the Entry.source and Entry.target fields
+MAX_TERM_LENGTH = 250
+
+
+def detect_encoding(sample):
+    """ Returns the name of the encoding of a file, given the first bytes of the file. """
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    # UTF-16 without a BOM has a NUL byte in every other position for ASCII text
+    if sample.count(b"\x00") > len(sample) // 4:
+        if sample[1::2].count(b"\x00") > sample[0::2].count(b"\x00"):
+            return "utf-16-le"
+        return "utf-16-be"
+
+    # Ignore a possibly incomplete last line, as it may end part way through a character
+    if b"\n" in sample:
+        sample = sample[:sample.rindex(b"\n")]
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return "utf-8"
+
+
+class Rejection:
+    """ A line of an uploaded file that could not be imported. """
+    def __init__(self, line_number, reason, text=""):
+        self.line_number = line_number
+        self.reason = reason
+        self.text = text
+
+    def __str__(self):
+        return f"Line {self.line_number}: {self.reason}"
+
+
+class ImportReport:
+    """
+    Summary of an import.
+    Only the first IMPORT_MAX_REPORTED_REJECTIONS rejections are kept,
+    but all of them are counted.
+    """
+    def __init__(self):
+        self.encoding = None
+        self.imported = 0
+        self.rejected = []
+        self.rejected_count = 0
+
+    def reject(self, line_number, reason, text=""):
+        self.rejected_count += 1
+        if len(self.rejected) < getattr(settings, "IMPORT_MAX_REPORTED_REJECTIONS", 1000):
+            self.rejected.append(Rejection(line_number, reason, text))
+
+
+class GlossaryReader:
+    """
+    Base class for glossary file readers.
+    Iterating over a reader yields valid (source, target, notes) rows; problems with
+    other rows are recorded in self.report.
+    Subclasses implement rows(), which yields (line number, list of fields, original text).
+    """
+    def __init__(self, file, report=None):
+        self.file = file
+        self.report = report or ImportReport()
+
+    def rows(self):
+        raise NotImplementedError
+
+    def __iter__(self):
+        for line_number, row, text in self.rows():
+            row = [field.strip() if isinstance(field, str) else field for field in row]
+            # Ignore empty trailing fields, e.g. from spreadsheet cells
+            while row and row[-1] in ("", None):
+                row.pop()
+            if not row:
+                continue  # Blank lines are not errors
+
+            row = ["" if field is None else str(field) for field in row]
+            if len(row) < 2:
+                self.report.reject(line_number, "No target term found.", text)
+            elif len(row) > 3:
+                self.report.reject(line_number, f"Too many columns ({len(row)}).", text)
+            elif not row[0] or not row[1]:
+                self.report.reject(line_number, "Empty source or target term.", text)
+            elif len(row[0]) > MAX_TERM_LENGTH or len(row[1]) > MAX_TERM_LENGTH:
+                self.report.reject(
+                    line_number, f"Term longer than {MAX_TERM_LENGTH} characters.", text
+                )
+            else:
+                notes = row[2] if len(row) == 3 else ""
+                yield row[0], row[1], notes
+
+
+class TextReader(GlossaryReader):
+    """ Base class for readers of text files, handling encoding detection. """
+
+    def lines(self):
+        """ Yields (line number, decoded line) pairs. """
+        sample = self.file.read(SAMPLE_SIZE)
+        self.file.seek(0)
+        encoding = detect_encoding(sample)
+        self.report.encoding = encoding
+
+        if encoding.startswith(("utf-16", "utf-32")):
+            # Lines can't be split on single bytes, so decode the stream as a whole
+            reader = codecs.getreader(encoding)(self.file, errors="replace")
+            for line_number, line in enumerate(reader, start=1):
+                yield line_number, line
+            return
+
+        for line_number, raw_line in enumerate(self.file, start=1):
+            try:
+                yield line_number, raw_line.decode(encoding)
+            except UnicodeDecodeError:
+                # The sample may not have contained any characters outside ASCII,
+                # so try the other encodings before giving up on the line.
+                for fallback in FALLBACK_ENCODINGS:
+                    try:
+                        yield line_number, raw_line.decode(fallback)
+                        break
+                    except UnicodeDecodeError:
+                        continue
+                else:
+                    self.report.reject(line_number, f"Could not be decoded as {encoding}.")
+
+    def delimited_rows(self, delimiter):
+        """
+        Yields (line number, fields, text) for each row of a delimited file, read with the csv
+        module so that quoted fields may contain delimiters and line breaks.
+        A row that cannot be parsed is rejected, and reading continues with the next row.
+        """
+        lines = (line for line_number, line in self.lines())
+        reader = csv.reader(lines, delimiter=delimiter)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                self.report.reject(reader.line_num, f"Could not be read ({e}).")
+                continue
+            yield reader.line_num, row, delimiter.join(row)
+
+
+class TabDelimitedReader(TextReader):
+    """
+    Reads a tab-delimited text file.
+    Each line should contain a source term, a target term and optional notes, separated by tabs.
+    """
+    def rows(self):
+        return self.delimited_rows("\t")
+
+
+class CsvReader(TextReader):
+    """
+    Reads a comma-separated file, as saved by spreadsheet applications.
+    Quoted fields may contain commas and line breaks.
+    """
+    def rows(self):
+        return self.delimited_rows(",")
+
+
+class XlsxReader(GlossaryReader):
+    """
+    Reads the first worksheet of an Excel workbook.
+    The workbook is opened in read-only mode, in which rows are streamed from the file
+    rather than the whole workbook being loaded into memory.
+    """
+    def rows(self):
+        openpyxl = optional.load("openpyxl")
+        workbook = openpyxl.load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            worksheet = workbook.worksheets[0]
+            for line_number, row in enumerate(worksheet.iter_rows(values_only=True), start=1):
+                yield line_number, list(row), "\t".join("" if cell is None else str(cell) for cell in row)
+        finally:
+            workbook.close()
+
+
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+def _local_name(tag):
+    """ Removes the namespace from an element tag, e.g. "{urn:...}term" -> "term" """
+    return tag.rsplit("}", 1)[-1]
+
+
+def _iterparse_units(file, unit_tags):
+    """
+    Parses an XML file element by element, yielding (event, element, tag) for the start of
+    every element and for the end of the elements whose tag is in unit_tags (e.g. the
+    translation units of a TMX file).
+    Once the caller has read a unit, it is removed from its parent element, so that it can be
+    freed and memory use stays constant however many units the file contains. (Clearing the
+    unit and the root element is not enough, as the units are not children of the root but
+    of a <body> element, which would keep every emptied unit.)
+    """
+    parents = []  # Elements being parsed, from the root to the current element
+    for event, element in iterparse(file, events=("start", "end")):
+        tag = _local_name(element.tag)
+        if event == "start":
+            parents.append(element)
+            yield event, element, tag
+            continue
+
+        parents.pop()
+        if tag in unit_tags:
+            yield event, element, tag
+            if parents:
+                parents[-1].remove(element)
+
+
+def _text(element):
+    """ Returns all the text inside an element, including that of any inline elements. """
+    return "".join(element.itertext()).strip()
+
+
+class TbxReader(GlossaryReader):
+    """
+    Reads a TermBase eXchange (TBX) file, in either the TBX 2 (termEntry/langSet/tig)
+    or TBX 3 (conceptEntry/langSec/termSec) structure.
+    The source language is the language of the document if it is set, otherwise the first
+    language in each entry. The first term in another language is used as the target term,
+    and any descriptions or notes of the entry are used as the notes.
+    The file is parsed element by element, and each entry is discarded once it has been read
+    (see _iterparse_units()).
+    """
+    entry_tags = ("termEntry", "conceptEntry")
+    language_tags = ("langSet", "langSec")
+    note_tags = ("descrip", "note", "definition")
+
+    def rows(self):
+        document_language = None
+        entry_number = 0
+        root = None
+
+        for event, element, tag in _iterparse_units(self.file, self.entry_tags):
+            if event == "start":
+                if root is None:
+                    root = element
+                    document_language = element.get(XML_LANG)
+                continue
+
+            entry_number += 1
+            terms = {}  # Language -> first term in that language, in document order
+            notes = []
+            for child in element.iter():
+                child_tag = _local_name(child.tag)
+                if child_tag in self.language_tags:
+                    language = (child.get(XML_LANG) or "").lower()
+                    for term in child.iter():
+                        if _local_name(term.tag) == "term" and _text(term):
+                            terms.setdefault(language, _text(term))
+                            break
+                elif child_tag in self.note_tags and _text(child):
+                    notes.append(_text(child))
+
+            languages = list(terms)
+            source_language = (document_language or (languages[0] if languages else "")).lower()
+            source = terms.get(source_language, "")
+            target = next((terms[lang] for lang in languages if lang != source_language), "")
+            text = " | ".join(f"{lang}: {term}" for lang, term in terms.items())
+            yield entry_number, [source, target, " ".join(notes)], text
+
+
+# File extension -> reader class
+GLOSSARY_READERS = {
+    "txt": TabDelimitedReader,
+    "tsv": TabDelimitedReader,
+    "csv": CsvReader,
+    "xlsx": XlsxReader,
+    "tbx": TbxReader,
+}
+
+
+def available_glossary_formats():
+    """ Returns the file extensions that can be imported on this server. """
+    return [ext for ext in GLOSSARY_READERS if ext != "xlsx" or optional.is_installed("openpyxl")]
+
+
+def get_glossary_reader(file, report=None):
+    """ Returns a reader for an uploaded glossary file, chosen by its file extension. """
+    extension = os.path.splitext(file.name)[1].lstrip(".").lower()
+    reader_class = GLOSSARY_READERS.get(extension, TabDelimitedReader)
+    return reader_class(file, report)
+
+
+def _segment_text(element):
+    """
+    Returns the text of a TMX <seg> element.
+    The content of inline formatting codes (<bpt>, <ept>, <ph>, <it>, <ut>) is native code
+    of the original document, not text, so it is left out; the text following them is kept.
+    """
+    parts = [element.text or ""]
+    for child in element:
+        if _local_name(child.tag) not in ("bpt", "ept", "ph", "it", "ut"):
+            parts.append(_segment_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def _source_index(variants, srclang):
+    """
+    Returns the index of the source variant of a translation unit, given as (language, text)
+    pairs: the variant in srclang, or else the first in the same base language (e.g. "en-us"
+    for "en"), or else the first variant.
+    """
+    if srclang and srclang != "*all*":
+        for i, (lang, text) in enumerate(variants):
+            if lang == srclang:
+                return i
+        for i, (lang, text) in enumerate(variants):
+            if lang.split("-")[0] == srclang.split("-")[0]:
+                return i
+    return 0
+
+
+class TmxReader:
+    """
+    Reads a TMX file, yielding (source, target, source language, target language) tuples.
+    Every translation unit is paired from its source variant (as given by the srclang
+    attribute of the unit or of the header) to each of its other variants, so multilingual
+    files give one segment per language pair and no variants are lost.
+    The file is parsed element by element, and each unit is discarded once it has been read
+    (see _iterparse_units()).
+    Language codes found in the file are collected in self.languages.
+    """
+    def __init__(self, file):
+        self.file = file
+        self.languages = {}  # Used as an ordered set
+
+    def __iter__(self):
+        header_srclang = ""
+
+        for event, element, tag in _iterparse_units(self.file, ("tu",)):
+            if event == "start":
+                if tag == "header":
+                    header_srclang = (element.get("srclang") or "").lower()
+                continue
+
+            variants = []
+            for tuv in element:
+                if _local_name(tuv.tag) != "tuv":
+                    continue
+                lang = (tuv.get(XML_LANG) or tuv.get("lang") or "").lower()
+                seg = next((child for child in tuv if _local_name(child.tag) == "seg"), None)
+                if seg is not None:
+                    variants.append((lang, _segment_text(seg)))
+
+            srclang = (element.get("srclang") or header_srclang).lower()
+            source_index = _source_index(variants, srclang)
+
+            if len(variants) >= 2:
+                source_lang, source = variants[source_index]
+                self.languages.setdefault(source_lang)
+                # Other variants of the source language (e.g. en-GB for en-US) are targets too
+                for i, (target_lang, target) in enumerate(variants):
+                    if i != source_index:
+                        self.languages.setdefault(target_lang)
+                        yield source, target, source_lang, target_lang
+
+
+class XliffReader:
+    """
+    Reads an XLIFF 1.2, XLIFF 2.0 or SDLXLIFF file, yielding
+    (source, target, source language, target language) tuples.
+    Units marked as not to be translated and units without a translation are skipped.
+    Where a unit is split into segments (<mrk mtype="seg"> in SDLXLIFF, <segment> in
+    XLIFF 2.0), each segment is imported separately.
+    The file is parsed element by element, and each unit is discarded once it has been read
+    (see _iterparse_units()).
+    Language codes found in the file are collected in self.languages.
+    """
+    unit_tags = ("trans-unit", "unit")
+
+    def __init__(self, file):
+        self.file = file
+        self.languages = {}  # Used as an ordered set
+
+    @staticmethod
+    def _children(element, tag):
+        return [child for child in element if _local_name(child.tag) == tag]
+
+    @staticmethod
+    def _marked_segments(element):
+        """ Returns {mid: text} for the <mrk mtype="seg"> elements inside an element. """
+        return {
+            mrk.get("mid"): _segment_text(mrk)
+            for mrk in element.iter()
+            if _local_name(mrk.tag) == "mrk" and mrk.get("mtype") == "seg"
+        }
+
+    def unit_pairs(self, unit):
+        """ Yields (source, target) pairs for a translation unit. """
+        # XLIFF 2.0: <unit><segment><source/><target/></segment></unit>
+        segments = self._children(unit, "segment")
+        if segments:
+            for segment in segments:
+                sources = self._children(segment, "source")
+                targets = self._children(segment, "target")
+                if sources and targets:
+                    yield _segment_text(sources[0]), _segment_text(targets[0])
+            return
+
+        # XLIFF 1.2 and SDLXLIFF: <trans-unit><source/><seg-source/><target/></trans-unit>
+        targets = self._children(unit, "target")
+        if not targets:
+            return
+        seg_sources = self._children(unit, "seg-source")
+        if seg_sources:
+            source_segments = self._marked_segments(seg_sources[0])
+            target_segments = self._marked_segments(targets[0])
+            if source_segments:
+                for mid, source in source_segments.items():
+                    if mid in target_segments:
+                        yield source, target_segments[mid]
+                return
+        sources = self._children(unit, "source")
+        if sources:
+            yield _segment_text(sources[0]), _segment_text(targets[0])
+
+    def __iter__(self):
+        source_lang = ""
+        target_lang = ""
+        root = None
+
+        for event, element, tag in _iterparse_units(self.file, self.unit_tags):
+            if event == "start":
+                if root is None:
+                    root = element
+                    # XLIFF 2.0 has the languages on the root element
+                    source_lang = (element.get("srcLang") or "").lower()
+                    target_lang = (element.get("trgLang") or "").lower()
+                elif tag == "file" and element.get("source-language"):
+                    source_lang = element.get("source-language").lower()
+                    target_lang = (element.get("target-language") or "").lower()
+                continue
+
+            if element.get("translate") != "no":
+                for source, target in self.unit_pairs(element):
+                    if source.strip() and target.strip():
+                        self.languages.setdefault(source_lang)
+                        self.languages.setdefault(target_lang)
+                        yield source, target, source_lang, target_lang
+
+
+# File extension -> reader class
+TRANSLATION_READERS = {
+    "tmx": TmxReader,
+    "xlf": XliffReader,
+    "xliff": XliffReader,
+    "sdlxliff": XliffReader,
+}
+
+
+def get_translation_reader(file):
+    """ Returns a reader for an uploaded translation file, chosen by its file extension. """
+    extension = os.path.splitext(file.name)[1].lstrip(".").lower()
+    reader_class = TRANSLATION_READERS.get(extension, TmxReader)
+    return reader_class(file)
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from resources.models import Translation
+from resources.segment_archive import ArchiveError
+from resources.segment_store import archive_translation, expand_translation
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the segments of translations into read-only archive files, "
+        "or back into Segment rows with --restore."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "job_numbers",
+            nargs="*",
+            help="Job numbers of the translations to archive.",
+        )
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            metavar="DAYS",
+            default=None,
+            help="Archive all translations uploaded more than DAYS days ago.",
+        )
+        parser.add_argument(
+            "--restore",
+            action="store_true",
+            help="Move the segments back into Segment rows.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["job_numbers"] and options["older_than"] is None:
+            raise CommandError("Give the job numbers of the translations to archive, or --older-than.")
+
+        translations = Translation.objects.available()
+        if options["job_numbers"]:
+            translations = translations.filter(job_number__in=options["job_numbers"])
+        if options["older_than"] is not None:
+            cutoff = timezone.now() - timedelta(days=options["older_than"])
+            translations = translations.filter(uploaded_on__lt=cutoff)
+        if options["restore"]:
+            translations = translations.filter(storage=Translation.ARCHIVED)
+        else:
+            translations = translations.exclude(storage=Translation.ARCHIVED)
+
+        for translation in translations.iterator():
+            if options["restore"]:
+                self.stdout.write(f"Restoring {translation} ...")
+                expand_translation(translation)
+            else:
+                self.stdout.write(f"Archiving {translation} ...")
+                try:
+                    archive_translation(translation)
+                except ArchiveError as e:
+                    raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from resources.models import Translation
+from resources.segment_store import compress_translation, expand_translation
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves the segments of translations into compressed blocks, "
+        "or back into Segment rows with --expand."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "job_numbers",
+            nargs="*",
+            help="Job numbers of the translations to convert.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Convert all translations.",
+        )
+        parser.add_argument(
+            "--expand",
+            action="store_true",
+            help="Move the segments back into Segment rows.",
+        )
+        parser.add_argument(
+            "--block-size",
+            type=int,
+            default=None,
+            help="Number of segments per compressed block.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["job_numbers"] and not options["all"]:
+            raise CommandError("Give the job numbers of the translations to convert, or --all.")
+
+        translations = Translation.objects.available()
+        if not options["all"]:
+            translations = translations.filter(job_number__in=options["job_numbers"])
+        if options["expand"]:
+            translations = translations.filter(storage=Translation.COMPRESSED)
+        else:
+            translations = translations.filter(storage=Translation.ROWS)
+
+        for translation in translations.iterator():
+            if options["expand"]:
+                self.stdout.write(f"Expanding {translation} ...")
+                expand_translation(translation)
+            else:
+                self.stdout.write(f"Compressing {translation} ...")
+                compress_translation(translation, block_size=options["block_size"])
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,123 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from resources.models import Entry, TermCandidate, TermExtraction, Translation
+from resources.segment_store import iter_segments
+from resources.term_extraction import TermExtractionError, extract_terms
+from resources.text import normalise_key
+
+
+class Command(BaseCommand):
+    help = (
+        "Extracts glossary term candidates from the segments of a translation. "
+        "The candidates are listed for review on the translation's page."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("job_number", help="Job number of the translation.")
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=getattr(settings, "TERM_EXTRACTION_PROCESSES", 1),
+            help="Number of processes parsing segments.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of segments sent to each process at a time.",
+        )
+        parser.add_argument(
+            "--min-count",
+            type=int,
+            default=3,
+            help="Minimum number of segments in which a term pair must appear.",
+        )
+        parser.add_argument(
+            "--min-score",
+            type=float,
+            default=0.3,
+            help="Minimum Dice coefficient of a term pair (0 to 1).",
+        )
+        parser.add_argument(
+            "--max-tokens",
+            type=int,
+            default=5,
+            help="Maximum number of words in a term.",
+        )
+
+    def handle(self, *args, **options):
+        translation = Translation.objects.available().filter(job_number=options["job_number"]).first()
+        if translation is None:
+            raise CommandError(f'There is no translation with the job number "{options["job_number"]}".')
+
+        extraction = TermExtraction.objects.create(translation=translation)
+        self.stdout.write(f"Extracting terms from {translation} ...")
+        try:
+            num_of_candidates, num_of_segments = self.extract(extraction, translation, options)
+        except Exception as e:
+            # Mark the extraction as failed rather than leave it pending, and drop any candidates saved
+            extraction.candidates.all().delete()
+            extraction.status = TermExtraction.FAILED
+            extraction.message = str(e) or e.__class__.__name__
+            extraction.finished_on = timezone.now()
+            extraction.save()
+            if isinstance(e, TermExtractionError):
+                raise CommandError(str(e))
+            raise
+
+        extraction.status = TermExtraction.DONE
+        extraction.num_of_segments = num_of_segments
+        extraction.finished_on = timezone.now()
+        extraction.save()
+        self.stdout.write(self.style.SUCCESS(
+            f"{num_of_candidates} term candidates found in {num_of_segments} segments: "
+            f"{extraction.get_absolute_url()}"
+        ))
+
+    def extract(self, extraction, translation, options):
+        """
+        Saves the term candidates found in the segments of translation.
+        Returns the number of candidates and the number of segments read.
+        """
+        num_of_segments = 0
+
+        def counted(segments):
+            nonlocal num_of_segments
+            for segment in segments:
+                num_of_segments += 1
+                yield segment
+
+        proposed_terms = extract_terms(
+            counted(iter_segments(translation)),
+            processes=options["processes"],
+            batch_size=options["batch_size"],
+            max_tokens=options["max_tokens"],
+            min_count=options["min_count"],
+            min_score=options["min_score"],
+        )
+
+        # Term pairs already in a glossary are not proposed again
+        entries = Entry.objects.exclude(glossary__is_deleting=True)
+        existing = {
+            (normalise_key(source), normalise_key(target))
+            for source, target in entries.values_list("source", "target").iterator()
+        }
+        max_length = TermCandidate._meta.get_field("source").max_length
+        candidates = [
+            TermCandidate(
+                extraction=extraction,
+                source=term.source,
+                target=term.target,
+                source_count=term.source_count,
+                target_count=term.target_count,
+                cooccurrences=term.cooccurrences,
+                score=term.score,
+            )
+            for term in proposed_terms
+            if (normalise_key(term.source), normalise_key(term.target)) not in existing
+            and len(term.source) <= max_length and len(term.target) <= max_length
+        ]
+        TermCandidate.objects.bulk_create(candidates, batch_size=2000)
+        return len(candidates), num_of_segments
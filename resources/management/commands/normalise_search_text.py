@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from resources.models import Entry, Segment
+from resources.text import update_normalised_columns
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the normalised source and target columns searched for entries and segments, "
+        "e.g. after changing the SEARCH_FOLD_KANA setting."
+    )
+
+    def handle(self, *args, **options):
+        batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+        for model in (Entry, Segment):
+            self.stdout.write(f"Updating {model._meta.verbose_name_plural} ...")
+            updated = update_normalised_columns(model, batch_size)
+            self.stdout.write(f"{updated} {model._meta.verbose_name_plural} updated.")
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from resources.models import ChunkedUpload
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes chunked uploads that have not received a chunk for CHUNKED_UPLOAD_EXPIRY_HOURS, "
+        "together with their partly uploaded files. Uploads still importing after "
+        "CHUNKED_UPLOAD_IMPORT_EXPIRY_HOURS (e.g. because the server was restarted during the import) "
+        "are marked as failed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=getattr(settings, "CHUNKED_UPLOAD_EXPIRY_HOURS", 24),
+            help="Number of hours after which an unfinished upload is deleted.",
+        )
+        parser.add_argument(
+            "--import-hours",
+            type=int,
+            default=getattr(settings, "CHUNKED_UPLOAD_IMPORT_EXPIRY_HOURS", 72),
+            help="Number of hours after which an upload still being imported is marked as failed.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        stuck = ChunkedUpload.objects.filter(
+            status=ChunkedUpload.IMPORTING,
+            updated_on__lt=now - timedelta(hours=options["import_hours"]),
+        )
+        for upload in stuck:
+            self.stdout.write(f"Marking import of {upload.filename} as failed ...")
+            if upload.upload_file:
+                upload.upload_file.delete(save=False)
+            upload.status = ChunkedUpload.FAILED
+            upload.message = "The import was interrupted. Please upload the file again."
+            upload.save()
+
+        cutoff = now - timedelta(hours=options["hours"])
+        uploads = ChunkedUpload.objects.exclude(status=ChunkedUpload.IMPORTING).filter(updated_on__lt=cutoff)
+        for upload in uploads:
+            self.stdout.write(f"Deleting upload of {upload.filename} ...")
+            if upload.upload_file:
+                upload.upload_file.delete(save=False)
+            upload.delete()
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from resources.models import Glossary, Translation
+from resources.tasks import delete_resource
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes glossaries and translations marked for deletion whose background "
+        "deletion did not finish, e.g. because the web process was restarted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Number of entries or segments deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        for model in (Glossary, Translation):
+            for pk in model.objects.filter(is_deleting=True).values_list("pk", flat=True):
+                self.stdout.write(f"Deleting {model._meta.verbose_name} {pk} ...")
+                delete_resource(model, pk, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS("Done."))
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from resources.models import SearchLog
+
+
+class Command(BaseCommand):
+    help = "Deletes the search logs older than SEARCH_LOG_RETENTION_DAYS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "SEARCH_LOG_RETENTION_DAYS", 90),
+            help="Number of days after which a search log is deleted.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = SearchLog.objects.filter(created_on__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} search logs deleted."))
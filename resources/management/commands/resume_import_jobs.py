@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from resources.models import ImportJob, ImportJobItem
+from resources.views import import_archive_member
+
+
+class Command(BaseCommand):
+    help = (
+        "Finishes imports of zip archives whose background tasks were lost, e.g. because the web "
+        "process was restarted. Files still waiting to be imported IMPORT_JOB_EXPIRY_HOURS after the "
+        "archive was uploaded are imported (or marked as failed with --fail), files whose import was "
+        "interrupted are marked as failed, and the archive is then deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=getattr(settings, "IMPORT_JOB_EXPIRY_HOURS", 24),
+            help="Number of hours after which an unfinished import is considered stale.",
+        )
+        parser.add_argument(
+            "--fail",
+            action="store_true",
+            help="Mark the files waiting to be imported as failed instead of importing them.",
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["hours"])
+        unfinished = [ImportJobItem.PENDING, ImportJobItem.RUNNING]
+        jobs = ImportJob.objects.filter(created_on__lt=cutoff, items__status__in=unfinished).distinct()
+
+        for job in jobs:
+            self.stdout.write(f"Finishing {job} ...")
+            # The resource being imported may have been partly created
+            job.items.filter(status=ImportJobItem.RUNNING).update(
+                status=ImportJobItem.FAILED,
+                message="The import was interrupted. Please check that the file was fully imported.",
+            )
+            pending = job.items.filter(status=ImportJobItem.PENDING)
+            if options["fail"] or not job.archive:
+                pending.update(status=ImportJobItem.FAILED, message="The import was interrupted.")
+            else:
+                for item_pk in pending.values_list("pk", flat=True):
+                    import_archive_member(item_pk)
+
+            job.refresh_from_db()
+            if job.archive:
+                job.archive.delete()
+        self.stdout.write(self.style.SUCCESS("Done."))
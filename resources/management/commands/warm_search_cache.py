@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from resources.models import SearchCache
+from resources.search_cache import frequent_searches, warm_search
+
+
+class Command(BaseCommand):
+    help = (
+        "Precomputes the results of the text searches made most often in the last "
+        "SEARCH_CACHE_DAYS days, for each resource. Run after deploys and periodically "
+        "(e.g. hourly), more often than SEARCH_CACHE_MAX_AGE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=getattr(settings, "SEARCH_CACHE_DAYS", 7),
+            help="Number of days of search logs used to find the frequent searches.",
+        )
+        parser.add_argument(
+            "--queries",
+            type=int,
+            default=getattr(settings, "SEARCH_CACHE_QUERIES", 1000),
+            help="Number of searches cached for each resource (and for all resources).",
+        )
+        parser.add_argument(
+            "--min-searches",
+            type=int,
+            default=2,
+            help="Number of times a search must have been made to be cached.",
+        )
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        searches = frequent_searches(options["days"], options["queries"], options["min_searches"])
+        self.stdout.write(f"Caching the results of {len(searches)} searches ...")
+        timer = time.monotonic()
+        for query, resource, language in searches:
+            warm_search(query, resource, language)
+
+        # Searches no longer frequent enough are not kept
+        deleted, _ = SearchCache.objects.filter(updated_on__lt=started).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Done in {time.monotonic() - timer:.1f} s ({deleted} out of date cached searches deleted)."
+        ))
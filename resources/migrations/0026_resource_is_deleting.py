@@ -0,0 +1,23 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0025_alter_translation_translation_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='glossary',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
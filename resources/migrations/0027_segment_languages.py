@@ -0,0 +1,46 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0026_resource_is_deleting'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segment',
+            name='source_lang',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='target_lang',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='languages',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='source_lang',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='translation',
+            name='target_lang',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='segment',
+            index=models.Index(fields=['source_lang'], name='resources_s_source__477aee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='segment',
+            index=models.Index(fields=['target_lang'], name='resources_s_target__cc5687_idx'),
+        ),
+    ]
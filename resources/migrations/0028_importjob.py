@@ -0,0 +1,52 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0027_segment_languages'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('glossary', 'Glossaries'), ('translation', 'Translations')], max_length=20)),
+                ('archive', models.FileField(null=True, upload_to='import_archives')),
+                ('field', models.CharField(blank=True, max_length=255)),
+                ('client', models.CharField(blank=True, max_length=255)),
+                ('notes', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'import job',
+                'verbose_name_plural': 'import jobs',
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportJobItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('member_name', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Waiting'), ('running', 'Importing'), ('done', 'Imported'), ('failed', 'Failed'), ('skipped', 'Skipped')], default='pending', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('imported', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('glossary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_items', to='resources.glossary')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='resources.importjob')),
+                ('translation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_items', to='resources.translation')),
+            ],
+            options={
+                'verbose_name': 'import job item',
+                'verbose_name_plural': 'import job items',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
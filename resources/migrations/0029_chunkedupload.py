@@ -0,0 +1,43 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0028_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('upload_file', models.FileField(null=True, upload_to='chunked_uploads')),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('importing', 'Importing'), ('done', 'Imported'), ('failed', 'Failed')], default='uploading', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('job_number', models.CharField(blank=True, max_length=255)),
+                ('field', models.CharField(blank=True, max_length=255)),
+                ('client', models.CharField(blank=True, max_length=255)),
+                ('notes', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chunked_uploads', to=settings.AUTH_USER_MODEL)),
+                ('import_job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chunked_uploads', to='resources.importjob')),
+                ('translation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='chunked_uploads', to='resources.translation')),
+            ],
+            options={
+                'verbose_name': 'chunked upload',
+                'verbose_name_plural': 'chunked uploads',
+            },
+        ),
+    ]
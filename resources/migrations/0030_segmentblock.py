@@ -0,0 +1,39 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0029_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translation',
+            name='storage',
+            field=models.CharField(choices=[('rows', 'Database rows'), ('compressed', 'Compressed blocks')], default='rows', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='SegmentBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('segment_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('ngram_filter', models.BinaryField()),
+                ('translation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segment_blocks', to='resources.translation')),
+            ],
+            options={
+                'verbose_name': 'segment block',
+                'verbose_name_plural': 'segment blocks',
+                'ordering': ['translation', 'number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='segmentblock',
+            constraint=models.UniqueConstraint(fields=('translation', 'number'), name='unique_segment_block_number'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0030_segmentblock'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='translation',
+            name='storage',
+            field=models.CharField(choices=[('rows', 'Database rows'), ('compressed', 'Compressed blocks'), ('archived', 'Read-only archive')], default='rows', max_length=20),
+        ),
+    ]
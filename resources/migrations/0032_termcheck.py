@@ -0,0 +1,54 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0031_translation_archived_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Waiting'), ('running', 'Checking'), ('done', 'Finished'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('num_of_terms', models.PositiveIntegerField(default=0)),
+                ('segments_checked', models.PositiveIntegerField(default=0)),
+                ('issue_count', models.PositiveIntegerField(default=0)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='term_checks', to=settings.AUTH_USER_MODEL)),
+                ('glossaries', models.ManyToManyField(related_name='term_checks', to='resources.glossary')),
+                ('translation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_checks', to='resources.translation')),
+            ],
+            options={
+                'verbose_name': 'term check',
+                'verbose_name_plural': 'term checks',
+            },
+        ),
+        migrations.CreateModel(
+            name='TermCheckIssue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment_number', models.PositiveIntegerField()),
+                ('source', models.TextField()),
+                ('target', models.TextField()),
+                ('term_source', models.CharField(max_length=250)),
+                ('term_target', models.CharField(max_length=250)),
+                ('entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='term_check_issues', to='resources.entry')),
+                ('term_check', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='issues', to='resources.termcheck')),
+            ],
+            options={
+                'verbose_name': 'term check issue',
+                'verbose_name_plural': 'term check issues',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0032_termcheck'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('running', 'Extracting'), ('done', 'Finished'), ('failed', 'Failed')], default='running', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('num_of_segments', models.PositiveIntegerField(default=0)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='term_extractions', to=settings.AUTH_USER_MODEL)),
+                ('translation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_extractions', to='resources.translation')),
+            ],
+            options={
+                'verbose_name': 'term extraction',
+                'verbose_name_plural': 'term extractions',
+            },
+        ),
+        migrations.CreateModel(
+            name='TermCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=250)),
+                ('target', models.CharField(max_length=250)),
+                ('source_count', models.PositiveIntegerField()),
+                ('target_count', models.PositiveIntegerField()),
+                ('cooccurrences', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('status', models.CharField(choices=[('proposed', 'Proposed'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], default='proposed', max_length=20)),
+                ('entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='term_candidates', to='resources.entry')),
+                ('extraction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='resources.termextraction')),
+            ],
+            options={
+                'verbose_name': 'term candidate',
+                'verbose_name_plural': 'term candidates',
+                'ordering': ['-score', 'pk'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('resources', '0033_termextraction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Waiting'), ('running', 'Searching'), ('done', 'Finished'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('message', models.TextField(blank=True)),
+                ('threshold', models.FloatField()),
+                ('num_of_entries', models.PositiveIntegerField(default=0)),
+                ('group_count', models.PositiveIntegerField(default=0)),
+                ('conflict_count', models.PositiveIntegerField(default=0)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('finished_on', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicate_reports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'duplicate report',
+                'verbose_name_plural': 'duplicate reports',
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateReportEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group', models.PositiveIntegerField()),
+                ('is_exact', models.BooleanField(default=True)),
+                ('has_conflict', models.BooleanField(default=False)),
+                ('source', models.CharField(max_length=250)),
+                ('target', models.CharField(max_length=250)),
+                ('entry', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicate_report_items', to='resources.entry')),
+                ('glossary', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicate_report_items', to='resources.glossary')),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='resources.duplicatereport')),
+            ],
+            options={
+                'verbose_name': 'duplicate report entry',
+                'verbose_name_plural': 'duplicate report entries',
+                'ordering': ['group', 'source', 'pk'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='duplicatereportentry',
+            index=models.Index(fields=['report', 'group'], name='resources_d_report__50c521_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0034_duplicatereport'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['glossary', 'source', 'id'], name='resources_e_glossar_868cb9_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['glossary', 'target', 'id'], name='resources_e_glossar_fabecb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['glossary', 'created_on', 'id'], name='resources_e_glossar_1c4232_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['glossary', 'updated_on', 'id'], name='resources_e_glossar_ed793d_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0035_entry_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='source_norm',
+            field=models.CharField(blank=True, db_index=True, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='target_norm',
+            field=models.CharField(blank=True, db_index=True, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='source_norm',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='target_norm',
+            field=models.TextField(blank=True),
+        ),
+    ]
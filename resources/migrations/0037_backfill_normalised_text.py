@@ -0,0 +1,51 @@
+import unicodedata
+
+from django.conf import settings
+from django.db import migrations
+
+
+# Katakana (ァ-ヶ, ヽ, ヾ) -> hiragana (ぁ-ゖ, ゝ, ゞ)
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in [*range(0x30A1, 0x30F7), 0x30FD, 0x30FE]}
+
+
+def normalise_text(text):
+    """
+    Copy of resources.text.normalise_text() as it was when this migration was written, so that
+    later changes to it do not change what the migration does. Run "manage.py normalise_search_text"
+    to apply such changes to existing rows.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if getattr(settings, "SEARCH_FOLD_KANA", False):
+        text = text.translate(KATAKANA_TO_HIRAGANA)
+    return text
+
+
+def update_normalised_columns(model, batch_size):
+    """ Copy of resources.text.update_normalised_columns() as it was when this migration was written. """
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by("pk").only("source", "target")[:batch_size])
+        if not batch:
+            return
+        for obj in batch:
+            obj.source_norm = normalise_text(obj.source)
+            obj.target_norm = normalise_text(obj.target)
+        model.objects.bulk_update(batch, ["source_norm", "target_norm"])
+        last_pk = batch[-1].pk
+
+
+def backfill_normalised_text(apps, schema_editor):
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+    update_normalised_columns(apps.get_model("resources", "Entry"), batch_size)
+    update_normalised_columns(apps.get_model("resources", "Segment"), batch_size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0036_normalised_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_normalised_text, migrations.RunPython.noop),
+    ]
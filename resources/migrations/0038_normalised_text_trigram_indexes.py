@@ -0,0 +1,39 @@
+from django.db import migrations
+
+
+# Trigram indexes let PostgreSQL use an index for the "contains" (LIKE '%...%') searches
+# of the normalised columns. Other databases have no equivalent, so nothing is done for them.
+INDEXES = (
+    ("resources_entry", "source_norm"),
+    ("resources_entry", "target_norm"),
+    ("resources_segment", "source_norm"),
+    ("resources_segment", "target_norm"),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, column in INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm ON {table} USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table, column in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0037_backfill_normalised_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:55
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0038_normalised_text_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('search', 'Search'), ('autocomplete', 'Autocomplete')], default='search', max_length=20)),
+                ('query', models.CharField(max_length=200)),
+                ('query_norm', models.CharField(max_length=200)),
+                ('resource', models.CharField(blank=True, max_length=250)),
+                ('mode', models.CharField(blank=True, max_length=20)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('latency', models.FloatField()),
+                ('created_on', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'search log',
+                'verbose_name_plural': 'search logs',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['kind', 'created_on'], name='resources_s_kind_cdc334_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchlog',
+            index=models.Index(fields=['query_norm', 'resource'], name='resources_s_query_n_67f0eb_idx'),
+        ),
+    ]
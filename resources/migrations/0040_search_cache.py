@@ -0,0 +1,43 @@
+# Generated by Django 4.0.6 on 2026-10-19 14:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0039_search_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=200)),
+                ('query_norm', models.CharField(max_length=200)),
+                ('resource', models.CharField(blank=True, max_length=250)),
+                ('language', models.CharField(blank=True, max_length=20)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('results', models.JSONField(default=list)),
+                ('updated_on', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'search cache',
+                'verbose_name_plural': 'search caches',
+            },
+        ),
+        migrations.AddField(
+            model_name='searchlog',
+            name='language',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='searchcache',
+            index=models.Index(fields=['resource'], name='resources_s_resourc_091e68_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchcache',
+            constraint=models.UniqueConstraint(fields=('query_norm', 'resource', 'language'), name='unique_search_cache'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.6 on 2026-10-19 15:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('resources', '0040_search_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='translation',
+            name='archive_name',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+    ]
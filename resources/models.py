@@ -1,8 +1,22 @@
+import uuid
+
 from django.db import models
 from django.urls import reverse
 from django.conf import settings
+from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 
+from .text import normalise_text
+
+
+class ResourceQuerySet(models.QuerySet):
+    """
+    QuerySet for Glossary and Translation objects.
+    Resources being deleted in the background are hidden from users.
+    """
+    def available(self):
+        return self.filter(is_deleting=False)
+
 
 class Glossary(models.Model):
     glossary_file = models.FileField(
@@ -25,6 +39,10 @@ class Glossary(models.Model):
         on_delete=models.SET_NULL,
     )
     notes = models.TextField(blank=True)
+    # Set while the glossary and its entries are being deleted in the background
+    is_deleting = models.BooleanField(default=False)
+
+    objects = ResourceQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'glossary'
@@ -50,6 +68,10 @@ class Entry(models.Model):
     )
     source = models.CharField(max_length=250)
     target = models.CharField(max_length=250)
+    # Normalised forms of source and target matched by searches (see text.normalise_text),
+    # set by save() and by the importers
+    source_norm = models.CharField(max_length=1000, blank=True, db_index=True)
+    target_norm = models.CharField(max_length=1000, blank=True, db_index=True)
     notes = models.TextField(blank=True)
     created_on = models.DateTimeField(auto_now_add=True)
     created_by = models.ForeignKey(
@@ -69,6 +91,13 @@ class Entry(models.Model):
     class Meta:
         verbose_name = 'entry'
         verbose_name_plural = 'entries'
+        # indexes used to sort the entries of a glossary (see forms.EntryFilterForm)
+        indexes = [
+            models.Index(fields=['glossary', 'source', 'id']),
+            models.Index(fields=['glossary', 'target', 'id']),
+            models.Index(fields=['glossary', 'created_on', 'id']),
+            models.Index(fields=['glossary', 'updated_on', 'id']),
+        ]
 
     def __str__(self):
         return f'{self.source} : {self.target}'
@@ -76,6 +105,11 @@ class Entry(models.Model):
     def get_absolute_url(self):
         return reverse('entry_detail', args=[str(self.id)])
 
+    def save(self, *args, **kwargs):
+        self.source_norm = normalise_text(self.source)
+        self.target_norm = normalise_text(self.target)
+        super().save(*args, **kwargs)
+
 
 class Translation(models.Model):
     translation_file = models.FileField(
@@ -93,6 +127,27 @@ class Translation(models.Model):
         null=True,
         on_delete=models.SET_NULL,
     )
+    # Language codes of the main language pair, and of all the languages of the segments
+    source_lang = models.CharField(max_length=20, blank=True)
+    target_lang = models.CharField(max_length=20, blank=True)
+    languages = models.CharField(max_length=255, blank=True)
+    # Set while the translation and its segments are being deleted in the background
+    is_deleting = models.BooleanField(default=False)
+    # Segments are stored as Segment rows, as compressed SegmentBlock objects,
+    # or in a read-only archive file (see segment_store.py)
+    ROWS = 'rows'
+    COMPRESSED = 'compressed'
+    ARCHIVED = 'archived'
+    STORAGE_CHOICES = (
+        (ROWS, 'Database rows'),
+        (COMPRESSED, 'Compressed blocks'),
+        (ARCHIVED, 'Read-only archive'),
+    )
+    storage = models.CharField(max_length=20, choices=STORAGE_CHOICES, default=ROWS)
+    # Name of the archive file in SEGMENT_ARCHIVE_STORAGE, if the translation is archived
+    archive_name = models.CharField(max_length=255, blank=True)
+
+    objects = ResourceQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'translation'
@@ -119,10 +174,557 @@ class Segment(models.Model):
     )
     source = models.TextField()
     target = models.TextField()
+    # Normalised forms of source and target matched by searches (see text.normalise_text),
+    # set by save() and by the importers. On PostgreSQL they have trigram indexes (see migration 0038).
+    source_norm = models.TextField(blank=True)
+    target_norm = models.TextField(blank=True)
+    source_lang = models.CharField(max_length=20, blank=True)
+    target_lang = models.CharField(max_length=20, blank=True)
 
     class Meta:
         verbose_name = 'segment'
         verbose_name_plural = 'segments'
+        # indexes used by searches filtered by language
+        indexes = [
+            models.Index(fields=['source_lang']),
+            models.Index(fields=['target_lang']),
+        ]
 
     def __str__(self):
         return f'{self.source} : {self.target}'
+
+    def save(self, *args, **kwargs):
+        self.source_norm = normalise_text(self.source)
+        self.target_norm = normalise_text(self.target)
+        super().save(*args, **kwargs)
+
+
+class SegmentBlock(models.Model):
+    '''
+    Model for a block of consecutive segments of a translation, stored compressed.
+    Used instead of Segment objects by translations whose storage is "compressed".
+    The n-gram filter is checked by searches before the block is decompressed.
+    Child model of the Translation model.
+    '''
+    translation = models.ForeignKey(
+        Translation,
+        related_name="segment_blocks",
+        on_delete=models.CASCADE,
+    )
+    number = models.PositiveIntegerField()
+    segment_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    ngram_filter = models.BinaryField()
+
+    class Meta:
+        verbose_name = 'segment block'
+        verbose_name_plural = 'segment blocks'
+        ordering = ['translation', 'number']
+        constraints = [
+            models.UniqueConstraint(fields=['translation', 'number'], name='unique_segment_block_number'),
+        ]
+
+    def __str__(self):
+        return f'{self.translation} block {self.number}'
+
+
+class ImportJob(models.Model):
+    '''
+    Model for the import of a zip archive of glossary or translation files.
+    Each file in the archive is imported as a separate resource in the background,
+    and its progress is recorded in an ImportJobItem.
+    '''
+    KIND_CHOICES = (
+        ('glossary', 'Glossaries'),
+        ('translation', 'Translations'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    archive = models.FileField(
+        null=True,
+        upload_to="import_archives",
+    )
+    # Details applied to every resource imported from the archive
+    field = models.CharField(max_length=255, blank=True)
+    client = models.CharField(max_length=255, blank=True)
+    notes = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='import_jobs',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+
+    class Meta:
+        verbose_name = 'import job'
+        verbose_name_plural = 'import jobs'
+
+    def __str__(self):
+        return f'{self.get_kind_display()} imported on {self.created_on:%Y-%m-%d %H:%M}'
+
+    def get_absolute_url(self):
+        return reverse('import_job_detail', args=[str(self.id)])
+
+    @property
+    def is_finished(self):
+        return not self.items.filter(status__in=[ImportJobItem.PENDING, ImportJobItem.RUNNING]).exists()
+
+
+class ImportJobItem(models.Model):
+    '''
+    Model for one file of an imported zip archive.
+    Child model of the ImportJob model.
+    '''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+    STATUS_CHOICES = (
+        (PENDING, 'Waiting'),
+        (RUNNING, 'Importing'),
+        (DONE, 'Imported'),
+        (FAILED, 'Failed'),
+        (SKIPPED, 'Skipped'),
+    )
+
+    job = models.ForeignKey(
+        ImportJob,
+        related_name="items",
+        on_delete=models.CASCADE,
+    )
+    member_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    message = models.TextField(blank=True)
+    imported = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    glossary = models.ForeignKey(
+        Glossary,
+        related_name="import_items",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    translation = models.ForeignKey(
+        Translation,
+        related_name="import_items",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    class Meta:
+        verbose_name = 'import job item'
+        verbose_name_plural = 'import job items'
+        ordering = ['pk']
+
+    def __str__(self):
+        return self.member_name
+
+
+class ChunkedUpload(models.Model):
+    '''
+    Model for a translation file uploaded in chunks.
+    The chunks are appended to a file on disk, so an interrupted upload can be resumed
+    from the last chunk received. Once all chunks have been received, the file is imported
+    in the background.
+    '''
+    UPLOADING = 'uploading'
+    IMPORTING = 'importing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (UPLOADING, 'Uploading'),
+        (IMPORTING, 'Importing'),
+        (DONE, 'Imported'),
+        (FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    upload_file = models.FileField(
+        null=True,
+        upload_to="chunked_uploads",
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    # Number of bytes received so far
+    offset = models.PositiveBigIntegerField(default=0)
+    # SHA-256 hash of the whole file, checked once all chunks have been received
+    checksum = models.CharField(max_length=64, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    message = models.TextField(blank=True)
+    # Details of the translation to be created from the file
+    job_number = models.CharField(max_length=255, blank=True)
+    field = models.CharField(max_length=255, blank=True)
+    client = models.CharField(max_length=255, blank=True)
+    notes = models.TextField(blank=True)
+    translation = models.ForeignKey(
+        Translation,
+        related_name="chunked_uploads",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    import_job = models.ForeignKey(
+        ImportJob,
+        related_name="chunked_uploads",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='chunked_uploads',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+
+    class Meta:
+        verbose_name = 'chunked upload'
+        verbose_name_plural = 'chunked uploads'
+
+    def __str__(self):
+        return self.filename
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.size
+
+
+class TermCheck(models.Model):
+    '''
+    Model for a check of the terms used in a translation against a set of glossaries.
+    The check is run in the background; its results are saved as TermCheckIssue objects.
+    '''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Waiting'),
+        (RUNNING, 'Checking'),
+        (DONE, 'Finished'),
+        (FAILED, 'Failed'),
+    )
+
+    translation = models.ForeignKey(
+        Translation,
+        related_name="term_checks",
+        on_delete=models.CASCADE,
+    )
+    glossaries = models.ManyToManyField(
+        Glossary,
+        related_name="term_checks",
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    message = models.TextField(blank=True)
+    num_of_terms = models.PositiveIntegerField(default=0)
+    segments_checked = models.PositiveIntegerField(default=0)
+    # All issues are counted, but only the first TERM_CHECK_MAX_ISSUES are saved
+    issue_count = models.PositiveIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='term_checks',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'term check'
+        verbose_name_plural = 'term checks'
+
+    def __str__(self):
+        return f'Term check of {self.translation}'
+
+    def get_absolute_url(self):
+        return reverse('term_check_detail', args=[str(self.id)])
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class TermCheckIssue(models.Model):
+    '''
+    Model for a segment whose source contains a glossary term
+    but whose target does not contain the approved translation of the term.
+    Child model of the TermCheck model.
+    '''
+    term_check = models.ForeignKey(
+        TermCheck,
+        related_name="issues",
+        on_delete=models.CASCADE,
+    )
+    # Position of the segment in the translation, starting from 1
+    segment_number = models.PositiveIntegerField()
+    source = models.TextField()
+    target = models.TextField()
+    term_source = models.CharField(max_length=250)
+    term_target = models.CharField(max_length=250)
+    entry = models.ForeignKey(
+        Entry,
+        related_name="term_check_issues",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    class Meta:
+        verbose_name = 'term check issue'
+        verbose_name_plural = 'term check issues'
+        ordering = ['pk']
+
+    def __str__(self):
+        return f'{self.segment_number}: {self.term_source}'
+
+
+class TermExtraction(models.Model):
+    '''
+    Model for a run of the extract_terms management command over a translation.
+    The term pairs it proposes are saved as TermCandidate objects to be reviewed.
+    '''
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (RUNNING, 'Extracting'),
+        (DONE, 'Finished'),
+        (FAILED, 'Failed'),
+    )
+
+    translation = models.ForeignKey(
+        Translation,
+        related_name="term_extractions",
+        on_delete=models.CASCADE,
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=RUNNING)
+    message = models.TextField(blank=True)
+    num_of_segments = models.PositiveIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='term_extractions',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'term extraction'
+        verbose_name_plural = 'term extractions'
+
+    def __str__(self):
+        return f'Term extraction from {self.translation}'
+
+    def get_absolute_url(self):
+        return reverse('term_extraction_detail', args=[str(self.id)])
+
+
+class TermCandidate(models.Model):
+    '''
+    Model for a source and target term pair proposed by a term extraction.
+    Accepted candidates are added to a glossary as Entry objects.
+    Child model of the TermExtraction model.
+    '''
+    PROPOSED = 'proposed'
+    ACCEPTED = 'accepted'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = (
+        (PROPOSED, 'Proposed'),
+        (ACCEPTED, 'Accepted'),
+        (REJECTED, 'Rejected'),
+    )
+
+    extraction = models.ForeignKey(
+        TermExtraction,
+        related_name="candidates",
+        on_delete=models.CASCADE,
+    )
+    source = models.CharField(max_length=250)
+    target = models.CharField(max_length=250)
+    # Number of segments containing the source term, the target term, and both
+    source_count = models.PositiveIntegerField()
+    target_count = models.PositiveIntegerField()
+    cooccurrences = models.PositiveIntegerField()
+    score = models.FloatField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PROPOSED)
+    entry = models.ForeignKey(
+        Entry,
+        related_name="term_candidates",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+
+    class Meta:
+        verbose_name = 'term candidate'
+        verbose_name_plural = 'term candidates'
+        ordering = ['-score', 'pk']
+
+    def __str__(self):
+        return f'{self.source} : {self.target}'
+
+
+class DuplicateReport(models.Model):
+    '''
+    Model for a search for duplicate and near-duplicate source terms across all glossaries.
+    The search is run in the background; the groups of duplicates found are saved as
+    DuplicateReportEntry objects.
+    '''
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Waiting'),
+        (RUNNING, 'Searching'),
+        (DONE, 'Finished'),
+        (FAILED, 'Failed'),
+    )
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    message = models.TextField(blank=True)
+    # Minimum similarity of near-duplicate source terms (see duplicates.py)
+    threshold = models.FloatField()
+    num_of_entries = models.PositiveIntegerField(default=0)
+    group_count = models.PositiveIntegerField(default=0)
+    conflict_count = models.PositiveIntegerField(default=0)
+    created_on = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name='duplicate_reports',
+        null=True,
+        on_delete=models.SET_NULL,
+    )
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'duplicate report'
+        verbose_name_plural = 'duplicate reports'
+
+    def __str__(self):
+        return f'Duplicate report of {self.created_on:%Y-%m-%d %H:%M}'
+
+    def get_absolute_url(self):
+        return reverse('duplicate_report_detail', args=[str(self.id)])
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+
+class DuplicateReportEntry(models.Model):
+    '''
+    Model for an entry belonging to a group of entries with the same or similar source terms.
+    The source and target terms are copied from the entry, so that the report can still be
+    read after the entry has been changed or deleted.
+    Child model of the DuplicateReport model.
+    '''
+    report = models.ForeignKey(
+        DuplicateReport,
+        related_name="items",
+        on_delete=models.CASCADE,
+    )
+    # Groups are numbered from 1, conflicting groups first
+    group = models.PositiveIntegerField()
+    # Set on every entry of the group: all source terms are the same once normalised,
+    # and the group has more than one target term
+    is_exact = models.BooleanField(default=True)
+    has_conflict = models.BooleanField(default=False)
+    entry = models.ForeignKey(
+        Entry,
+        related_name="duplicate_report_items",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    glossary = models.ForeignKey(
+        Glossary,
+        related_name="duplicate_report_items",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    source = models.CharField(max_length=250)
+    target = models.CharField(max_length=250)
+
+    class Meta:
+        verbose_name = 'duplicate report entry'
+        verbose_name_plural = 'duplicate report entries'
+        ordering = ['group', 'source', 'pk']
+        indexes = [models.Index(fields=['report', 'group'])]
+
+    def __str__(self):
+        return f'{self.group}: {self.source} : {self.target}'
+
+
+class SearchLog(models.Model):
+    '''
+    Model for a search made by a user, recorded for the search analytics page.
+    Written in batches by telemetry.SearchLogWriter, not by the request itself.
+    '''
+    SEARCH = 'search'
+    AUTOCOMPLETE = 'autocomplete'
+    KIND_CHOICES = (
+        (SEARCH, 'Search'),
+        (AUTOCOMPLETE, 'Autocomplete'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=SEARCH)
+    query = models.CharField(max_length=200)
+    # normalise_text() of the query, so that searches differing only in case or width are counted together
+    query_norm = models.CharField(max_length=200)
+    # Title of the glossary or job number of the translation searched, empty for all resources
+    resource = models.CharField(max_length=250, blank=True)
+    # Search mode (text, regex or wildcard)
+    mode = models.CharField(max_length=20, blank=True)
+    # Language of the segments searched, empty for all languages
+    language = models.CharField(max_length=20, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    # Time taken by the search, in milliseconds
+    latency = models.FloatField()
+    created_on = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'search log'
+        verbose_name_plural = 'search logs'
+        indexes = [
+            models.Index(fields=['kind', 'created_on']),
+            models.Index(fields=['query_norm', 'resource']),
+        ]
+
+    def __str__(self):
+        return f'{self.query} ({self.hits} hits, {self.latency:.0f} ms)'
+
+
+class SearchCache(models.Model):
+    '''
+    Model for the precomputed results of a frequent text search (see search_cache.py).
+    The results are stored as references to the entries and segments found (and the text of
+    the segments of compressed and archived translations), in ranked order.
+    '''
+    query = models.CharField(max_length=200)
+    query_norm = models.CharField(max_length=200)
+    # Title of the glossary or job number of the translation searched, empty for all resources
+    resource = models.CharField(max_length=250, blank=True)
+    language = models.CharField(max_length=20, blank=True)
+    hits = models.PositiveIntegerField(default=0)
+    results = models.JSONField(default=list)
+    # Time at which the results were computed
+    updated_on = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'search cache'
+        verbose_name_plural = 'search caches'
+        constraints = [
+            models.UniqueConstraint(fields=['query_norm', 'resource', 'language'], name='unique_search_cache'),
+        ]
+        indexes = [models.Index(fields=['resource'])]
+
+    def __str__(self):
+        return f'{self.query} ({self.hits} hits)'
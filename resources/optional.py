@@ -0,0 +1,27 @@
+"""
+Optional third-party packages, imported on first use.
+
+openpyxl (which itself imports NumPy), NumPy and spaCy take far longer to import than the
+rest of the application, and only a few requests and commands need them. Modules using
+them call load() where the package is needed instead of importing it at the top of the
+module, so that web workers and management commands start without paying for them.
+A package is imported once per process and then shared by all threads and requests.
+"""
+import importlib
+import importlib.util
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def is_installed(name):
+    """ Returns True if a package can be imported, without importing it. """
+    return importlib.util.find_spec(name) is not None
+
+
+@lru_cache(maxsize=None)
+def load(name):
+    """ Imports a package and returns it, or returns None if it is not installed. """
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
@@ -0,0 +1,469 @@
+"""
+Regular expression and wildcard searches.
+
+Python regular expressions cannot be run by the database, and running one over every entry
+and segment would read the whole database. Patterns are therefore searched in two steps:
+
+1. The literal strings which any match must contain (e.g. "電極" in "電極\\d+") are taken from
+   the parsed pattern, and the candidates are the entries and segments containing all of
+   them, found with the normalised search columns and their indexes (or the n-gram indexes
+   of compressed and archived translations).
+2. The regular expression is applied to the normalised text of the candidates (the same text
+   the candidates were found in), in a separate process (see pattern_worker.py).
+
+Patterns are normalised like queries (see text.normalise_text), so "ＡＢＣ\\d" finds "abc1".
+
+The matching processes are kept in a pool of at most SEARCH_PATTERN_WORKERS processes and
+reused by successive searches, so a search does not wait for a new process to start.
+As Python's re module has no timeout, a process still running a pattern once
+SEARCH_PATTERN_TIMEOUT seconds have passed is killed (and later replaced), and expensive
+patterns are refused before they run: patterns must contain a literal string of at least
+MIN_LITERAL_LENGTH characters and at most MAX_UNBOUNDED_REPEATS unbounded repeats ("*", "+",
+"{n,}"), and backreferences,
+alternatives or nested repeats inside unbounded repeats (e.g. "(a|b)+" or "(a+)+") and
+adjacent unbounded repeats (e.g. ".*.*") are refused, as all of these can take exponential or
+high polynomial time. At most SEARCH_PATTERN_MAX_CANDIDATES candidates are read, and texts
+longer than SEARCH_PATTERN_MAX_TEXT_LENGTH characters are not searched. A search cut short by
+these limits is reported as incomplete.
+
+Wildcard patterns are converted to regular expressions: "*" matches any characters and "?"
+any single character. Patterns are matched ignoring case.
+"""
+import multiprocessing
+import os
+import re
+import threading
+import time
+from contextlib import closing, contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.db.models import Q
+
+from . import pattern_worker
+from .models import Segment
+from .text import normalise_text, normalised_positions
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+
+REGEX = "regex"
+WILDCARD = "wildcard"
+PATTERN_MODES = (REGEX, WILDCARD)
+
+MAX_PATTERN_LENGTH = 200
+MIN_LITERAL_LENGTH = 2
+MAX_UNBOUNDED_REPEATS = 3
+# Number of candidates sent to the matching process at once
+MATCH_BATCH_SIZE = 500
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+_REPEATS = {sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT}
+_POSSESSIVE_REPEAT = getattr(sre_parse, "POSSESSIVE_REPEAT", None)
+
+
+class PatternError(ValueError):
+    pass
+
+
+def wildcard_to_regex(pattern):
+    """ Converts a wildcard pattern ("*" and "?") to a regular expression. """
+    # "**" is the same as "*", but would be two adjacent unbounded repeats
+    pattern = re.sub(r"\*+", "*", pattern)
+    return "".join(
+        ".*" if char == "*" else "." if char == "?" else re.escape(char)
+        for char in pattern
+    )
+
+
+def normalise_pattern(expression):
+    """
+    Normalises the characters of a regular expression like normalise_text(), except for
+    escape sequences, which are kept as they are (so that e.g. "\\D" does not become "\\d").
+    Characters which become special characters (e.g. "（" becomes "(") are escaped.
+    """
+    pieces = []
+    chars = iter(expression)
+    for char in chars:
+        if char == "\\":
+            pieces.append(char + next(chars, ""))
+            continue
+        normalised = normalise_text(char)
+        if char not in REGEX_METACHARACTERS and REGEX_METACHARACTERS & set(normalised):
+            normalised = re.escape(normalised)
+        pieces.append(normalised)
+    return "".join(pieces)
+
+
+def _is_repeat(op):
+    return op in _REPEATS or op == _POSSESSIVE_REPEAT
+
+
+def _subpatterns(op, av):
+    """ Returns the parsed subpatterns of an item of a parsed pattern. """
+    if _is_repeat(op):
+        return [av[2]]
+    if op == sre_parse.SUBPATTERN:
+        return [av[3]]
+    if op == sre_parse.BRANCH:
+        return av[1]
+    if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+        return [av[1]]
+    return []
+
+
+def _check_complexity(parsed, in_unbounded_repeat=False):
+    """
+    Raises PatternError for backreferences, for alternatives and unbounded repeats inside
+    unbounded repeats and for adjacent unbounded repeats.
+    Returns the number of unbounded repeats in the parsed pattern.
+    """
+    count = 0
+    previous_unbounded = False
+    for op, av in parsed:
+        if op in (sre_parse.GROUPREF, sre_parse.GROUPREF_EXISTS):
+            raise PatternError("Backreferences cannot be used in searches.")
+        if op == sre_parse.BRANCH and in_unbounded_repeat:
+            raise PatternError('Alternatives cannot be repeated without a limit in searches, as in "(a|b)+".')
+        unbounded = _is_repeat(op) and av[1] == sre_parse.MAXREPEAT
+        if unbounded and in_unbounded_repeat:
+            raise PatternError('Nested repeats such as "(a+)+" cannot be used in searches.')
+        if unbounded and previous_unbounded:
+            raise PatternError('Adjacent repeats such as ".*.*" cannot be used in searches.')
+        previous_unbounded = unbounded
+        count += unbounded
+        for subpattern in _subpatterns(op, av):
+            count += _check_complexity(subpattern, in_unbounded_repeat or unbounded)
+    return count
+
+
+def required_literals(parsed):
+    """
+    Returns the runs of literal characters in the sequence of a parsed pattern (including
+    those of its groups, but not of alternatives or repeats), which every match must contain.
+    """
+    literals = []
+    current = []
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            current.append(chr(av))
+        elif op == sre_parse.SUBPATTERN:
+            # The literals of a group's own sequence are required as well
+            literals.append("".join(current))
+            literals.extend(required_literals(av[3]))
+            current = []
+        else:
+            literals.append("".join(current))
+            current = []
+    literals.append("".join(current))
+    return [literal for literal in literals if literal]
+
+
+class SearchPattern:
+    """ A compiled search pattern, normalised like the search columns, and the literal strings its matches contain. """
+    def __init__(self, text, mode=REGEX):
+        if len(text) > MAX_PATTERN_LENGTH:
+            raise PatternError(f"Patterns can be at most {MAX_PATTERN_LENGTH} characters long.")
+        if mode == WILDCARD:
+            expression = wildcard_to_regex(normalise_text(text))
+        else:
+            expression = normalise_pattern(text)
+        try:
+            parsed = sre_parse.parse(expression, re.IGNORECASE)
+            self.regex = re.compile(expression, re.IGNORECASE)
+        except re.error as e:
+            raise PatternError(f"Invalid regular expression: {e}.")
+
+        if _check_complexity(parsed) > MAX_UNBOUNDED_REPEATS:
+            raise PatternError(
+                f'Patterns can contain at most {MAX_UNBOUNDED_REPEATS} unlimited repeats ("*", "+" or "{{n,}}").'
+            )
+        self.literals = required_literals(parsed)
+        if not any(len(literal) >= MIN_LITERAL_LENGTH for literal in self.literals):
+            raise PatternError(
+                f"Patterns must contain at least {MIN_LITERAL_LENGTH} characters in a row "
+                f"which are not wildcards or special characters."
+            )
+        self.text = text
+        self.mode = mode
+
+    def candidate_filter(self):
+        """ Returns the filter matching the entries or segments containing all the literals in one of their texts. """
+        in_source = Q(*[Q(source_norm__contains=literal) for literal in self.literals])
+        in_target = Q(*[Q(target_norm__contains=literal) for literal in self.literals])
+        return in_source | in_target
+
+    def longest_literal(self):
+        return max(self.literals, key=len)
+
+
+class MatchTimeout(Exception):
+    pass
+
+
+def _process_context():
+    """ Returns the multiprocessing context of the matching processes, which start without the application. """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([pattern_worker.__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+class PatternWorker:
+    """ A process running pattern_worker.run(), which can be sent the texts of any number of searches. """
+    def __init__(self):
+        context = _process_context()
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=pattern_worker.run, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+
+    def stop(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class WorkerPool:
+    """
+    The matching processes of this process's searches. At most size processes exist at once;
+    a search waits for one to be free, until its deadline. Processes are started when first
+    needed and kept for the following searches, except those stopped part way through a
+    match, which are killed.
+    """
+    def __init__(self, size):
+        self.slots = threading.BoundedSemaphore(size)
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def acquire(self, deadline):
+        """ Returns a free PatternWorker. Raises MatchTimeout if there is none before the deadline. """
+        if not self.slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise MatchTimeout()
+        try:
+            with self.lock:
+                worker = self.idle.pop() if self.idle else None
+            if worker is not None and not worker.process.is_alive():
+                worker.stop()
+                worker = None
+            return worker or PatternWorker()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, worker, reuse=True):
+        """ Returns a worker to the pool, or kills it if it cannot be reused. """
+        if reuse:
+            with self.lock:
+                self.idle.append(worker)
+        else:
+            worker.stop()
+        self.slots.release()
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_worker_pool():
+    """ Returns the WorkerPool of this process, creating it on first use (and again in a forked child). """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = WorkerPool(getattr(settings, "SEARCH_PATTERN_WORKERS", 4))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+class PatternMatcher:
+    """
+    Runs a search pattern in a process of the worker pool (see pattern_worker.py), which is
+    killed if the deadline passes before it has finished. Used as a context manager.
+    """
+    def __init__(self, pattern, deadline, pool=None):
+        self.pattern = pattern
+        self.deadline = deadline
+        self.pool = pool
+        self.worker = None
+        self.busy = False
+
+    def __enter__(self):
+        return self
+
+    def match(self, texts):
+        """
+        Returns the results of pattern_worker.run() for a list of (source, target) pairs.
+        Raises MatchTimeout if they are not ready by the deadline.
+        """
+        if self.worker is None:
+            self.pool = self.pool or get_worker_pool()
+            self.worker = self.pool.acquire(self.deadline)
+        self.busy = True
+        self.worker.connection.send((self.pattern.regex.pattern, self.pattern.regex.flags, texts))
+        if not self.worker.connection.poll(max(self.deadline - time.monotonic(), 0)):
+            raise MatchTimeout()
+        results = self.worker.connection.recv()
+        self.busy = False
+        return results
+
+    def __exit__(self, exc_type, *exc_info):
+        if self.worker is not None:
+            # A worker still matching, or which failed, is not reused
+            self.pool.release(self.worker, reuse=not self.busy and exc_type is None)
+            self.worker = None
+
+
+def _original_spans(text, normalised, spans):
+    """ Maps the spans of matches in the normalised form of text to spans in text. """
+    if not spans:
+        return []
+    by_chunk, starts, ends = normalised_positions(text)
+    if by_chunk != normalised:
+        # The normalisation of the whole text differs, so positions cannot be mapped back
+        return []
+    return [(starts[start], ends[end - 1]) for start, end in spans]
+
+
+@contextmanager
+def statement_timeout(connection, seconds):
+    """ Limits the time taken by each query of the block on PostgreSQL; other databases have no such setting. """
+    if connection.vendor != "postgresql":
+        yield
+        return
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL statement_timeout = %s", [int(seconds * 1000)])
+        yield
+
+
+class PatternSearchSource:
+    """
+    A search source, used by run_search() alongside the other sources, matching a pattern
+    against the candidates of a queryset of entries or segments. The candidates are read
+    until SEARCH_PATTERN_MAX_CANDIDATES have been read or the deadline has passed, in which
+    case incomplete is set.
+    """
+    def __init__(self, name, queryset, pattern, deadline, priority=0):
+        self.name = name
+        self.queryset = queryset
+        self.pattern = pattern
+        self.deadline = deadline
+        self.priority = priority
+        self.incomplete = False
+
+    def candidates(self, max_candidates):
+        """ Yields the objects to which the pattern is applied. """
+        queryset = self.queryset.filter(self.pattern.candidate_filter()).order_by("pk")
+        timeout = max(self.deadline - time.monotonic(), 0.1)
+        try:
+            with statement_timeout(connections[queryset.db], timeout):
+                yield from queryset[:max_candidates].iterator(chunk_size=MATCH_BATCH_SIZE)
+        except OperationalError:
+            # The query was cancelled by the statement timeout
+            self.incomplete = True
+
+    def matches(self):
+        """ Yields the candidates matching the pattern, with match_rank, match_length and the spans of the matches. """
+        max_candidates = getattr(settings, "SEARCH_PATTERN_MAX_CANDIDATES", 50000)
+        max_length = getattr(settings, "SEARCH_PATTERN_MAX_TEXT_LENGTH", 5000)
+        read = 0
+        candidates = self.candidates(max_candidates)
+        with PatternMatcher(self.pattern, self.deadline) as matcher, closing(candidates):
+            while True:
+                batch = list(islice(candidates, MATCH_BATCH_SIZE))
+                if not batch:
+                    break
+                read += len(batch)
+                for obj in batch:
+                    # Segments of compressed and archived translations have no normalised columns
+                    obj.source_norm = obj.source_norm or normalise_text(obj.source)
+                    obj.target_norm = obj.target_norm or normalise_text(obj.target)
+                texts = [
+                    tuple(text if len(text) <= max_length else None for text in (obj.source_norm, obj.target_norm))
+                    for obj in batch
+                ]
+                try:
+                    results = matcher.match(texts)
+                except MatchTimeout:
+                    self.incomplete = True
+                    return
+                for obj, (source, target), result in zip(batch, texts, results):
+                    if result is None:
+                        if source is None or target is None:
+                            # A text too long to be searched might have matched
+                            self.incomplete = True
+                        continue
+                    (obj.match_rank, side), obj.source_match_spans, obj.target_match_spans = result
+                    obj.match_length = len(obj.target if side else obj.source)
+                    yield obj
+                if time.monotonic() > self.deadline:
+                    self.incomplete = True
+                    return
+        if read >= max_candidates:
+            self.incomplete = True
+
+    def fetch(self, limit=None):
+        """
+        Returns the top results and the number of matches found, like SearchSource.fetch().
+        The positions of the matches in their source and target are set as source_spans and target_spans.
+        """
+        results = sorted(self.matches(), key=lambda obj: (obj.match_rank, obj.match_length, obj.pk or 0))
+        total = len(results)
+        if limit:
+            results = results[:limit]
+        for position, obj in enumerate(results):
+            obj.search_rank = (obj.match_rank, obj.match_length, self.priority, position)
+            obj.source_spans = _original_spans(obj.source, obj.source_norm, obj.source_match_spans)
+            obj.target_spans = _original_spans(obj.target, obj.target_norm, obj.target_match_spans)
+        return results, total
+
+
+class StoredPatternSearchSource(PatternSearchSource):
+    """
+    Pattern search of compressed or archived translations. The candidates are the segments
+    found by the n-gram index of a StoredSegmentSource for the longest literal of the pattern.
+    """
+    def __init__(self, stored_source, pattern, deadline):
+        super().__init__(stored_source.name, None, pattern, deadline, stored_source.priority)
+        self.stored_source = stored_source
+
+    def candidates(self, max_candidates):
+        language = self.stored_source.language
+        read = 0
+        for translation, segments in self.stored_source.candidate_segments():
+            for source, target, source_lang, target_lang in segments:
+                if language and language not in (source_lang, target_lang):
+                    continue
+                if read >= max_candidates:
+                    return
+                read += 1
+                yield Segment(
+                    translation=translation,
+                    source=source,
+                    target=target,
+                    source_lang=source_lang,
+                    target_lang=target_lang,
+                )
+
+
+def pattern_search_sources(pattern, sources, stored_sources):
+    """
+    Returns the pattern search sources for (name, queryset, priority) tuples and for the
+    StoredSegmentSource objects of compressed and archived translations. They share the
+    deadline of the search.
+    """
+    deadline = time.monotonic() + getattr(settings, "SEARCH_PATTERN_TIMEOUT", 3.0)
+    return [
+        PatternSearchSource(name, queryset, pattern, deadline, priority)
+        for name, queryset, priority in sources
+    ] + [
+        StoredPatternSearchSource(stored_source, pattern, deadline)
+        for stored_source in stored_sources
+    ]
@@ -0,0 +1,65 @@
+"""
+Process in which the regular expressions of pattern searches are run (see pattern_search.py).
+
+Python's re module has no timeout, and a single match of a badly written pattern can take
+minutes. The matching is therefore done in a separate process, which the search kills if
+its deadline passes while the process is matching. This module is imported by that process
+on its own, so it must not import Django or the rest of the application.
+"""
+import re
+
+
+# Matches highlighted per text
+MAX_SPANS = 20
+
+
+def match_spans(regex, text):
+    """ Returns the (start, end) positions of the first non-empty matches of a compiled regular expression in text. """
+    spans = []
+    for match in regex.finditer(text):
+        if match.end() > match.start():
+            spans.append(match.span())
+            if len(spans) == MAX_SPANS:
+                break
+    return spans
+
+
+def match_rank(regex, source, target):
+    """
+    Returns (match rank, matching side) for the source and target of an entry or segment,
+    ranked as by search.rank_queryset() (0 for a whole match, 1 for a prefix, 2 for any other
+    match), or None if neither matches. Texts given as None (too long to be searched) do not match.
+    """
+    for rank, method in ((0, regex.fullmatch), (1, regex.match), (2, regex.search)):
+        for side, text in enumerate((source, target)):
+            if text is not None and method(text):
+                return rank, side
+    return None
+
+
+def run(connection):
+    """
+    Receives (expression, flags, list of (source, target) pairs) tuples on connection until it
+    receives None, and sends back for each list the match rank (see match_rank()) and the spans
+    of the matches of the regular expression in the source and target of each pair.
+    The process is reused by successive searches, each sending its own expression.
+    """
+    while True:
+        message = connection.recv()
+        if message is None:
+            return
+        expression, flags, texts = message
+        # Compiled expressions are cached by the re module
+        regex = re.compile(expression, flags)
+        results = []
+        for source, target in texts:
+            rank = match_rank(regex, source, target)
+            if rank is None:
+                results.append(None)
+            else:
+                results.append((
+                    rank,
+                    match_spans(regex, source) if source is not None else [],
+                    match_spans(regex, target) if target is not None else [],
+                ))
+        connection.send(results)
@@ -0,0 +1,225 @@
+"""
+Search executor used by SearchResultsView.
+
+Each resource type (glossary entries, translation segments) is searched as a separate
+"source". The per-source queries are run concurrently, each on its own database
+connection, and the ranked results are merged with a heap so that the total time taken
+is that of the slowest single query rather than the sum of all of them.
+
+Ranking is done in the database: each query is ordered by relevance and limited to the
+top results, so only the best hits are ever fetched.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Length
+
+from .models import Entry, Segment, Translation
+from .segment_store import stored_segment_sources
+from .text import normalise_text
+
+
+# Value of the "resource" parameter of searches of all resources
+ALL_RESOURCES = "すべてのリソースを検索する"
+
+_executor = None
+
+
+def get_executor():
+    """ Returns the thread pool shared by all searches, creating it on first use. """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "SEARCH_MAX_WORKERS", 4),
+            thread_name_prefix="search",
+        )
+    return _executor
+
+
+def rank_queryset(queryset, query):
+    """
+    Annotates a queryset of objects having source and target fields, and their normalised
+    source_norm and target_norm forms, with relevance information, and orders it so that
+    the most relevant objects come first:
+        1. exact matches
+        2. prefix matches
+        3. other matches
+    Within each of these, shorter strings are ranked first.
+    The query is compared with the normalised forms, after being normalised itself.
+    """
+    query = normalise_text(query)
+    match_rank = Case(
+        When(Q(source_norm=query) | Q(target_norm=query), then=Value(0)),
+        When(Q(source_norm__startswith=query) | Q(target_norm__startswith=query), then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    # Length of the string that actually contains the query
+    match_length = Case(
+        When(source_norm__contains=query, then=Length("source")),
+        default=Length("target"),
+        output_field=IntegerField(),
+    )
+    return queryset.annotate(
+        match_rank=match_rank,
+        match_length=match_length,
+    ).order_by("match_rank", "match_length", "pk")
+
+
+def normalised_match(query):
+    """
+    Returns the filter matching entries or segments whose source or target contains query,
+    ignoring full-width/half-width forms and case (and kana, if SEARCH_FOLD_KANA is set).
+    """
+    query = normalise_text(query)
+    return Q(source_norm__contains=query) | Q(target_norm__contains=query)
+
+
+class SearchSource:
+    """
+    A single queryset to be searched.
+    If a query is given, the results are ranked by their relevance to it.
+    Priority is used to break ties when merging results from several sources,
+    lower values being ranked first (e.g. glossary entries before segments).
+    """
+    def __init__(self, name, queryset, priority=0, query=None):
+        self.name = name
+        self.queryset = queryset
+        self.priority = priority
+        self.query = query
+
+    def ranked_queryset(self):
+        if self.query:
+            return rank_queryset(self.queryset, self.query)
+        return self.queryset.order_by("pk")
+
+    def rank_key(self, obj, position):
+        """
+        Key used when merging results from several sources.
+        Results are already in ranked order within each source.
+        """
+        return (
+            getattr(obj, "match_rank", 0),
+            getattr(obj, "match_length", 0),
+            self.priority,
+            position,
+        )
+
+    def fetch(self, limit=None):
+        """
+        Evaluates the queryset and attaches a rank key to each result.
+        Returns the results and the total number of hits for this source.
+        The total is only counted separately if the results were cut off by the limit.
+        """
+        queryset = self.ranked_queryset()
+        results = list(queryset[:limit] if limit else queryset)
+        for position, obj in enumerate(results):
+            obj.search_rank = self.rank_key(obj, position)
+        if limit and len(results) == limit:
+            total = self.queryset.count()
+        else:
+            total = len(results)
+        return results, total
+
+
+class SearchResults:
+    """ Merged results of a search, plus the total number of hits across all sources. """
+    def __init__(self, items, hits):
+        self.items = items
+        self.hits = hits
+
+
+def _fetch_in_thread(source, limit):
+    """
+    Runs a single source query in a worker thread.
+    Django connections are thread-local, so each worker opens its own connection,
+    which is closed again here so that connections are not leaked by the pool.
+    """
+    try:
+        return source.fetch(limit)
+    finally:
+        connections.close_all()
+
+
+def merge_results(result_lists, limit=None):
+    """
+    Merges lists of results that are each already sorted by rank.
+    The heap only ever holds one item per source, so merging is cheap
+    even when the individual lists are long.
+    """
+    merged = heapq.merge(*result_lists, key=lambda obj: obj.search_rank)
+    return list(islice(merged, limit))
+
+
+def run_search(sources, limit=None):
+    """
+    Runs the queries for all sources concurrently and returns the merged results.
+    A single source is run in the calling thread as there is nothing to overlap.
+    If limit is None, the SEARCH_RESULTS_LIMIT setting is used.
+    """
+    if limit is None:
+        limit = getattr(settings, "SEARCH_RESULTS_LIMIT", None)
+
+    if len(sources) == 1:
+        fetched = [sources[0].fetch(limit)]
+    else:
+        futures = [
+            get_executor().submit(_fetch_in_thread, source, limit) for source in sources
+        ]
+        fetched = [future.result() for future in futures]
+
+    items = merge_results([results for results, total in fetched], limit)
+    hits = sum(total for results, total in fetched)
+    return SearchResults(items, hits)
+
+
+def search_querysets(resource, language=""):
+    """
+    Returns the querysets of the entries, segments and compressed or archived translations
+    searched for a resource (title of a glossary or job number of a translation; all
+    resources if it is empty or ALL_RESOURCES) and a language.
+    """
+    # Resources being deleted are excluded from searches
+    entries = Entry.objects.exclude(glossary__is_deleting=True)
+    segments = Segment.objects.exclude(translation__is_deleting=True)
+    stored_translations = Translation.objects.available().exclude(storage=Translation.ROWS)
+
+    # Only segments in the selected language (uses the indexes on the language fields)
+    if language:
+        segments = segments.filter(Q(source_lang=language) | Q(target_lang=language))
+
+    if resource and resource != ALL_RESOURCES:
+        entries = entries.filter(glossary__title=resource)
+        segments = segments.filter(translation__job_number=resource)
+        stored_translations = stored_translations.filter(job_number=resource)
+
+    return entries, segments, stored_translations
+
+
+def text_search_sources(query, entries, segments, stored_translations, language=""):
+    """
+    Returns the search sources of a text search of the querysets returned by search_querysets().
+    The normalised columns are searched, so that e.g. "ＡＢＣ" finds "abc" and "ｶﾀｶﾅ" finds "カタカナ".
+    Glossary entries are ranked above segments having the same relevance.
+    """
+    sources = [
+        SearchSource(
+            "glossary",
+            entries.filter(normalised_match(query)).select_related("glossary"),
+            priority=0,
+            query=query,
+        ),
+        SearchSource(
+            "translation",
+            segments.filter(normalised_match(query)).select_related("translation"),
+            priority=1,
+            query=query,
+        ),
+    ]
+    # Segments of compressed and archived translations are searched through their n-gram indexes
+    sources.extend(stored_segment_sources(list(stored_translations), query, priority=1, language=language))
+    return sources
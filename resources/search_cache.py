@@ -0,0 +1,185 @@
+"""
+Precomputed results of frequent searches.
+
+Most searches are for a few thousand client terms. The "warm_search_cache" management
+command (run after deploys and periodically, e.g. hourly from cron) finds the text searches
+made most often in the last SEARCH_CACHE_DAYS days for each resource from the search logs
+(see telemetry.py), runs them, and saves their results as SearchCache objects.
+SearchResultsView then reads the results of these searches by primary key instead of
+searching the normalised columns.
+
+The results are stored as references ("entry", pk) and ("segment", pk) to the objects found,
+in ranked order, so their current text is always shown. Segments of compressed and archived
+translations have no primary key, so their text is stored with the id of their translation.
+Cached results are not used if any object they refer to has been deleted (or its resource is
+being deleted), or if a translation has been compressed, archived or expanded since.
+
+Every change to the entries or segments of a resource can change the results of searches
+of it and of all resources, so each view which writes them calls refresh_search_cache(),
+which deletes the cached results of these searches and runs them again in the background.
+An import can change the results of any search; an entry added, edited, moved or deleted
+only changes the results of searches whose query is contained in its source or target
+(before or after the change), so only those are refreshed. Cached results older than
+SEARCH_CACHE_MAX_AGE hours are not used either, in case a change was made some other way.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Entry, SearchCache, SearchLog, Segment, Translation
+from .search import ALL_RESOURCES, SearchResults, run_search, search_querysets, text_search_sources
+from .tasks import run_in_background
+from .text import normalise_text
+
+
+def cache_key(query, resource, language):
+    """ Returns the (query_norm, resource, language) fields identifying the cached results of a search. """
+    max_length = SearchCache._meta.get_field("query_norm").max_length
+    return normalise_text(query)[:max_length], "" if resource in (None, ALL_RESOURCES) else resource, language or ""
+
+
+def serialise_results(items):
+    """ Returns the JSON representation of a list of search results. """
+    results = []
+    for item in items:
+        if isinstance(item, Entry):
+            results.append(["entry", item.pk])
+        elif item.pk is not None:
+            results.append(["segment", item.pk])
+        else:
+            results.append([
+                "stored", item.translation_id, item.source, item.target, item.source_lang, item.target_lang,
+            ])
+    return results
+
+
+def deserialise_results(results):
+    """
+    Returns the search results of a JSON representation made by serialise_results(),
+    or None if any of them no longer exists.
+    """
+    ids = defaultdict(set)
+    for result in results:
+        ids[result[0]].add(result[1])
+    entries = Entry.objects.exclude(glossary__is_deleting=True).select_related("glossary").in_bulk(ids["entry"])
+    segments = Segment.objects.exclude(
+        translation__is_deleting=True,
+    ).select_related("translation").in_bulk(ids["segment"])
+    translations = Translation.objects.available().exclude(storage=Translation.ROWS).in_bulk(ids["stored"])
+    if len(entries) + len(segments) + len(translations) < sum(len(pks) for pks in ids.values()):
+        return None
+
+    items = []
+    for kind, pk, *text in results:
+        if kind == "entry":
+            items.append(entries[pk])
+        elif kind == "segment":
+            items.append(segments[pk])
+        else:
+            source, target, source_lang, target_lang = text
+            items.append(Segment(
+                translation=translations[pk],
+                source=source,
+                target=target,
+                source_lang=source_lang,
+                target_lang=target_lang,
+            ))
+    return items
+
+
+def get_cached_results(query, resource, language=""):
+    """ Returns the cached SearchResults of a text search, or None if there are none (or they are out of date). """
+    if not getattr(settings, "SEARCH_CACHE_ENABLED", True):
+        return None
+    query_norm, resource, language = cache_key(query, resource, language)
+    max_age = timedelta(hours=getattr(settings, "SEARCH_CACHE_MAX_AGE", 24))
+    cached = SearchCache.objects.filter(
+        query_norm=query_norm,
+        resource=resource,
+        language=language,
+        updated_on__gte=timezone.now() - max_age,
+    ).first()
+    if cached is None:
+        return None
+    items = deserialise_results(cached.results)
+    if items is None:
+        cached.delete()
+        return None
+    return SearchResults(items, cached.hits)
+
+
+def warm_search(query, resource, language=""):
+    """ Runs a text search and saves its results. """
+    entries, segments, stored_translations = search_querysets(resource, language)
+    results = run_search(text_search_sources(query, entries, segments, stored_translations, language))
+    query_norm, resource, language = cache_key(query, resource, language)
+    SearchCache.objects.update_or_create(
+        query_norm=query_norm,
+        resource=resource,
+        language=language,
+        defaults={
+            "query": query[:SearchCache._meta.get_field("query").max_length],
+            "hits": results.hits,
+            "results": serialise_results(results.items),
+        },
+    )
+
+
+def warm_searches(searches):
+    """ Runs a list of (query, resource, language) text searches and saves their results. """
+    for query, resource, language in searches:
+        warm_search(query, resource, language)
+
+
+def frequent_searches(days, per_resource, min_searches=2):
+    """
+    Returns the (query, resource, language) text searches made at least min_searches times in
+    the last days, the per_resource most frequent ones of each resource (and of all resources).
+    """
+    searches = SearchLog.objects.filter(
+        kind=SearchLog.SEARCH,
+        mode="",
+        created_on__gte=timezone.now() - timedelta(days=days),
+    ).values("query_norm", "resource", "language").annotate(
+        query=Max("query"),
+        searches=Count("id"),
+    ).filter(searches__gte=min_searches).order_by("-searches", "query_norm")
+
+    counts = defaultdict(int)
+    result = []
+    for search in searches.iterator():
+        if counts[search["resource"]] >= per_resource:
+            continue
+        counts[search["resource"]] += 1
+        result.append((search["query"], search["resource"], search["language"]))
+    return result
+
+
+def refresh_search_cache(resources, texts=None, all_resources=True):
+    """
+    Deletes the cached results of the searches of resources (titles of glossaries or job numbers
+    of translations), and of all resources unless all_resources is False, and runs these searches
+    again in the background. If texts (the sources and targets of the entries changed) are given,
+    only the searches whose query is contained in one of them are refreshed; if there are more
+    than SEARCH_CACHE_MAX_TEXTS texts, comparing them all would take longer than refreshing
+    every search, so all are refreshed.
+    """
+    resources = [resource for resource in resources if resource]
+    if all_resources:
+        resources.append("")
+    cached = SearchCache.objects.filter(resource__in=resources)
+    if texts is not None and len(texts) <= getattr(settings, "SEARCH_CACHE_MAX_TEXTS", 1000):
+        texts = [normalise_text(text) for text in texts if text]
+        pks = [
+            pk for pk, query_norm in cached.values_list("pk", "query_norm")
+            if any(query_norm in text for text in texts)
+        ]
+        cached = SearchCache.objects.filter(pk__in=pks)
+    searches = list(cached.values_list("query", "resource", "language"))
+    if not searches:
+        return
+    cached.delete()
+    run_in_background(warm_searches, searches)
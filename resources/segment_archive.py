@@ -0,0 +1,270 @@
+"""
+Read-only segment archives.
+
+A translation whose storage is "archived" keeps its segments in an immutable file on disk
+rather than in the database. The file is memory-mapped, so segments are read straight from
+the operating system's page cache without being loaded into the process, and the pages of
+archives that are not being read take no memory at all.
+
+Layout of an archive file (all integers little-endian):
+
+    header      magic, version, number of segments, positions of the sections below
+    records     per segment: the byte lengths of source, target, source language and
+                target language, followed by the four UTF-8 strings
+    offsets     (number of segments + 1) 64-bit positions of the records
+    keys        sorted 64-bit hashes of the n-grams of the segments
+    starts      (number of keys + 1) 64-bit positions in postings of each key's list
+    postings    32-bit numbers of the segments containing each n-gram, in ascending order
+
+A search looks up the posting lists of the query's character pairs with a binary search on
+the keys, intersects them, and only reads the records of the segments left.
+"""
+import hashlib
+import heapq
+import mmap
+import os
+import shutil
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from .text import ngrams, query_ngrams
+
+
+MAGIC = b"HASEGARC"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQQQQ")
+RECORD = struct.Struct("<IIHH")
+# n-gram key and number of postings of a posting list in a temporary run file
+RUN_HEADER = struct.Struct("<QI")
+# Number of segments whose posting lists are collected in memory before being written to a run
+RUN_SIZE = 50000
+# Number of bytes read at a time from each run when merging them
+RUN_READ_SIZE = 64 * 1024
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _ngram_key(ngram):
+    return int.from_bytes(hashlib.blake2b(ngram.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _write_array(f, values):
+    """ Writes an array at the next 8-byte boundary and returns its position. """
+    position = f.tell()
+    padding = -position % 8
+    f.write(b"\0" * padding)
+    f.write(values.tobytes())
+    return position + padding
+
+
+def _write_run(f, postings):
+    """ Writes the posting lists of a run of segments to a temporary file, in key order. """
+    for key in sorted(postings):
+        numbers = postings[key]
+        f.write(RUN_HEADER.pack(key, len(numbers)))
+        f.write(numbers.tobytes())
+
+
+def _read_run(fd, start, end, run_number):
+    """
+    Yields (key, run number, posting list bytes) for the posting lists of a run written by
+    _write_run(). All runs are read from the same file descriptor, each through its own small buffer.
+    """
+    buffer = bytearray()
+    position = start
+
+    def take(size):
+        nonlocal buffer, position
+        while len(buffer) < size:
+            chunk = os.pread(fd, min(max(RUN_READ_SIZE, size - len(buffer)), end - position), position)
+            if not chunk:
+                raise ArchiveError("The temporary posting lists are incomplete.")
+            buffer += chunk
+            position += len(chunk)
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
+
+    while buffer or position < end:
+        key, count = RUN_HEADER.unpack(take(RUN_HEADER.size))
+        yield key, run_number, take(4 * count)
+
+
+def build_archive(path, segments, run_size=RUN_SIZE):
+    """
+    Writes an archive of an iterable of (source, target, source language, target language)
+    tuples to path. Returns the number of segments written.
+    The file is written under a temporary name and moved into place once complete,
+    so readers never see a partly written archive.
+    Records are written as they are read. The posting lists of each run of run_size segments
+    are written to a temporary file, sorted by key, and the runs are merged at the end, so only
+    the record offsets and the n-gram keys are held in memory whatever the number of segments.
+    """
+    if sys.byteorder != "little":
+        raise ArchiveError("Segment archives can only be written on little-endian machines.")
+
+    offsets = array("Q")
+    postings = defaultdict(lambda: array("I"))
+    runs = []
+    temp_path = path + ".tmp"
+    runs_path = path + ".runs.tmp"
+    postings_path = path + ".postings.tmp"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(b"\0" * HEADER.size)
+            with open(runs_path, "wb") as runs_file:
+                for number, (source, target, source_lang, target_lang) in enumerate(segments):
+                    offsets.append(f.tell())
+                    fields = [text.encode("utf-8") for text in (source, target, source_lang or "", target_lang or "")]
+                    f.write(RECORD.pack(*(len(field) for field in fields)))
+                    f.write(b"".join(fields))
+                    for ngram in ngrams(source) | ngrams(target):
+                        postings[_ngram_key(ngram)].append(number)
+                    if len(offsets) % run_size == 0:
+                        runs.append(runs_file.tell())
+                        _write_run(runs_file, postings)
+                        postings.clear()
+                if postings:
+                    runs.append(runs_file.tell())
+                    _write_run(runs_file, postings)
+                    postings.clear()
+                runs.append(runs_file.tell())
+            offsets.append(f.tell())
+
+            # Runs hold increasing segment numbers, so merging them by (key, run) keeps each list sorted
+            keys = array("Q")
+            starts = array("Q", [0])
+            with open(runs_path, "rb") as runs_file, open(postings_path, "wb") as postings_file:
+                readers = [_read_run(runs_file.fileno(), runs[i], runs[i + 1], i) for i in range(len(runs) - 1)]
+                for key, run_number, numbers in heapq.merge(*readers):
+                    if not keys or keys[-1] != key:
+                        keys.append(key)
+                        starts.append(starts[-1])
+                    starts[-1] += len(numbers) // 4
+                    postings_file.write(numbers)
+
+            offsets_position = _write_array(f, offsets)
+            keys_position = _write_array(f, keys)
+            starts_position = _write_array(f, starts)
+            postings_position = _write_array(f, array("I"))
+            with open(postings_path, "rb") as postings_file:
+                shutil.copyfileobj(postings_file, f)
+
+            f.seek(0)
+            f.write(HEADER.pack(
+                MAGIC, VERSION, len(offsets) - 1,
+                offsets_position, keys_position, starts_position, postings_position, len(keys),
+            ))
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(temp_path, path)
+    finally:
+        for leftover in (temp_path, runs_path, postings_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    return len(offsets) - 1
+
+
+class SegmentArchive:
+    """
+    A memory-mapped archive file.
+    Segments are returned as (source, target, source language, target language) tuples,
+    decoded directly from the mapped pages.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        (magic, version, count, offsets_position, keys_position,
+         starts_position, postings_position, num_keys) = HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ArchiveError(f"{path} is not a segment archive.")
+
+        self._view = view
+        self._count = count
+        self._offsets = view[offsets_position:offsets_position + 8 * (count + 1)].cast("Q")
+        self._keys = view[keys_position:keys_position + 8 * num_keys].cast("Q")
+        self._starts = view[starts_position:starts_position + 8 * (num_keys + 1)].cast("Q")
+        self._postings = view[postings_position:].cast("I")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number):
+        if not 0 <= number < self._count:
+            raise IndexError(number)
+        position = self._offsets[number]
+        lengths = RECORD.unpack_from(self._view, position)
+        position += RECORD.size
+        fields = []
+        for length in lengths:
+            fields.append(str(self._view[position:position + length], "utf-8"))
+            position += length
+        return tuple(fields)
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self[number]
+
+    def _posting_list(self, ngram):
+        key = _ngram_key(ngram)
+        index = bisect_left(self._keys, key)
+        if index == len(self._keys) or self._keys[index] != key:
+            return ()
+        return self._postings[self._starts[index]:self._starts[index + 1]]
+
+    def candidates(self, query):
+        """
+        Returns the numbers of the segments which may contain query, in ascending order.
+        Hash collisions may add segments not containing it, so matches must be checked.
+        """
+        grams = query_ngrams(query)
+        if not grams:
+            return range(self._count)
+        posting_lists = sorted((self._posting_list(ngram) for ngram in grams), key=len)
+        numbers = set(posting_lists[0])
+        for posting_list in posting_lists[1:]:
+            if not numbers:
+                break
+            numbers.intersection_update(posting_list)
+        return sorted(numbers)
+
+
+_archives = {}
+_lock = threading.Lock()
+
+
+def open_archive(path):
+    """
+    Returns the SegmentArchive for path, shared by all threads of the process.
+    An archive is reopened if its file has been replaced.
+    """
+    stat = os.stat(path)
+    stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _archives.get(path)
+        if cached is None or cached[0] != stamp:
+            # Replaced archives are not closed, as other threads may still be reading them;
+            # they are unmapped once no longer referenced.
+            cached = (stamp, SegmentArchive(path))
+            _archives[path] = cached
+        return cached[1]
+
+
+def remove_archive(path):
+    """ Deletes an archive file and forgets any open mapping of it. """
+    with _lock:
+        _archives.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,409 @@
+"""
+Compressed storage of translation segments.
+
+A translation's segments are normally stored as Segment rows. A translation whose storage
+is "compressed" keeps them instead in SegmentBlock objects, each holding a run of
+SEGMENT_BLOCK_SIZE consecutive segments as zlib-compressed JSON. The segment text then
+takes a fraction of the space, and the table stays small enough to be cached in memory.
+
+Each block has an n-gram filter (a Bloom filter of the single characters and character
+pairs of its segments) which stands in front of the compressed data: a search only
+decompresses the blocks whose filter contains every character pair of the query.
+
+Translations which are no longer changed can instead be "archived": their segments are
+moved into a read-only file having its own n-gram index (see segment_archive.py), so they no
+longer take up space in the database. The file is then the only copy of the segments, so it is
+kept in SEGMENT_ARCHIVE_STORAGE, a Django storage which must be durable and shared by all
+servers (e.g. S3), and translations cannot be archived until it is set. Each server copies
+the archives it reads into SEGMENT_ARCHIVE_ROOT, from where they are memory-mapped.
+
+iter_segments() reads the segments of a translation whichever way they are stored, so the
+"show all" page and the exporters decompress blocks on the fly, one block at a time.
+"""
+import hashlib
+import heapq
+import json
+import logging
+import os
+import uuid
+import zlib
+from collections import namedtuple
+from itertools import chain, islice, zip_longest
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import get_storage_class
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import Segment, SegmentBlock, Translation
+from .text import ngrams, normalise_text, query_ngrams
+from .segment_archive import ArchiveError, build_archive, open_archive, remove_archive
+
+
+logger = logging.getLogger(__name__)
+
+
+SegmentRecord = namedtuple("SegmentRecord", ["source", "target", "source_lang", "target_lang"])
+
+# Number of bit positions set per n-gram in a block's n-gram filter
+NGRAM_FILTER_HASHES = 3
+# Bits per distinct n-gram, giving about 2% false positives with 3 hashes
+NGRAM_FILTER_BITS_PER_NGRAM = 10
+
+
+def _hashes(ngram):
+    digest = hashlib.blake2b(ngram.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "little"), int.from_bytes(digest[4:], "little") | 1
+
+
+def _positions(hashes, num_bits):
+    first, step = hashes
+    return [(first + i * step) % num_bits for i in range(NGRAM_FILTER_HASHES)]
+
+
+def build_ngram_filter(grams):
+    """ Returns a Bloom filter of a set of n-grams as bytes. """
+    num_bits = max(1024, len(grams) * NGRAM_FILTER_BITS_PER_NGRAM)
+    bits = bytearray((num_bits + 7) // 8)
+    num_bits = len(bits) * 8
+    for ngram in grams:
+        for position in _positions(_hashes(ngram), num_bits):
+            bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+
+def might_contain(ngram_filter, query_hashes):
+    """
+    Returns False if a block certainly does not contain the query whose n-gram hashes are given.
+    A True result may be a false positive.
+    """
+    num_bits = len(ngram_filter) * 8
+    return all(
+        ngram_filter[position >> 3] >> (position & 7) & 1
+        for hashes in query_hashes
+        for position in _positions(hashes, num_bits)
+    )
+
+
+def encode_block(segments):
+    """ Returns the compressed data and n-gram filter of a list of segment tuples. """
+    grams = set()
+    for source, target, source_lang, target_lang in segments:
+        grams.update(ngrams(source))
+        grams.update(ngrams(target))
+    data = json.dumps([list(segment) for segment in segments], ensure_ascii=False, separators=(",", ":"))
+    return zlib.compress(data.encode("utf-8")), build_ngram_filter(grams)
+
+
+def decode_block(data):
+    """ Returns the segments of a block as a list of SegmentRecord tuples. """
+    return [SegmentRecord(*segment) for segment in json.loads(zlib.decompress(data))]
+
+
+def write_segment_blocks(translation, segments, block_size=None):
+    """
+    Stores an iterable of (source, target, source language, target language) tuples
+    as the compressed blocks of a translation. Returns the number of segments written.
+    Only one block of segments is held in memory at a time.
+    """
+    if block_size is None:
+        block_size = getattr(settings, "SEGMENT_BLOCK_SIZE", 1000)
+
+    segments = iter(segments)
+    num_of_segments = 0
+    number = translation.segment_blocks.count()
+    while True:
+        batch = list(islice(segments, block_size))
+        if not batch:
+            break
+        data, ngram_filter = encode_block(batch)
+        SegmentBlock.objects.create(
+            translation=translation,
+            number=number,
+            segment_count=len(batch),
+            data=data,
+            ngram_filter=ngram_filter,
+        )
+        number += 1
+        num_of_segments += len(batch)
+    return num_of_segments
+
+
+def archive_storage():
+    """ Returns the storage keeping the archive files of archived translations (SEGMENT_ARCHIVE_STORAGE). """
+    storage_class = getattr(settings, "SEGMENT_ARCHIVE_STORAGE", "")
+    if not storage_class:
+        raise ArchiveError(
+            "Translations cannot be archived until SEGMENT_ARCHIVE_STORAGE is set to a durable storage, "
+            "as their segments are deleted from the database."
+        )
+    return get_storage_class(storage_class)()
+
+
+def archive_path(archive_name):
+    """ Returns the path of this server's copy of an archive file. """
+    root = getattr(settings, "SEGMENT_ARCHIVE_ROOT", os.path.join(settings.BASE_DIR, "segment_archives"))
+    return os.path.join(root, os.path.basename(archive_name))
+
+
+def open_translation_archive(translation):
+    """
+    Returns the SegmentArchive of an archived translation, first copying its file from
+    SEGMENT_ARCHIVE_STORAGE if this server has no copy of it.
+    """
+    path = archive_path(translation.archive_name)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with archive_storage().open(translation.archive_name, "rb") as source, open(temp_path, "wb") as f:
+                for chunk in source.chunks():
+                    f.write(chunk)
+            os.replace(temp_path, path)
+        except FileNotFoundError:
+            raise ArchiveError(f"The archive of {translation} is missing from SEGMENT_ARCHIVE_STORAGE.")
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    return open_archive(path)
+
+
+def iter_segments(translation):
+    """
+    Yields SegmentRecord tuples for all segments of a translation, in their original order,
+    whichever way they are stored.
+    """
+    if translation.storage == Translation.ARCHIVED:
+        return map(SegmentRecord._make, open_translation_archive(translation))
+
+    if translation.storage == Translation.COMPRESSED:
+        blocks = translation.segment_blocks.order_by("number").values_list("data", flat=True)
+        return chain.from_iterable(decode_block(data) for data in blocks.iterator(chunk_size=20))
+
+    segments = translation.segments.order_by("pk").values_list(
+        "source", "target", "source_lang", "target_lang", named=True
+    )
+    return segments.iterator(chunk_size=2000)
+
+
+def segment_count(translation):
+    """ Returns the number of segments of a translation, whichever way they are stored. """
+    if translation.storage == Translation.ARCHIVED:
+        return len(open_translation_archive(translation))
+    if translation.storage == Translation.COMPRESSED:
+        return translation.segment_blocks.aggregate(total=Sum("segment_count"))["total"] or 0
+    return translation.segments.count()
+
+
+def compress_translation(translation, block_size=None):
+    """ Moves the segments of a translation into compressed blocks. """
+    if translation.storage == Translation.COMPRESSED:
+        return
+    archive_name = translation.archive_name
+    with transaction.atomic():
+        write_segment_blocks(translation, iter_segments(translation), block_size)
+        translation.segments.all().delete()
+        translation.storage = Translation.COMPRESSED
+        translation.archive_name = ""
+        translation.save(update_fields=["storage", "archive_name"])
+    delete_archive(archive_name)
+
+
+def expand_translation(translation):
+    """
+    Moves the segments of a compressed or archived translation back into Segment rows.
+    """
+    if translation.storage == Translation.ROWS:
+        return
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+    new_segments = (
+        Segment(
+            translation=translation,
+            source_norm=normalise_text(segment.source),
+            target_norm=normalise_text(segment.target),
+            **segment._asdict()
+        )
+        for segment in iter_segments(translation)
+    )
+    archive_name = translation.archive_name
+    with transaction.atomic():
+        while True:
+            batch = list(islice(new_segments, batch_size))
+            if not batch:
+                break
+            Segment.objects.bulk_create(batch)
+        translation.segment_blocks.all().delete()
+        translation.storage = Translation.ROWS
+        translation.archive_name = ""
+        translation.save(update_fields=["storage", "archive_name"])
+    delete_archive(archive_name)
+
+
+def archive_translation(translation):
+    """
+    Moves the segments of a translation into a read-only archive file kept in SEGMENT_ARCHIVE_STORAGE.
+    The segments are only removed from the database once the archive has been written, read back
+    and compared with them, and saved to the storage.
+    """
+    if translation.storage == Translation.ARCHIVED:
+        return
+    storage = archive_storage()
+    # Each archive has a new name, so servers never read an old copy of a re-archived translation
+    name = f"segment_archives/translation-{translation.pk}-{uuid.uuid4().hex[:12]}.segments"
+    path = archive_path(name)
+    build_archive(path, iter_segments(translation))
+    saved_name = None
+    try:
+        for archived, segment in zip_longest(open_archive(path), iter_segments(translation)):
+            if archived is None or segment is None or archived != tuple(field or "" for field in segment):
+                raise ArchiveError(f"The archive of {translation} does not match its segments.")
+        with open(path, "rb") as f:
+            saved_name = storage.save(name, File(f))
+        if storage.size(saved_name) != os.path.getsize(path):
+            raise ArchiveError(f"The archive of {translation} was not completely saved.")
+        if saved_name != name:
+            os.replace(path, archive_path(saved_name))
+    except Exception:
+        remove_archive(path)
+        if saved_name:
+            storage.delete(saved_name)
+        raise
+
+    with transaction.atomic():
+        translation.segments.all().delete()
+        translation.segment_blocks.all().delete()
+        translation.storage = Translation.ARCHIVED
+        translation.archive_name = saved_name
+        translation.save(update_fields=["storage", "archive_name"])
+
+
+def delete_archive(archive_name):
+    """ Deletes an archive file from SEGMENT_ARCHIVE_STORAGE and this server's copy of it. """
+    if not archive_name:
+        return
+    remove_archive(archive_path(archive_name))
+    archive_storage().delete(archive_name)
+
+
+def delete_stored_segments(translation):
+    """ Deletes the archive file of a translation, if any. Called when the translation is deleted. """
+    delete_archive(translation.archive_name)
+
+
+class StoredSegmentSource:
+    """
+    Base class of the search sources for segments not stored as Segment rows, used by
+    run_search() alongside the SearchSource objects querying the database.
+    Matching segments are returned as unsaved Segment objects ranked in the same way as
+    by rank_queryset(). Subclasses yield the segments which may match the query.
+    """
+    def __init__(self, name, translations, query, priority=0, language=""):
+        self.name = name
+        self.translations = translations
+        self.query = query
+        self.priority = priority
+        self.language = language
+
+    def candidate_segments(self):
+        """ Yields (translation, segments) pairs, the segments possibly containing the query. """
+        raise NotImplementedError
+
+    def matches(self):
+        """ Yields the matching segments, with the same relevance information as rank_queryset(). """
+        query = normalise_text(self.query)
+        for translation, segments in self.candidate_segments():
+            for source, target, source_lang, target_lang in segments:
+                if self.language and self.language not in (source_lang, target_lang):
+                    continue
+                folded_source = normalise_text(source)
+                folded_target = normalise_text(target)
+                if query not in folded_source and query not in folded_target:
+                    continue
+                segment = Segment(
+                    translation=translation,
+                    source=source,
+                    target=target,
+                    source_lang=source_lang,
+                    target_lang=target_lang,
+                )
+                if query in (folded_source, folded_target):
+                    segment.match_rank = 0
+                elif folded_source.startswith(query) or folded_target.startswith(query):
+                    segment.match_rank = 1
+                else:
+                    segment.match_rank = 2
+                segment.match_length = len(source) if query in folded_source else len(target)
+                yield segment
+
+    def fetch(self, limit=None):
+        """ Returns the top results and the total number of hits, like SearchSource.fetch(). """
+        total = 0
+
+        def counted(segments):
+            nonlocal total
+            for segment in segments:
+                total += 1
+                yield segment
+
+        def key(segment):
+            return segment.match_rank, segment.match_length
+
+        if limit:
+            results = heapq.nsmallest(limit, counted(self.matches()), key=key)
+        else:
+            results = sorted(counted(self.matches()), key=key)
+        for position, segment in enumerate(results):
+            segment.search_rank = (segment.match_rank, segment.match_length, self.priority, position)
+        return results, total
+
+
+class CompressedSegmentSource(StoredSegmentSource):
+    """
+    Search source for the segments of compressed translations.
+    Only blocks whose n-gram filter matches the query are decompressed.
+    """
+    def candidate_segments(self):
+        query_hashes = [_hashes(ngram) for ngram in query_ngrams(self.query)]
+        translations = {translation.pk: translation for translation in self.translations}
+        blocks = SegmentBlock.objects.filter(translation__in=translations.keys())
+
+        candidates = [
+            (translation_id, pk)
+            for pk, translation_id, ngram_filter in blocks.values_list("pk", "translation", "ngram_filter").iterator()
+            if might_contain(bytes(ngram_filter), query_hashes)
+        ]
+        # Block data is only read for the candidate blocks, a few at a time
+        for start in range(0, len(candidates), 20):
+            batch = candidates[start:start + 20]
+            data = blocks.in_bulk([pk for translation_id, pk in batch])
+            for translation_id, pk in batch:
+                yield translations[translation_id], decode_block(data[pk].data)
+
+
+class ArchivedSegmentSource(StoredSegmentSource):
+    """
+    Search source for the segments of archived translations.
+    Only the segments found in the archive's n-gram index are read.
+    """
+    def candidate_segments(self):
+        for translation in self.translations:
+            try:
+                archive = open_translation_archive(translation)
+            except ArchiveError:
+                # One lost archive should not stop every search
+                logger.exception("Could not search the archive of %s", translation)
+                continue
+            yield translation, (archive[number] for number in archive.candidates(self.query))
+
+
+def stored_segment_sources(translations, query, priority=0, language=""):
+    """ Returns the search sources for the segments of translations not stored as Segment rows. """
+    sources = []
+    compressed = [translation for translation in translations if translation.storage == Translation.COMPRESSED]
+    archived = [translation for translation in translations if translation.storage == Translation.ARCHIVED]
+    if compressed:
+        sources.append(CompressedSegmentSource("compressed translation", compressed, query, priority, language))
+    if archived:
+        sources.append(ArchivedSegmentSource("archived translation", archived, query, priority, language))
+    return sources
@@ -0,0 +1,96 @@
+"""
+Background tasks.
+
+Tasks are run in a small thread pool inside the web process, so long-running work
+(e.g. deleting a large translation) does not hold up the request that started it.
+Tasks must be safe to re-run, as a task is lost if the process is restarted before
+it finishes. The "purge_deleted_resources" and "resume_import_jobs" management commands
+finish any such tasks.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .models import Glossary, Translation
+from .segment_store import delete_stored_segments
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    """ Returns the thread pool shared by all background tasks, creating it on first use. """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "BACKGROUND_TASK_WORKERS", 2),
+            thread_name_prefix="background",
+        )
+    return _executor
+
+
+def _run_task(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+        raise
+    finally:
+        # Each worker thread has its own database connection
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """
+    Runs func(*args, **kwargs) in a background thread once the current transaction
+    (if any) has been committed, so the task sees the data written by the request.
+    """
+    transaction.on_commit(lambda: get_executor().submit(_run_task, func, *args, **kwargs))
+
+
+# Child objects of each resource type, deleted in batches before the resource itself
+CHILD_RELATIONS = {
+    Glossary: ("entries",),
+    Translation: ("segments", "segment_blocks"),
+}
+
+
+def mark_for_deletion(resource):
+    """
+    Hides a Glossary or Translation object from users straight away
+    and deletes it and its children in the background.
+    """
+    type(resource).objects.filter(pk=resource.pk).update(is_deleting=True)
+    run_in_background(delete_resource, type(resource), resource.pk)
+
+
+def delete_resource(model, pk, batch_size=None):
+    """
+    Deletes a Glossary or Translation object.
+    The child entries, segments or segment blocks are deleted first in batches of batch_size rows,
+    each in its own short transaction, so no single statement locks the tables for long
+    and child objects are never all loaded into memory.
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, "DELETE_BATCH_SIZE", 5000)
+
+    resource = model.objects.filter(pk=pk).first()
+    if resource is None:
+        return
+
+    for relation in CHILD_RELATIONS[model]:
+        children = getattr(resource, relation)
+        while True:
+            batch = list(children.values_list("pk", flat=True)[:batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                children.model.objects.filter(pk__in=batch).delete()
+
+    if model is Translation:
+        delete_stored_segments(resource)
+    resource.delete()
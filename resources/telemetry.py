@@ -0,0 +1,117 @@
+"""
+Search telemetry.
+
+Each search (and autocomplete request) is recorded as a SearchLog object with its query,
+resource, number of hits and time taken, which the search analytics page summarises.
+
+Saving a row for every search in the request would add a database write to every search,
+so record_search() only puts the log on a queue and returns. A single writer thread takes
+the logs off the queue and saves them with bulk_create(), in batches of at most
+SEARCH_LOG_BATCH_SIZE logs or once every SEARCH_LOG_FLUSH_INTERVAL seconds. If the queue is
+full (the database cannot keep up), further logs are dropped rather than slowing searches
+down, and logs still on the queue are lost if the process is killed: the logs are
+statistics, not records which must be complete.
+"""
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import connections
+
+from .models import SearchLog
+from .search import ALL_RESOURCES
+from .text import normalise_text
+
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class SearchLogWriter:
+    """ Saves the SearchLog objects put on its queue in batches, in a background thread. """
+    def __init__(self, batch_size, flush_interval, max_queued):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.thread = threading.Thread(target=self.run, name="search-log", daemon=True)
+        self.thread.start()
+
+    def put(self, log):
+        try:
+            self.queue.put_nowait(log)
+        except queue.Full:
+            # The database cannot keep up: the log is dropped
+            pass
+
+    def take_batch(self, timeout):
+        """ Waits up to timeout seconds for a log, then returns it with any others queued (up to a batch). """
+        try:
+            batch = [self.queue.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def save(self, batch):
+        try:
+            SearchLog.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Could not save %s search logs", len(batch))
+
+    def run(self):
+        while True:
+            batch = self.take_batch(self.flush_interval)
+            if batch:
+                self.save(batch)
+                # The connection is not reused for a while, so it is not kept open
+                connections.close_all()
+
+    def flush(self):
+        """ Saves the logs still on the queue, in the calling thread. """
+        while True:
+            batch = self.take_batch(0)
+            if not batch:
+                break
+            self.save(batch)
+
+
+def get_writer():
+    """ Returns the writer shared by all requests, starting its thread on first use. """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SearchLogWriter(
+                batch_size=getattr(settings, "SEARCH_LOG_BATCH_SIZE", 200),
+                flush_interval=getattr(settings, "SEARCH_LOG_FLUSH_INTERVAL", 5.0),
+                max_queued=getattr(settings, "SEARCH_LOG_MAX_QUEUED", 10000),
+            )
+            atexit.register(_writer.flush)
+    return _writer
+
+
+def record_search(query, resource, hits, latency, kind=SearchLog.SEARCH, mode="", language=""):
+    """
+    Records a search: query, the resource searched (ALL_RESOURCES or None for all of them),
+    the number of hits and the time taken in seconds. Returns without waiting for the log to be saved.
+    """
+    if not getattr(settings, "SEARCH_LOG_ENABLED", True) or not query:
+        return
+    max_length = SearchLog._meta.get_field("query").max_length
+    get_writer().put(SearchLog(
+        kind=kind,
+        query=query[:max_length],
+        query_norm=normalise_text(query)[:max_length],
+        resource="" if resource in (None, ALL_RESOURCES) else resource[:250],
+        mode=mode,
+        language=language[:20],
+        hits=hits,
+        latency=latency * 1000,
+    ))
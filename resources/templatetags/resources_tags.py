@@ -1,5 +1,6 @@
 import re
 from django import template
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
 
@@ -14,3 +15,16 @@ def highlight_query(text, query):
                              '<span class="highlight_query">\\1</span>', text)
         return mark_safe(highlighted)
     return mark_safe(text)
+
+
+@register.filter
+def highlight_pattern(text, spans):
+    """ Highlights the (start, end) spans of the matches of a search pattern found in text (see pattern_search.py). """
+    pieces = []
+    position = 0
+    for start, end in spans or []:
+        pieces.append(escape(text[position:start]))
+        pieces.append('<span class="highlight_query">%s</span>' % escape(text[start:end]))
+        position = end
+    pieces.append(escape(text[position:]))
+    return mark_safe("".join(pieces))
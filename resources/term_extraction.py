@@ -0,0 +1,236 @@
+"""
+Automatic extraction of glossary term candidates from the segments of a translation.
+
+1. The source and target texts of the segments are parsed by spaCy in batches with
+   nlp.pipe(), spread over several processes, and the noun phrases of each side are
+   collected as candidate terms. Each segment is reduced to two short lists of candidate ids.
+2. The co-occurrence of every source candidate with every target candidate appearing in the
+   same segment is counted with NumPy, using array operations over all segments at once
+   rather than a Python loop over candidate pairs.
+3. Each source candidate is paired with the target candidate having the highest Dice
+   coefficient, 2 * cooccurrences / (source count + target count).
+
+The spaCy models are set by the TERM_EXTRACTION_SOURCE_MODEL and TERM_EXTRACTION_TARGET_MODEL
+settings and must be installed separately, e.g. "python -m spacy download ja_core_news_sm".
+"""
+from array import array
+from functools import lru_cache
+from itertools import tee
+
+from django.conf import settings
+
+from . import optional
+from .text import normalise_key
+
+
+# Tokens dropped from the start and end of noun phrases (e.g. "the", "this", "2")
+EDGE_POS = {"DET", "PRON", "NUM", "PUNCT", "SYM", "ADP", "PART", "CCONJ", "SCONJ", "AUX", "SPACE"}
+# Tokens making up noun phrases when the model cannot find noun chunks
+NOUN_POS = {"NOUN", "PROPN"}
+
+
+class TermExtractionError(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def load_pipeline(model_name):
+    """ Loads a spaCy pipeline, once per process. Named entities are not needed. """
+    spacy = optional.load("spacy")
+    if spacy is None or not optional.is_installed("numpy"):
+        raise TermExtractionError("Term extraction needs the spacy and numpy packages to be installed.")
+    try:
+        return spacy.load(model_name, exclude=["ner"])
+    except OSError:
+        raise TermExtractionError(
+            f'The spaCy model "{model_name}" is not installed. '
+            f'It can be installed with "python -m spacy download {model_name}".'
+        )
+
+
+def _noun_spans(doc):
+    """ Yields the noun chunks of a parsed text, or runs of nouns if the model has no noun chunker. """
+    try:
+        yield from doc.noun_chunks
+        return
+    except (NotImplementedError, ValueError):
+        pass
+
+    start = None
+    for token in doc:
+        if token.pos_ in NOUN_POS:
+            if start is None:
+                start = token.i
+        elif start is not None:
+            yield doc[start:token.i]
+            start = None
+    if start is not None:
+        yield doc[start:len(doc)]
+
+
+def candidate_phrases(doc, max_tokens=5):
+    """ Returns the candidate terms of a parsed text, without determiners, numbers etc. at either end. """
+    phrases = []
+    for span in _noun_spans(doc):
+        start, end = span.start, span.end
+        while start < end and doc[start].pos_ in EDGE_POS:
+            start += 1
+        while end > start and doc[end - 1].pos_ in EDGE_POS:
+            end -= 1
+        if 0 < end - start <= max_tokens:
+            text = doc[start:end].text.strip()
+            # Ignore single characters and phrases without any letters
+            if len(text) > 1 and any(char.isalpha() for char in text):
+                phrases.append(text)
+    return phrases
+
+
+class CandidateVocabulary:
+    """
+    Numbers the distinct candidate terms of one side of the translation.
+    Candidates are compared by normalise_key(); the first form seen is kept for display.
+    """
+    def __init__(self):
+        self.ids = {}
+        self.forms = []
+
+    def __len__(self):
+        return len(self.forms)
+
+    def add(self, phrase):
+        key = normalise_key(phrase)
+        candidate_id = self.ids.get(key)
+        if candidate_id is None:
+            candidate_id = self.ids[key] = len(self.forms)
+            self.forms.append(phrase)
+        return candidate_id
+
+
+class ProposedTerm:
+    def __init__(self, source, target, source_count, target_count, cooccurrences, score):
+        self.source = source
+        self.target = target
+        self.source_count = source_count
+        self.target_count = target_count
+        self.cooccurrences = cooccurrences
+        self.score = score
+
+
+def collect_candidates(segments, processes=1, batch_size=1000, max_tokens=5):
+    """
+    Parses the segments and returns the source and target vocabularies, together with
+    (segment numbers, candidate ids) pairs of arrays for each side, one element per
+    distinct candidate per segment.
+    """
+    numpy = optional.load("numpy")
+    source_nlp = load_pipeline(getattr(settings, "TERM_EXTRACTION_SOURCE_MODEL", "ja_core_news_sm"))
+    target_nlp = load_pipeline(getattr(settings, "TERM_EXTRACTION_TARGET_MODEL", "en_core_web_sm"))
+
+    source_texts, target_texts = tee(segments)
+    source_docs = source_nlp.pipe(
+        (segment[0] for segment in source_texts), batch_size=batch_size, n_process=processes
+    )
+    target_docs = target_nlp.pipe(
+        (segment[1] for segment in target_texts), batch_size=batch_size, n_process=processes
+    )
+
+    vocabularies = (CandidateVocabulary(), CandidateVocabulary())
+    # Parallel arrays of segment numbers and candidate ids, for the source and target sides
+    occurrences = ((array("q"), array("q")), (array("q"), array("q")))
+    for segment_number, docs in enumerate(zip(source_docs, target_docs)):
+        for doc, vocabulary, (numbers, ids) in zip(docs, vocabularies, occurrences):
+            candidate_ids = {vocabulary.add(phrase) for phrase in candidate_phrases(doc, max_tokens)}
+            numbers.extend([segment_number] * len(candidate_ids))
+            ids.extend(candidate_ids)
+
+    return vocabularies, [
+        (numpy.frombuffer(numbers, dtype=numpy.int64), numpy.frombuffer(ids, dtype=numpy.int64))
+        for numbers, ids in occurrences
+    ]
+
+
+def count_cooccurrences(source_occurrences, target_occurrences, num_of_targets):
+    """
+    Counts the segments in which each (source candidate, target candidate) pair appears together.
+    Both sides are sorted by segment number; every source occurrence is paired with every
+    target occurrence of its segment using repeat/cumsum arithmetic, and the pairs are counted
+    with numpy.unique. Returns arrays of source ids, target ids and counts.
+    """
+    numpy = optional.load("numpy")
+    source_numbers, source_ids = source_occurrences
+    target_numbers, target_ids = target_occurrences
+    if not len(source_numbers) or not len(target_numbers):
+        empty = numpy.array([], dtype=numpy.int64)
+        return empty, empty, empty
+
+    num_of_segments = int(max(source_numbers.max(), target_numbers.max())) + 1
+    target_counts = numpy.bincount(target_numbers, minlength=num_of_segments)
+    target_starts = numpy.cumsum(target_counts) - target_counts
+
+    # Number of target candidates in the segment of each source occurrence
+    repeats = target_counts[source_numbers]
+    total = int(repeats.sum())
+    if not total:
+        empty = numpy.array([], dtype=numpy.int64)
+        return empty, empty, empty
+
+    paired_sources = numpy.repeat(source_ids, repeats)
+    # Position of each pair among the pairs of its source occurrence
+    offsets = numpy.arange(total) - numpy.repeat(numpy.cumsum(repeats) - repeats, repeats)
+    paired_targets = target_ids[numpy.repeat(target_starts[source_numbers], repeats) + offsets]
+
+    keys, counts = numpy.unique(paired_sources * num_of_targets + paired_targets, return_counts=True)
+    return keys // num_of_targets, keys % num_of_targets, counts
+
+
+def align_candidates(vocabularies, occurrences, min_count=3, min_score=0.3):
+    """
+    Pairs each source candidate seen in at least min_count segments with its best target
+    candidate, and returns the pairs scoring at least min_score as ProposedTerm objects,
+    best first.
+    """
+    numpy = optional.load("numpy")
+    source_vocabulary, target_vocabulary = vocabularies
+    (source_numbers, source_ids), (target_numbers, target_ids) = occurrences
+    source_counts = numpy.bincount(source_ids, minlength=len(source_vocabulary))
+    target_counts = numpy.bincount(target_ids, minlength=len(target_vocabulary))
+
+    # Rare candidates are dropped before pairing, which keeps the number of pairs down
+    keep_source = source_counts[source_ids] >= min_count
+    keep_target = target_counts[target_ids] >= min_count
+    pair_sources, pair_targets, cooccurrences = count_cooccurrences(
+        (source_numbers[keep_source], source_ids[keep_source]),
+        (target_numbers[keep_target], target_ids[keep_target]),
+        len(target_vocabulary),
+    )
+
+    enough = cooccurrences >= min_count
+    pair_sources, pair_targets, cooccurrences = pair_sources[enough], pair_targets[enough], cooccurrences[enough]
+    scores = 2 * cooccurrences / (source_counts[pair_sources] + target_counts[pair_targets])
+
+    # Best target of each source candidate: sort by source, then by descending score
+    order = numpy.lexsort((-scores, pair_sources))
+    firsts = numpy.unique(pair_sources[order], return_index=True)[1]
+    best = order[firsts]
+    best = best[scores[best] >= min_score]
+    best = best[numpy.argsort(-scores[best], kind="stable")]
+
+    return [
+        ProposedTerm(
+            source=source_vocabulary.forms[pair_sources[index]],
+            target=target_vocabulary.forms[pair_targets[index]],
+            source_count=int(source_counts[pair_sources[index]]),
+            target_count=int(target_counts[pair_targets[index]]),
+            cooccurrences=int(cooccurrences[index]),
+            score=float(scores[index]),
+        )
+        for index in best
+    ]
+
+
+def extract_terms(segments, processes=1, batch_size=1000, max_tokens=5, min_count=3, min_score=0.3):
+    """
+    Returns ProposedTerm objects for an iterable of (source, target, ...) segment tuples.
+    """
+    vocabularies, occurrences = collect_candidates(segments, processes, batch_size, max_tokens)
+    return align_candidates(vocabularies, occurrences, min_count, min_score)
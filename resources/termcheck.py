@@ -0,0 +1,158 @@
+"""
+Term consistency check of a translation against glossaries.
+
+Reports the segments whose source contains a glossary source term while the target does
+not contain the approved target term. All source terms are matched at once with an
+Aho-Corasick automaton, so each segment is read once whatever the number of terms, and the
+whole check is a single pass over the translation's segments.
+
+Terms and segments are compared in their normalised form (see text.normalise_text()), so that
+full-width/half-width and case differences are ignored. Katakana is not folded to hiragana
+whatever the SEARCH_FOLD_KANA setting, as a term is only consistently used in one script.
+Terms made of ASCII letters and digits only match whole words (e.g. "cat" does not match "category").
+"""
+from collections import deque
+
+from .text import normalise_text
+
+
+def fold(text):
+    """ Returns the normalised form in which terms and segments are compared. """
+    return normalise_text(text, fold_kana=False)
+
+
+def _is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+
+class AhoCorasick:
+    """
+    Multi-pattern string matcher.
+    Patterns are added with add(), after which build() is called once;
+    iter_matches() then finds every occurrence of every pattern in a text in time
+    proportional to the length of the text plus the number of matches.
+    """
+    def __init__(self):
+        # The trie: one dict of char -> state per state, state 0 being the root
+        self._goto = [{}]
+        self._fail = [0]
+        # Values of the patterns ending at each state, including those reached through fail links
+        self._outputs = [[]]
+        self._built = False
+
+    def add(self, pattern, value):
+        """ Adds a pattern, and the value returned when it is found. """
+        if self._built:
+            raise RuntimeError("Patterns cannot be added after build() has been called.")
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(pattern), value))
+
+    def build(self):
+        """ Computes the fail links, breadth first from the root. """
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+        self._built = True
+
+    def iter_matches(self, text):
+        """ Yields (start, end, value) for each occurrence of each pattern in text. """
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for length, value in outputs[state]:
+                yield index + 1 - length, index + 1, value
+
+
+class Term:
+    """ A glossary entry used by the check. """
+    def __init__(self, entry_id, source, target):
+        self.entry_id = entry_id
+        self.source = source
+        self.target = target
+        self.folded_target = fold(target)
+        folded_source = fold(source)
+        self.whole_word_start = _is_word_char(folded_source[0])
+        self.whole_word_end = _is_word_char(folded_source[-1])
+
+
+class TermIssue:
+    """ A segment not using the approved target term of a source term found in it. """
+    def __init__(self, segment_number, source, target, term):
+        self.segment_number = segment_number
+        self.source = source
+        self.target = target
+        self.term = term
+
+
+class TermChecker:
+    """
+    Checks segments against a set of terms, given as (entry id, source, target) tuples.
+    A source term having several approved targets (e.g. in different glossaries) is
+    satisfied by any one of them.
+    """
+    def __init__(self, terms):
+        terms_by_source = {}
+        for entry_id, source, target in terms:
+            if source.strip() and target.strip():
+                terms_by_source.setdefault(fold(source), []).append(Term(entry_id, source, target))
+
+        self.num_of_terms = len(terms_by_source)
+        self.segments_checked = 0
+        self._matcher = AhoCorasick()
+        for folded_source, source_terms in terms_by_source.items():
+            self._matcher.add(folded_source, source_terms)
+        self._matcher.build()
+
+    def check_segment(self, source, target):
+        """ Returns the terms found in source whose approved targets are all missing from target. """
+        folded_source = fold(source)
+        folded_target = None
+        found = {}
+        for start, end, source_terms in self._matcher.iter_matches(folded_source):
+            term = source_terms[0]
+            if term.whole_word_start and start > 0 and _is_word_char(folded_source[start - 1]):
+                continue
+            if term.whole_word_end and end < len(folded_source) and _is_word_char(folded_source[end]):
+                continue
+            found[id(source_terms)] = source_terms
+
+        missing = []
+        for source_terms in found.values():
+            if folded_target is None:
+                folded_target = fold(target)
+            if not any(term.folded_target in folded_target for term in source_terms):
+                missing.append(source_terms[0])
+        return missing
+
+    def check(self, segments):
+        """
+        Yields a TermIssue for each missing target term, reading an iterable of
+        (source, target, ...) tuples once. segments_checked counts the segments read.
+        """
+        self.segments_checked = 0
+        for segment_number, segment in enumerate(segments, start=1):
+            self.segments_checked = segment_number
+            source, target = segment[0], segment[1]
+            for term in self.check_segment(source, target):
+                yield TermIssue(segment_number, source, target, term)
@@ -1,3 +1,1312 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unicodedata
+import zipfile
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import optional, telemetry
+from .autocomplete import PrefixIndex
+from .concordance import add_concordance, concordance_queryset
+from .duplicates import MinHasher, find_duplicates, jaccard, shingles, similar_keys
+from .exporters import tab_delimited_chunks, tmx_chunks, write_csv, write_tab_delimited
+from .forms import EntryFilterForm
+from .importers import CsvReader, TabDelimitedReader, TbxReader, TmxReader, XliffReader
+from .models import (
+    ChunkedUpload, Entry, Glossary, ImportJob, ImportJobItem, SearchCache, SearchLog, Segment, SegmentBlock,
+    TermExtraction, Translation,
+)
+from .pattern_search import (
+    MatchTimeout, PatternError, PatternMatcher, SearchPattern, WorkerPool, pattern_search_sources,
+)
+from .search import ALL_RESOURCES, merge_results, run_search, search_querysets, text_search_sources
+from .segment_archive import ArchiveError, build_archive
+from .segment_store import (
+    _hashes, archive_translation, compress_translation, encode_block, expand_translation, iter_segments,
+    might_contain, segment_count, stored_segment_sources,
+)
+from .tasks import delete_resource
+from .term_extraction import CandidateVocabulary, TermExtractionError, align_candidates, count_cooccurrences
+from .termcheck import AhoCorasick, TermChecker
+from .text import normalised_positions, query_ngrams
+from .views import build_translation_download, merge_entries
+
+
+# Packages which must only be imported when a request or command needs them
+LAZY_PACKAGES = ("openpyxl", "numpy", "spacy", "thinc", "blis")
+
+# Generous limit on the time taken to import the URL configuration (and so all views),
+# in microseconds; a worker importing it in more than this has picked up a heavy import.
+MAX_URLS_IMPORT_TIME = 1000000
+
+
+def import_times(module):
+    """
+    Imports module in a new Python process with "python -X importtime", after setting up Django,
+    and returns a dict of module name -> cumulative import time in microseconds.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE="config.settings")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import django; django.setup(); import {module}"],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class StartupTimeTests(SimpleTestCase):
+    """ Keeps the start-up of web workers fast. """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.times = import_times("config.urls")
+
+    def test_heavy_packages_not_imported(self):
+        imported = [package for package in LAZY_PACKAGES if package in self.times]
+        self.assertEqual(imported, [], "These packages should be imported on first use, with optional.load().")
+
+    def test_urls_import_time(self):
+        self.assertLess(self.times["config.urls"], MAX_URLS_IMPORT_TIME)
+
+
+class PrefixIndexTests(SimpleTestCase):
+    """ Search-as-you-type completions (autocomplete.PrefixIndex). """
+    def test_shortest_terms_first(self):
+        terms = [f"ab{i:04d}" for i in range(1000)] + ["abz", "Abc", "abc", "b"]
+        index = PrefixIndex(terms)
+        self.assertEqual(index.complete("AB", limit=3), ["Abc", "abz", "ab0000"])
+        self.assertEqual(index.complete("abz"), ["abz"])
+        self.assertEqual(index.complete("c"), [])
+
+
+class FakeSearchSource:
+    """ Search source returning results with given (match rank, match length) pairs, after a delay. """
+    def __init__(self, name, ranks, priority=0, delay=0, error=None):
+        self.name = name
+        self.ranks = ranks
+        self.priority = priority
+        self.delay = delay
+        self.error = error
+
+    def fetch(self, limit=None):
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        results = [
+            SimpleNamespace(name=f"{self.name}{position}", search_rank=(*rank, self.priority, position))
+            for position, rank in enumerate(sorted(self.ranks)[:limit])
+        ]
+        return results, len(self.ranks)
+
+
+class RunSearchTests(SimpleTestCase):
+    """ Concurrent fetching and merging of the results of several search sources (search.run_search). """
+    def setUp(self):
+        self.sources = [
+            # The slowest source finishes last but has the best results
+            FakeSearchSource("entry", [(0, 3), (1, 2), (2, 9)], priority=0, delay=0.05),
+            FakeSearchSource("segment", [(0, 3), (0, 5), (2, 1), (2, 4)], priority=1),
+            FakeSearchSource("stored", [(1, 1), (2, 2)], priority=1, delay=0.02),
+        ]
+
+    def sequential(self, limit):
+        """ Results of fetching each source in turn and sorting all the results. """
+        fetched = [source.fetch(limit) for source in self.sources]
+        results = sorted((result for results, total in fetched for result in results), key=lambda r: r.search_rank)
+        return [result.name for result in results[:limit]], sum(total for results, total in fetched)
+
+    def test_merged_like_sequential(self):
+        for limit in (None, 1, 3, 5, 100):
+            with self.subTest(limit=limit):
+                results = run_search(self.sources, limit=limit)
+                names, hits = self.sequential(limit)
+                self.assertEqual([result.name for result in results.items], names)
+                self.assertEqual(results.hits, hits)
+        self.assertEqual(
+            [result.name for result in run_search(self.sources, limit=4).items],
+            ["entry0", "segment0", "segment1", "stored0"],
+        )
+
+    def test_single_source(self):
+        results = run_search(self.sources[1:2], limit=2)
+        self.assertEqual([result.name for result in results.items], ["segment0", "segment1"])
+        self.assertEqual(results.hits, 4)
+
+    def test_source_error(self):
+        # An error in one source is raised as in a sequential search, and the pool is still usable
+        self.sources[1].error = ValueError("Query failed")
+        with self.assertRaisesMessage(ValueError, "Query failed"):
+            self.sequential(10)
+        with self.assertRaisesMessage(ValueError, "Query failed"):
+            run_search(self.sources, limit=10)
+        self.sources[1].error = None
+        self.assertEqual(len(run_search(self.sources, limit=10).items), 9)
+
+
+class SearchRankingTests(TestCase):
+    """ Ranking of text search results in the database (search.rank_queryset) and across sources. """
+    def test_ranking(self):
+        glossary = Glossary.objects.create(title="Ranking glossary")
+        translation = Translation.objects.create(job_number="RANKING-1")
+        for source, target in (
+            ("負の電極層", "negative electrode layer"),
+            ("電極材料", "electrode material"),
+            ("正電極", "positive electrode"),
+            ("電極層", "electrode layer"),
+            ("ＡＢＣ", "電極"),
+            ("電極板", "electrode plate"),
+        ):
+            Entry.objects.create(glossary=glossary, source=source, target=target)
+        for source in ("電極膜", "電極"):
+            Segment.objects.create(translation=translation, source=source, target="electrode")
+
+        sources = text_search_sources("電極", *search_querysets(""))
+        results = merge_results([source.fetch()[0] for source in sources])
+        self.assertEqual(
+            [(type(result).__name__, result.source) for result in results],
+            [
+                # Exact matches (of the source or the target), glossary entries first
+                ("Entry", "ＡＢＣ"),
+                ("Segment", "電極"),
+                # Prefix matches, shortest first, then glossary entries first and in the order they were added
+                ("Entry", "電極層"),
+                ("Entry", "電極板"),
+                ("Segment", "電極膜"),
+                ("Entry", "電極材料"),
+                # Other matches
+                ("Entry", "正電極"),
+                ("Entry", "負の電極層"),
+            ],
+        )
+
+
+class TermCheckTests(SimpleTestCase):
+    """ Multi-pattern matching and term consistency checks (termcheck.py). """
+    @staticmethod
+    def matcher(patterns):
+        matcher = AhoCorasick()
+        for pattern in patterns:
+            matcher.add(pattern, pattern)
+        matcher.build()
+        return matcher
+
+    @staticmethod
+    def brute_force(patterns, text):
+        return sorted(
+            (start, start + len(pattern), pattern)
+            for pattern in patterns
+            for start in range(len(text) - len(pattern) + 1)
+            if text.startswith(pattern, start)
+        )
+
+    def test_overlapping_and_prefix_patterns(self):
+        patterns = ["電極", "電極層", "極層", "層", "abab", "ba"]
+        text = "負電極層と電極ababab"
+        matches = sorted(self.matcher(patterns).iter_matches(text))
+        self.assertEqual(matches, self.brute_force(patterns, text))
+        self.assertIn((1, 4, "電極層"), matches)
+        self.assertIn((2, 4, "極層"), matches)
+        self.assertIn((9, 13, "abab"), matches)
+
+    def test_random_patterns(self):
+        rng = random.Random(41)
+        for _ in range(50):
+            patterns = {"".join(rng.choices("abc", k=rng.randint(1, 4))) for _ in range(rng.randint(1, 10))}
+            text = "".join(rng.choices("abcd", k=40))
+            self.assertEqual(sorted(self.matcher(patterns).iter_matches(text)), self.brute_force(patterns, text))
+
+    def test_prefix_terms(self):
+        checker = TermChecker([(1, "電極", "electrode"), (2, "電極層", "electrode layer")])
+        missing = checker.check_segment("電極層を形成する。", "An electrode film is formed.")
+        self.assertEqual([term.entry_id for term in missing], [2])
+        self.assertEqual(checker.check_segment("電極層を形成する。", "An electrode layer is formed."), [])
+
+    def test_full_width_input(self):
+        checker = TermChecker([(1, "ＡＢＣ樹脂", "ABC resin"), (2, "ｶﾞｽ", "gas")])
+        self.assertEqual(checker.check_segment("abc樹脂とガス", "ＡＢＣ ｒｅｓｉｎ and ＧＡＳ"), [])
+        missing = checker.check_segment("ＡＢＣ樹脂とガス", "resin and gas")
+        self.assertEqual([term.entry_id for term in missing], [1])
+
+    def test_whole_words(self):
+        checker = TermChecker([(1, "cat", "neko"), (2, "猫", "cat")])
+        self.assertEqual(checker.check_segment("category", "kategori"), [])
+        self.assertEqual([term.entry_id for term in checker.check_segment("a cat.", "a dog")], [1])
+
+    def test_several_targets(self):
+        checker = TermChecker([(1, "端子", "terminal"), (2, "端子", "connector"), (3, "端子", " ")])
+        self.assertEqual(checker.check_segment("端子", "the connector"), [])
+        issues = list(checker.check([("端子", "the pin"), ("無関係", "unrelated")]))
+        self.assertEqual([(issue.segment_number, issue.term.entry_id) for issue in issues], [(1, 1)])
+        self.assertEqual(checker.segments_checked, 2)
+
+
+class FindDuplicatesTests(SimpleTestCase):
+    """ Exact and near-duplicate source terms (duplicates.py). The MinHash seed is fixed, so results are repeatable. """
+    SEED = 44
+
+    def groups(self, terms, **kwargs):
+        entries = [(number, 1, source, target) for number, (source, target) in enumerate(terms)]
+        return [
+            sorted((entry.source, entry.target) for entry in group.entries)
+            for group in find_duplicates(entries, seed=self.SEED, **kwargs)
+        ]
+
+    def test_near_duplicates_found(self):
+        groups = self.groups([
+            ("コンピュータ", "computer"),
+            ("コンピューター", "computer"),
+            ("electrode layer", "電極層"),
+            ("electrode layers", "電極層"),
+        ])
+        self.assertCountEqual(groups, [
+            [("コンピュータ", "computer"), ("コンピューター", "computer")],
+            [("electrode layer", "電極層"), ("electrode layers", "電極層")],
+        ])
+
+    def test_different_terms_not_paired(self):
+        self.assertEqual(self.groups([
+            ("layer 1", "第1層"),
+            ("layer 2", "第2層"),
+            ("電極", "electrode"),
+            ("絶縁体", "insulator"),
+            ("electrode", "電極"),
+            ("insulator", "絶縁体"),
+        ]), [])
+
+    def test_exact_duplicates(self):
+        entries = [(1, 1, "ＡＢＣ", "abc"), (2, 2, "abc", "ABC"), (3, 2, "abc", "xyz"), (4, 1, "abd", "abd")]
+        groups = find_duplicates(entries, near=False, seed=self.SEED)
+        self.assertEqual([[entry.entry_id for entry in group.entries] for group in groups], [[1, 2, 3]])
+        self.assertTrue(groups[0].is_exact)
+        self.assertTrue(groups[0].has_conflict)
+
+    def test_repeatable(self):
+        rng = random.Random(self.SEED)
+        keys = ["".join(rng.choices("abcdefgh", k=rng.randint(4, 12))) for _ in range(300)]
+        pairs = list(similar_keys(keys, 0.5, seed=self.SEED))
+        self.assertEqual(list(similar_keys(keys, 0.5, seed=self.SEED)), pairs)
+        self.assertEqual(MinHasher(seed=self.SEED).signature({"ab"}), MinHasher(seed=self.SEED).signature({"ab"}))
+        # Every pair found is similar enough; LSH only chooses which pairs are compared
+        for a, b in pairs:
+            self.assertGreaterEqual(jaccard(shingles(keys[a]), shingles(keys[b])), 0.5)
+
+
+class PatternSearchTests(TestCase):
+    """ Regular expression and wildcard searches (pattern_search.py). """
+    @classmethod
+    def setUpTestData(cls):
+        cls.glossary = Glossary.objects.create(title="Pattern glossary")
+        cls.translation = Translation.objects.create(job_number="PATTERN-1")
+
+    def search(self, text, mode="regex"):
+        pattern = SearchPattern(text, mode)
+        sources = pattern_search_sources(
+            pattern,
+            [
+                ("glossary", Entry.objects.filter(glossary=self.glossary), 0),
+                ("translation", Segment.objects.filter(translation=self.translation), 1),
+            ],
+            [],
+        )
+        results = [result for source in sources for result in source.fetch(100)[0]]
+        return results, any(source.incomplete for source in sources)
+
+    def test_expensive_patterns_refused(self):
+        for text, mode in (
+            ("ab(a|a)+c", "regex"),
+            ("ab*c*d*e*f*g*h*z", "wildcard"),
+            ("電極.*.*層", "regex"),
+            ("(電極a+)+", "regex"),
+            ("(電極)\\1", "regex"),
+        ):
+            with self.subTest(text=text), self.assertRaises(PatternError):
+                SearchPattern(text, mode)
+
+    def test_repeated_wildcards_allowed(self):
+        self.assertEqual(SearchPattern("電極**層", "wildcard").regex.pattern, "電極.*層")
+
+    def test_normalised_text_matched(self):
+        Entry.objects.create(glossary=self.glossary, source="ＡＢＣ１２層", target="abc layer")
+        Entry.objects.create(glossary=self.glossary, source="ABC層", target="abc layer")
+        results, incomplete = self.search("abc\\d+層")
+        self.assertEqual([entry.source for entry in results], ["ＡＢＣ１２層"])
+        self.assertFalse(incomplete)
+        # The match is highlighted in the original (full-width) text
+        self.assertEqual(results[0].source_spans, [(0, 6)])
+
+    @override_settings(SEARCH_PATTERN_TIMEOUT=0.5)
+    def test_slow_match_stopped(self):
+        Segment.objects.create(translation=self.translation, source="zab" + "cd" * 1500, target="x")
+        started = time.monotonic()
+        results, incomplete = self.search("ab*c*d*z", "wildcard")
+        self.assertEqual(results, [])
+        self.assertTrue(incomplete)
+        self.assertLess(time.monotonic() - started, 5)
+
+    def worker_pool(self):
+        pool = WorkerPool(1)
+        self.addCleanup(lambda: [worker.stop() for worker in pool.idle])
+        return pool
+
+    def test_workers_reused(self):
+        pool = self.worker_pool()
+        pids = []
+        for text, expected in (("電極\\d+", [((2, 0), [(1, 5)], [])]), ("abc+", [None])):
+            with PatternMatcher(SearchPattern(text), time.monotonic() + 10, pool) as matcher:
+                self.assertEqual(matcher.match([("負電極12", "x")]), expected)
+                pids.append(matcher.worker.process.pid)
+        self.assertEqual(pids[0], pids[1])
+        self.assertEqual(len(pool.idle), 1)
+
+    def test_timed_out_worker_replaced(self):
+        pool = self.worker_pool()
+        with PatternMatcher(SearchPattern("ab*c*d*z", "wildcard"), time.monotonic() + 0.5, pool) as matcher:
+            with self.assertRaises(MatchTimeout):
+                matcher.match([("zab" + "cd" * 1500, "x")])
+            worker = matcher.worker
+        self.assertFalse(worker.process.is_alive())
+        self.assertEqual(pool.idle, [])
+        with PatternMatcher(SearchPattern("電極"), time.monotonic() + 10, pool) as matcher:
+            self.assertEqual(matcher.match([("電極", "x")]), [((0, 0), [(0, 2)], [])])
+            self.assertNotEqual(matcher.worker.process.pid, worker.process.pid)
+
+    def test_worker_pool_bounded(self):
+        pool = self.worker_pool()
+        worker = pool.acquire(time.monotonic() + 10)
+        started = time.monotonic()
+        with PatternMatcher(SearchPattern("電極"), started + 0.2, pool) as matcher:
+            with self.assertRaises(MatchTimeout):
+                matcher.match([("電極", "x")])
+        self.assertLess(time.monotonic() - started, 2)
+        pool.release(worker)
+
+    @override_settings(SEARCH_PATTERN_MAX_TEXT_LENGTH=100)
+    def test_long_text_not_searched(self):
+        Segment.objects.create(translation=self.translation, source="電極" + "x" * 200, target="y")
+        results, incomplete = self.search("電極x+")
+        self.assertEqual(results, [])
+        self.assertTrue(incomplete)
+
+
+class MediaRootMixin:
+    """ Stores uploaded files in a temporary MEDIA_ROOT, deleted after each test. """
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class MergeEntriesTests(MediaRootMixin, TestCase):
+    """ Updating an existing glossary from a file (views.merge_entries). """
+    def setUp(self):
+        super().setUp()
+        self.glossary = Glossary.objects.create(title="Merge glossary")
+        for source, target in (("apple", "ringo"), ("apple", "appuru"), ("pear", "nashi")):
+            Entry.objects.create(glossary=self.glossary, source=source, target=target)
+
+    def merge(self, content, delete_missing):
+        self.glossary.glossary_file.save("merge.txt", ContentFile(content.encode("utf-8")), save=True)
+        return merge_entries(self.glossary, None, delete_missing)
+
+    def terms(self):
+        return sorted(self.glossary.entries.values_list("source", "target"))
+
+    def test_nothing_deleted_without_delete_missing(self):
+        summary = self.merge("banana\tbanana\n", delete_missing=False)
+        self.assertEqual(summary["deleted"], 0)
+        self.assertEqual(self.terms(), [
+            ("apple", "appuru"), ("apple", "ringo"), ("banana", "banana"), ("pear", "nashi"),
+        ])
+
+    def test_targets_of_same_source_kept(self):
+        summary = self.merge("apple\tringo\napple\tappuru\npear\tnashi\n", delete_missing=True)
+        self.assertEqual((summary["created"], summary["deleted"], summary["unchanged"]), (0, 0, 3))
+        self.assertEqual(self.terms(), [("apple", "appuru"), ("apple", "ringo"), ("pear", "nashi")])
+
+    def test_missing_entries_deleted(self):
+        summary = self.merge("APPLE\tringo\n", delete_missing=True)
+        self.assertEqual((summary["updated"], summary["deleted"]), (1, 2))
+        self.assertEqual(self.terms(), [("APPLE", "ringo")])
+
+    def test_nothing_deleted_when_lines_rejected(self):
+        summary = self.merge("apple\tringo\nno target\n", delete_missing=True)
+        self.assertEqual(summary["report"].rejected_count, 1)
+        self.assertEqual(summary["deleted"], 0)
+        self.assertEqual(len(self.terms()), 3)
+
+    def test_repeated_lines_counted(self):
+        summary = self.merge("kiwi\tkiwi\nkiwi\tkiwi\tsecond\n", delete_missing=False)
+        self.assertEqual((summary["created"], summary["skipped"]), (1, 1))
+
+
+class SearchCacheRefreshTests(TestCase):
+    """ Cached search results affected by changes to entries are deleted (search_cache.refresh_search_cache). """
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user("editor"))
+        self.glossary = Glossary.objects.create(title="Fruit")
+        self.other = Glossary.objects.create(title="Vegetables")
+        self.entry = Entry.objects.create(glossary=self.glossary, source="apple pie", target="appuru pai")
+        for query in ("apple", "pie", "carrot"):
+            for resource in ("Fruit", "Vegetables", ""):
+                SearchCache.objects.create(query=query, query_norm=query, resource=resource, hits=0, results=[])
+
+    def cached(self):
+        return sorted(SearchCache.objects.values_list("query_norm", "resource"))
+
+    def test_entry_update(self):
+        self.client.post(f"/entry/{self.entry.pk}/edit/", {
+            "source": "apple", "target": "appuru", "glossary": self.glossary.pk, "notes": "",
+        })
+        self.assertEqual(self.cached(), [
+            ("apple", "Vegetables"), ("carrot", ""), ("carrot", "Fruit"),
+            ("carrot", "Vegetables"), ("pie", "Vegetables"),
+        ])
+
+    def test_entry_without_glossary_updated(self):
+        entry = Entry.objects.create(source="pie crust", target="pai kiji")
+        response = self.client.post(f"/entry/{entry.pk}/edit/", {
+            "source": "pie crust", "target": "kiji", "glossary": "", "notes": "",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(("pie", ""), self.cached())
+        self.assertIn(("pie", "Fruit"), self.cached())
+
+    def test_entry_glossary_cleared(self):
+        response = self.client.post(f"/entry/{self.entry.pk}/edit/", {
+            "source": "apple pie", "target": "appuru pai", "glossary": "", "notes": "",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(("apple", "Fruit"), self.cached())
+
+    def test_translation_renamed(self):
+        translation = Translation.objects.create(job_number="Fruit")
+        response = self.client.post(f"/translation/{translation.pk}/edit/", {"job_number": "J-2"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(self.cached(), [
+            ("apple", ""), ("apple", "Vegetables"), ("carrot", ""), ("carrot", "Vegetables"),
+            ("pie", ""), ("pie", "Vegetables"),
+        ])
+
+    def test_entries_moved(self):
+        self.client.post(f"/glossary/{self.glossary.pk}/bulk/", {
+            "entries": [self.entry.pk], "action": "move", "glossary": self.other.pk,
+        })
+        self.assertEqual(Entry.objects.get().glossary, self.other)
+        self.assertEqual(self.cached(), [
+            ("apple", ""), ("carrot", ""), ("carrot", "Fruit"), ("carrot", "Vegetables"), ("pie", ""),
+        ])
+
+    def test_glossary_renamed(self):
+        self.client.post(f"/glossary/{self.glossary.pk}/edit/", {"title": "Vegetables", "notes": ""})
+        self.assertEqual(self.cached(), [("apple", ""), ("carrot", ""), ("pie", "")])
+
+
+# Pages are rendered without running collectstatic first
+@override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+class GlossaryEntryBulkTests(TestCase):
+    """ Actions applied to the selected entries of a glossary (views.GlossaryEntryBulkView). """
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("editor")
+        self.client.force_login(self.user)
+        self.glossary = Glossary.objects.create(title="Fruit")
+        self.other = Glossary.objects.create(title="Vegetables")
+        self.apple = Entry.objects.create(glossary=self.glossary, source="apple", target="ringo", notes="red")
+        self.pear = Entry.objects.create(glossary=self.glossary, source="pear", target="nashi", notes="green")
+        self.carrot = Entry.objects.create(glossary=self.other, source="carrot", target="ninjin")
+        self.orphan = Entry.objects.create(source="plum", target="sumomo")
+
+    def post(self, entries, action, **data):
+        return self.client.post(f"/glossary/{self.glossary.pk}/bulk/", {
+            "entries": [entry.pk for entry in entries], "action": action, **data,
+        })
+
+    def test_move(self):
+        response = self.post([self.apple], "move", glossary=self.other.pk)
+        self.assertRedirects(response, f"/glossary/{self.glossary.pk}/all/", fetch_redirect_response=False)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.glossary, self.other)
+        self.assertEqual(self.apple.updated_by, self.user)
+        self.assertEqual(list(self.glossary.entries.values_list("source", flat=True)), ["pear"])
+
+    def test_move_to_same_glossary(self):
+        response = self.post([self.apple], "move", glossary=self.glossary.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("glossary", response.context["bulk_form"].errors)
+        self.assertEqual(Entry.objects.get(pk=self.apple.pk).glossary, self.glossary)
+
+    def test_update(self):
+        self.post([self.apple, self.pear], "update", target="ＦＲＵＩＴ", notes="")
+        self.assertEqual(
+            sorted(self.glossary.entries.values_list("target", "target_norm", "notes")),
+            [("ＦＲＵＩＴ", "fruit", "green"), ("ＦＲＵＩＴ", "fruit", "red")],
+        )
+        self.post([self.apple], "update", target="", clear_notes="on")
+        self.assertEqual(Entry.objects.get(pk=self.apple.pk).notes, "")
+        self.assertEqual(Entry.objects.get(pk=self.pear.pk).notes, "green")
+
+    def test_delete(self):
+        self.post([self.apple, self.pear], "delete")
+        self.assertFalse(self.glossary.entries.exists())
+        self.assertEqual(Entry.objects.count(), 2)
+
+    def test_entries_of_other_glossaries_refused(self):
+        # Entries of another glossary, or without a glossary, cannot be selected
+        for entry in (self.carrot, self.orphan):
+            with self.subTest(entry=entry.source):
+                response = self.post([self.apple, entry], "delete")
+                self.assertEqual(response.status_code, 200)
+                self.assertIn("entries", response.context["bulk_form"].errors)
+                self.assertEqual(Entry.objects.count(), 4)
+
+
+class TranslationDeletionTests(TestCase):
+    """ Translations are hidden as soon as they are deleted, and deleted in batches in the background (tasks.py). """
+    def setUp(self):
+        self.client.force_login(get_user_model().objects.create_user("editor"))
+        self.translation = Translation.objects.create(job_number="DELETE-1")
+        for i in range(5):
+            Segment.objects.create(translation=self.translation, source=f"削除{i}", target=f"delete {i}")
+
+    def test_hidden_immediately(self):
+        # Background tasks only start once the transaction is committed, so never run here
+        response = self.client.post(f"/translation/{self.translation.pk}/delete/")
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Translation.objects.available().filter(pk=self.translation.pk).exists())
+        entries, segments, stored_translations = search_querysets("")
+        self.assertFalse(segments.exists())
+        self.assertEqual(Segment.objects.count(), 5)
+
+    def test_deleted_in_batches(self):
+        other = Translation.objects.create(job_number="KEEP-1")
+        Segment.objects.create(translation=other, source="残す", target="keep")
+        compressed = Translation.objects.create(job_number="DELETE-2")
+        for i in range(5):
+            Segment.objects.create(translation=compressed, source=f"圧縮{i}", target=f"compressed {i}")
+        compress_translation(compressed, block_size=2)
+        self.assertEqual(SegmentBlock.objects.filter(translation=compressed).count(), 3)
+
+        for translation in (self.translation, compressed):
+            delete_resource(Translation, translation.pk, batch_size=2)
+        self.assertEqual(list(Translation.objects.values_list("job_number", flat=True)), ["KEEP-1"])
+        self.assertEqual(list(Segment.objects.values_list("source", flat=True)), ["残す"])
+        self.assertFalse(SegmentBlock.objects.exists())
+
+
+class ExportTests(TestCase):
+    """ Exported files can be imported again (exporters.py and importers.py). """
+    SEGMENTS = [
+        ("「A&B」<社>", "\"A&B\" <Inc.>", "ja", "en"),
+        ("原文", "Quelltext", "ja", "de"),
+        ("source text", "原文", "en-us", "ja"),
+    ]
+
+    def setUp(self):
+        self.translation = Translation.objects.create(job_number="EXPORT-1")
+        for source, target, source_lang, target_lang in self.SEGMENTS:
+            Segment.objects.create(
+                translation=self.translation, source=source, target=target,
+                source_lang=source_lang, target_lang=target_lang,
+            )
+
+    def test_tmx_round_trip(self):
+        data = b"".join(tmx_chunks(self.translation))
+        self.assertEqual(list(TmxReader(io.BytesIO(data))), self.SEGMENTS)
+
+    def test_tab_delimited_round_trip(self):
+        data = b"".join(tab_delimited_chunks(self.translation))
+        rows = list(TabDelimitedReader(io.BytesIO(data)))
+        self.assertEqual(rows, [(source, target, "") for source, target, source_lang, target_lang in self.SEGMENTS])
+
+    def test_glossary_round_trip(self):
+        glossary = Glossary.objects.create(title="Export glossary")
+        entries = [("りんご", "apple, red", "fruit\nnotes"), ("ＡＢＣ", "\"ABC\"\tInc.", "")]
+        for source, target, notes in entries:
+            Entry.objects.create(glossary=glossary, source=source, target=target, notes=notes)
+        for writer, reader_class, expected in (
+            (write_csv, CsvReader, entries),
+            # Notes are written on a single line
+            (write_tab_delimited, TabDelimitedReader, [("りんご", "apple, red", "fruit notes"), entries[1]]),
+        ):
+            with self.subTest(writer=writer.__name__):
+                f = io.BytesIO()
+                writer(glossary, f)
+                self.assertEqual(list(reader_class(io.BytesIO(f.getvalue()))), expected)
+
+    def test_zip_of_translations(self):
+        other = Translation.objects.create(job_number="EXPORT-2")
+        Segment.objects.create(translation=other, source="別", target="other", source_lang="ja", target_lang="en")
+        for file_format in ("tmx", "txt"):
+            with self.subTest(file_format=file_format):
+                response = build_translation_download([self.translation, other], file_format)
+                with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as archive:
+                    self.assertEqual(archive.namelist(), [f"EXPORT-1.{file_format}", f"EXPORT-2.{file_format}"])
+                    for translation in (self.translation, other):
+                        single = build_translation_download([translation], file_format)
+                        self.assertEqual(
+                            archive.read(f"{translation.job_number}.{file_format}"),
+                            b"".join(single.streaming_content),
+                        )
+
+
+class EntryFilterFormTests(TestCase):
+    """ Sorting and filtering of the glossary entries page (forms.EntryFilterForm). """
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.alice = User.objects.create_user("alice")
+        cls.bob = User.objects.create_user("bob")
+        cls.outsider = User.objects.create_user("outsider")
+        cls.glossary = Glossary.objects.create(title="Filter glossary")
+        other = Glossary.objects.create(title="Other")
+        Entry.objects.create(glossary=other, source="x", target="x", created_by=cls.outsider)
+        for source, target, notes, user, created_on in (
+            ("banana", "banana", "", cls.alice, datetime(2024, 5, 1, 0, 0)),
+            ("apple", "ringo", "red", cls.bob, datetime(2024, 5, 1, 23, 59)),
+            ("cherry", "sakuranbo", "", cls.alice, datetime(2024, 5, 2, 0, 0)),
+            ("apple", "appuru", "loanword", cls.alice, datetime(2024, 4, 30, 23, 59)),
+        ):
+            entry = Entry.objects.create(
+                glossary=cls.glossary, source=source, target=target, notes=notes, created_by=user,
+            )
+            Entry.objects.filter(pk=entry.pk).update(created_on=timezone.make_aware(created_on))
+
+    def filtered(self, **data):
+        form = EntryFilterForm(data, glossary=self.glossary)
+        return [(entry.source, entry.target) for entry in form.filter(self.glossary.entries.all())]
+
+    def test_default_sort(self):
+        self.assertEqual(self.filtered(), [
+            ("apple", "ringo"), ("apple", "appuru"), ("banana", "banana"), ("cherry", "sakuranbo"),
+        ])
+
+    def test_sort(self):
+        self.assertEqual(self.filtered(sort="-source")[0], ("cherry", "sakuranbo"))
+        self.assertEqual(self.filtered(sort="target")[0], ("apple", "appuru"))
+        self.assertEqual(self.filtered(sort="-target")[0], ("cherry", "sakuranbo"))
+        self.assertEqual(self.filtered(sort="created_on")[0], ("apple", "appuru"))
+        self.assertEqual(self.filtered(sort="-created_on")[0], ("cherry", "sakuranbo"))
+
+    def test_author(self):
+        self.assertEqual(self.filtered(author=self.bob.pk), [("apple", "ringo")])
+        form = EntryFilterForm(glossary=self.glossary)
+        self.assertEqual(list(form.fields["author"].queryset), [self.alice, self.bob])
+
+    def test_dates(self):
+        # Both dates are included, whatever the time of day
+        self.assertEqual(
+            self.filtered(created_from="2024-05-01", created_to="2024-05-01"),
+            [("apple", "ringo"), ("banana", "banana")],
+        )
+        self.assertEqual(self.filtered(created_from="2024-05-02"), [("cherry", "sakuranbo")])
+        self.assertEqual(self.filtered(created_to="2024-04-30"), [("apple", "appuru")])
+
+    def test_notes(self):
+        self.assertEqual(self.filtered(notes="yes"), [("apple", "ringo"), ("apple", "appuru")])
+        self.assertEqual(self.filtered(notes="no"), [("banana", "banana"), ("cherry", "sakuranbo")])
+
+    def test_invalid_input(self):
+        # Invalid filters are ignored and the entries are sorted by source term
+        everything = self.filtered()
+        for data in (
+            {"sort": "glossary"},
+            {"author": self.outsider.pk},
+            {"author": "nobody"},
+            {"created_from": "2024-13-01"},
+            {"notes": "maybe", "created_to": "2024-04-30"},
+        ):
+            with self.subTest(data=data):
+                self.assertFalse(EntryFilterForm(data, glossary=self.glossary).is_valid())
+                self.assertEqual(self.filtered(**data), everything)
+
+
+class SearchTelemetryTests(TestCase):
+    """ Search logs are queued and saved in batches (telemetry.py), and shown to staff only. """
+    def setUp(self):
+        # The logs are saved by calling flush() rather than by the writer's thread
+        with mock.patch.object(telemetry.threading, "Thread"):
+            self.writer = telemetry.SearchLogWriter(batch_size=2, flush_interval=60, max_queued=3)
+        writer_patch = mock.patch.object(telemetry, "_writer", self.writer)
+        writer_patch.start()
+        self.addCleanup(writer_patch.stop)
+
+    def test_logs_saved(self):
+        telemetry.record_search("ＡＢＣ", ALL_RESOURCES, hits=3, latency=0.25)
+        telemetry.record_search("electrode", "Fruit", hits=0, latency=0.5, kind=SearchLog.AUTOCOMPLETE)
+        self.assertFalse(SearchLog.objects.exists())
+        self.writer.flush()
+        fields = ("kind", "query", "query_norm", "resource", "hits", "latency")
+        self.assertEqual(
+            list(SearchLog.objects.order_by("pk").values_list(*fields)),
+            [
+                (SearchLog.SEARCH, "ＡＢＣ", "abc", "", 3, 250),
+                (SearchLog.AUTOCOMPLETE, "electrode", "electrode", "Fruit", 0, 500),
+            ],
+        )
+
+    def test_batches(self):
+        for i in range(5):
+            telemetry.record_search(f"query {i}", "", hits=1, latency=0.1)
+        # Logs beyond SEARCH_LOG_MAX_QUEUED are dropped
+        self.assertEqual(len(self.writer.take_batch(0)), 2)
+        self.assertEqual(len(self.writer.take_batch(0)), 1)
+        self.assertEqual(self.writer.take_batch(0), [])
+
+    @override_settings(SEARCH_LOG_ENABLED=False)
+    def test_disabled(self):
+        telemetry.record_search("apple", "", hits=1, latency=0.1)
+        self.assertEqual(self.writer.take_batch(0), [])
+
+    @override_settings(STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage")
+    def test_analytics_staff_only(self):
+        SearchLog.objects.create(query="apple", query_norm="apple", hits=2, latency=10)
+        self.client.force_login(get_user_model().objects.create_user("translator"))
+        self.assertEqual(self.client.get("/search/analytics/").status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user("admin", is_staff=True))
+        response = self.client.get("/search/analytics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "apple")
+
+
+class ChunkedUploadTests(MediaRootMixin, TestCase):
+    """ Resumable uploads of large translation files (views.ChunkedUploadView). """
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.create_user("uploader"))
+
+    def start(self, content):
+        response = self.client.post("/translation/upload/chunked/", {
+            "filename": "large.tmx", "size": len(content), "job_number": "J-1",
+        })
+        self.assertEqual(response.status_code, 201)
+        return response.json()["url"]
+
+    def send(self, url, chunk, offset, **headers):
+        return self.client.generic(
+            "PATCH", url, chunk, content_type="application/octet-stream", HTTP_UPLOAD_OFFSET=str(offset), **headers,
+        )
+
+    def test_file_checksum_sent_with_last_chunk(self):
+        content = b"first chunk, last chunk"
+        url = self.start(content)
+        self.assertEqual(self.send(url, content[:12], 0).json()["status"], ChunkedUpload.UPLOADING)
+        checksum = hashlib.sha256(content).hexdigest()
+        response = self.send(url, content[12:], 12, HTTP_UPLOAD_FILE_CHECKSUM=f"sha256 {checksum.upper()}")
+        self.assertEqual(response.json()["status"], ChunkedUpload.IMPORTING)
+        self.assertEqual(ChunkedUpload.objects.get().checksum, checksum)
+
+    def test_invalid_checksum_refused(self):
+        url = self.start(b"content")
+        response = self.send(url, b"content", 0, HTTP_UPLOAD_FILE_CHECKSUM="md5 abc")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get().offset, 0)
+
+    def test_stuck_import_failed(self):
+        upload = ChunkedUpload.objects.create(filename="large.tmx", size=1, status=ChunkedUpload.IMPORTING)
+        ChunkedUpload.objects.filter(pk=upload.pk).update(updated_on=upload.updated_on - timedelta(hours=100))
+        call_command("purge_chunked_uploads", stdout=io.StringIO())
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, ChunkedUpload.FAILED)
+
+
+class ArchiveStorageMixin(MediaRootMixin):
+    """ Keeps segment archives in the temporary MEDIA_ROOT, and this server's copies in another temporary folder. """
+    def setUp(self):
+        super().setUp()
+        self.archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_root, ignore_errors=True)
+        settings_override = override_settings(
+            SEGMENT_ARCHIVE_ROOT=self.archive_root,
+            SEGMENT_ARCHIVE_STORAGE="django.core.files.storage.FileSystemStorage",
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+class StoredSegmentSearchTests(ArchiveStorageMixin, TestCase):
+    """ Text searches of compressed and archived translations (segment_store.StoredSegmentSource). """
+    def setUp(self):
+        super().setUp()
+        self.translation = Translation.objects.create(job_number="STORED-1")
+        for source, target in (("カタカナの用語", "katakana term"), ("別の文", "ＡＢＣ Corporation")):
+            Segment.objects.create(translation=self.translation, source=source, target=target)
+
+    def search(self, query):
+        items = []
+        for source in stored_segment_sources([self.translation], query):
+            items.extend(source.fetch()[0])
+        return sorted(segment.source for segment in items)
+
+    def test_compressed_normalised(self):
+        compress_translation(self.translation)
+        self.assertEqual(self.search("ｶﾀｶﾅ"), ["カタカナの用語"])
+        self.assertEqual(self.search("abc corp"), ["別の文"])
+
+    def test_archived_normalised(self):
+        archive_translation(self.translation)
+        self.assertEqual(self.search("ｶﾀｶﾅ"), ["カタカナの用語"])
+        self.assertEqual(self.search("abc corp"), ["別の文"])
+
+
+class ConcordanceTests(TestCase):
+    """ Windows of text around the matches of a query (concordance.py), with half-width kana in the text. """
+    WIDTH = 3
+
+    def setUp(self):
+        self.translation = Translation.objects.create(job_number="KWIC-1")
+        self.segment = Segment.objects.create(
+            translation=self.translation,
+            source="ｱｲｳｴｵｶﾞｷﾞｸﾞの用語とｹﾞｰﾑ",
+            target="Terms of a game",
+        )
+
+    def sides(self, segment, query):
+        add_concordance(segment, query, self.WIDTH)
+        return [
+            (side.before, side.match, side.after)
+            for side in (segment.concordance_source, segment.concordance_target)
+        ]
+
+    def test_normalised_positions(self):
+        normalised, starts, ends = normalised_positions("aｶﾞb")
+        self.assertEqual(normalised, "aガb")
+        self.assertEqual(list(zip(starts, ends)), [(0, 1), (1, 3), (3, 4)])
+
+    def test_half_width_kana(self):
+        # The window does not split "ｸﾞ" or "ｹﾞ", which are normalised together
+        expected = ("ｷﾞｸﾞ", "の用語", "とｹﾞ")
+        segment = concordance_queryset(Segment.objects.all(), "の用語", self.WIDTH).get()
+        self.assertEqual(self.sides(segment, "の用語")[0], expected)
+        self.assertEqual(self.sides(Segment.objects.get(), "の用語")[0], expected)
+
+    def test_half_width_query(self):
+        # "ｹﾞｰﾑ" normalises to "ゲーム", one character shorter
+        for query in ("ゲーム", "ｹﾞｰﾑ"):
+            with self.subTest(query=query):
+                segment = concordance_queryset(Segment.objects.all(), query, self.WIDTH).get()
+                self.assertEqual(self.sides(segment, query)[0], ("用語と", "ｹﾞｰﾑ", ""))
+
+    def test_unchanged_length_windowed(self):
+        # Texts whose length is not changed by normalisation are cut in the database
+        segment = concordance_queryset(Segment.objects.all(), "GAME", self.WIDTH).get()
+        self.assertEqual(segment.kwic_target, " a game")
+        self.assertEqual(self.sides(segment, "GAME")[1], (" a ", "game", ""))
+
+
+class SegmentBlockTests(TestCase):
+    """ Compressed blocks of segments and their n-gram filters (segment_store.py). """
+    SEGMENTS = [
+        ("電極層を形成する。", "An electrode layer is formed.", "ja", "en"),
+        ("ＡＢＣ株式会社", "ABC Corporation", "ja", "en"),
+        ("ｶﾀｶﾅとカタカナ", "Katakana", "ja", "en-gb"),
+        ("", "Empty source", "", ""),
+        ("改行\nを含む", "Contains a\nline break", "ja", "en"),
+    ]
+
+    def test_round_trip(self):
+        translation = Translation.objects.create(job_number="BLOCKS-1")
+        for source, target, source_lang, target_lang in self.SEGMENTS:
+            Segment.objects.create(
+                translation=translation, source=source, target=target,
+                source_lang=source_lang, target_lang=target_lang,
+            )
+
+        compress_translation(translation, block_size=2)
+        self.assertEqual(translation.storage, Translation.COMPRESSED)
+        self.assertFalse(translation.segments.exists())
+        self.assertEqual(translation.segment_blocks.count(), 3)
+        self.assertEqual(segment_count(translation), len(self.SEGMENTS))
+        self.assertEqual([tuple(segment) for segment in iter_segments(translation)], self.SEGMENTS)
+
+        expand_translation(translation)
+        self.assertEqual(translation.storage, Translation.ROWS)
+        self.assertFalse(translation.segment_blocks.exists())
+        self.assertEqual(
+            list(translation.segments.order_by("pk").values_list("source", "target", "source_lang", "target_lang")),
+            self.SEGMENTS,
+        )
+        self.assertEqual(translation.segments.get(target="ABC Corporation").source_norm, "abc株式会社")
+
+    def test_no_false_negatives(self):
+        # Every substring of a block's segments, in any width or case, passes the block's filter
+        rng = random.Random(39)
+        alphabet = "あいうえおカキクケコ電極層形成abcdeＡＢＣ123 "
+        for _ in range(20):
+            segments = [
+                ("".join(rng.choices(alphabet, k=rng.randint(1, 30))), "".join(rng.choices(alphabet, k=10)), "", "")
+                for _ in range(rng.randint(1, 50))
+            ]
+            data, ngram_filter = encode_block(segments)
+            for source, target, source_lang, target_lang in segments:
+                for text in (source, target, source.upper(), unicodedata.normalize("NFKC", source)):
+                    for _ in range(5):
+                        start = rng.randrange(len(text))
+                        query = text[start:rng.randint(start + 1, len(text))]
+                        hashes = [_hashes(ngram) for ngram in query_ngrams(query)]
+                        self.assertTrue(might_contain(ngram_filter, hashes), query)
+
+    def test_absent_query_rejected(self):
+        data, ngram_filter = encode_block(self.SEGMENTS)
+        for query in ("絶縁膜", "xyz"):
+            self.assertFalse(might_contain(ngram_filter, [_hashes(ngram) for ngram in query_ngrams(query)]))
+
+
+class SegmentArchiveTests(ArchiveStorageMixin, TestCase):
+    """ Archiving translations (segment_store.archive_translation and segment_archive.build_archive). """
+    def setUp(self):
+        super().setUp()
+        self.translation = Translation.objects.create(job_number="ARCHIVE-1")
+        self.segments = [(f"文{i} テキスト", f"text {i}", "ja", "en") for i in range(50)]
+        for source, target, source_lang, target_lang in self.segments:
+            Segment.objects.create(
+                translation=self.translation, source=source, target=target,
+                source_lang=source_lang, target_lang=target_lang,
+            )
+
+    def test_storage_required(self):
+        with override_settings(SEGMENT_ARCHIVE_STORAGE=""):
+            with self.assertRaises(ArchiveError):
+                archive_translation(self.translation)
+        self.assertEqual(self.translation.segments.count(), 50)
+        self.assertEqual(os.listdir(self.archive_root), [])
+
+    def test_copied_from_storage(self):
+        archive_translation(self.translation)
+        self.assertEqual(self.translation.segments.count(), 0)
+        self.assertTrue(default_storage.exists(self.translation.archive_name))
+        # Another server, or this one after a restart, has no copy of the archive
+        shutil.rmtree(self.archive_root)
+        translation = Translation.objects.get(pk=self.translation.pk)
+        self.assertEqual(list(iter_segments(translation)), self.segments)
+
+    def test_restored(self):
+        archive_translation(self.translation)
+        archive_name = self.translation.archive_name
+        expand_translation(self.translation)
+        self.assertEqual(list(iter_segments(self.translation)), self.segments)
+        self.assertFalse(default_storage.exists(archive_name))
+
+    def test_runs_merged(self):
+        whole = os.path.join(self.archive_root, "whole.segments")
+        runs = os.path.join(self.archive_root, "runs.segments")
+        build_archive(whole, self.segments)
+        build_archive(runs, self.segments, run_size=7)
+        with open(whole, "rb") as f1, open(runs, "rb") as f2:
+            self.assertEqual(f1.read(), f2.read())
+        self.assertEqual(sorted(os.listdir(self.archive_root)), ["runs.segments", "whole.segments"])
+
+
+@skipUnless(optional.is_installed("numpy"), "NumPy is not installed")
+class TermAlignmentTests(SimpleTestCase):
+    """ Counting and scoring of candidate term pairs (term_extraction.py), without spaCy. """
+    # Source and target candidates of each segment
+    CORPUS = [
+        (["電極", "層"], ["electrode", "layer"]),
+        (["電極"], ["electrode"]),
+        (["電極", "基板"], ["electrode", "substrate"]),
+        (["基板"], ["substrate"]),
+        (["基板", "層"], ["substrate", "layer"]),
+        (["層"], ["layer"]),
+        (["電極"], ["lead"]),
+    ]
+
+    def candidates(self):
+        """ Returns the vocabularies and occurrences as collect_candidates() would for CORPUS. """
+        numpy = optional.load("numpy")
+        vocabularies = (CandidateVocabulary(), CandidateVocabulary())
+        occurrences = (([], []), ([], []))
+        for segment_number, phrases in enumerate(self.CORPUS):
+            for side_phrases, vocabulary, (numbers, ids) in zip(phrases, vocabularies, occurrences):
+                for phrase in side_phrases:
+                    numbers.append(segment_number)
+                    ids.append(vocabulary.add(phrase))
+        return vocabularies, [
+            (numpy.array(numbers, dtype=numpy.int64), numpy.array(ids, dtype=numpy.int64))
+            for numbers, ids in occurrences
+        ]
+
+    def test_count_cooccurrences(self):
+        (source_vocabulary, target_vocabulary), (source, target) = self.candidates()
+        sources, targets, counts = count_cooccurrences(source, target, len(target_vocabulary))
+        counted = {
+            (source_vocabulary.forms[s], target_vocabulary.forms[t]): int(count)
+            for s, t, count in zip(sources, targets, counts)
+        }
+        expected = {}
+        for source_phrases, target_phrases in self.CORPUS:
+            for pair in ((s, t) for s in source_phrases for t in target_phrases):
+                expected[pair] = expected.get(pair, 0) + 1
+        self.assertEqual(counted, expected)
+        self.assertEqual(counted[("電極", "electrode")], 3)
+
+    def test_count_cooccurrences_empty(self):
+        (source_vocabulary, target_vocabulary), (source, target) = self.candidates()
+        empty = (source[0][:0], source[1][:0])
+        for counts in (count_cooccurrences(empty, target, 10), count_cooccurrences(source, empty, 10)):
+            self.assertEqual([len(array) for array in counts], [0, 0, 0])
+
+    def test_align_candidates(self):
+        terms = align_candidates(*self.candidates(), min_count=3, min_score=0.3)
+        self.assertEqual(
+            [(term.source, term.target, term.source_count, term.target_count, term.cooccurrences) for term in terms],
+            [("層", "layer", 3, 3, 3), ("基板", "substrate", 3, 3, 3), ("電極", "electrode", 4, 3, 3)],
+        )
+        # Dice coefficient: 2 * 3 / (4 + 3)
+        self.assertAlmostEqual(terms[2].score, 6 / 7)
+
+    def test_align_candidates_thresholds(self):
+        terms = align_candidates(*self.candidates(), min_count=3, min_score=0.9)
+        self.assertEqual([term.source for term in terms], ["層", "基板"])
+        self.assertEqual(align_candidates(*self.candidates(), min_count=4), [])
+
+
+class ExtractTermsCommandTests(TestCase):
+    """ The extract_terms management command. """
+    def setUp(self):
+        self.translation = Translation.objects.create(job_number="TERMS-1")
+
+    def extract(self):
+        call_command("extract_terms", "TERMS-1", stdout=io.StringIO())
+
+    def test_failure_recorded(self):
+        with mock.patch("resources.management.commands.extract_terms.extract_terms", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                self.extract()
+        extraction = TermExtraction.objects.get()
+        self.assertEqual((extraction.status, extraction.message), (TermExtraction.FAILED, "disk full"))
+        self.assertIsNotNone(extraction.finished_on)
+
+    def test_extraction_error_reported(self):
+        with mock.patch(
+            "resources.management.commands.extract_terms.extract_terms",
+            side_effect=TermExtractionError("No tokenizer"),
+        ):
+            with self.assertRaisesMessage(CommandError, "No tokenizer"):
+                self.extract()
+        self.assertEqual(TermExtraction.objects.get().status, TermExtraction.FAILED)
+
+
+class ResumeImportJobsTests(MediaRootMixin, TestCase):
+    """ The resume_import_jobs management command. """
+    def setUp(self):
+        super().setUp()
+        content = io.BytesIO()
+        with zipfile.ZipFile(content, "w") as archive:
+            archive.writestr("Waiting.txt", "apple\tringo\n")
+            archive.writestr("Interrupted.txt", "pear\tnashi\n")
+        self.job = ImportJob.objects.create(kind="glossary")
+        self.job.archive.save("glossaries.zip", ContentFile(content.getvalue()))
+        self.waiting = ImportJobItem.objects.create(job=self.job, member_name="Waiting.txt")
+        self.interrupted = ImportJobItem.objects.create(
+            job=self.job, member_name="Interrupted.txt", status=ImportJobItem.RUNNING,
+        )
+        self.archive_path = self.job.archive.path
+
+    def resume(self, *args, hours=2):
+        ImportJob.objects.filter(pk=self.job.pk).update(created_on=timezone.now() - timedelta(hours=hours))
+        call_command("resume_import_jobs", *args, stdout=io.StringIO())
+        self.waiting.refresh_from_db()
+        self.interrupted.refresh_from_db()
+
+    def test_recent_job_left_running(self):
+        self.resume(hours=0)
+        self.assertEqual(self.waiting.status, ImportJobItem.PENDING)
+        self.assertTrue(os.path.exists(self.archive_path))
+
+    def test_waiting_files_imported(self):
+        self.resume("--hours", "1")
+        self.assertEqual(self.waiting.status, ImportJobItem.DONE)
+        self.assertEqual(list(self.waiting.glossary.entries.values_list("source", "target")), [("apple", "ringo")])
+        self.assertEqual(self.interrupted.status, ImportJobItem.FAILED)
+        self.assertFalse(os.path.exists(self.archive_path))
+
+    def test_waiting_files_failed(self):
+        self.resume("--hours", "1", "--fail")
+        self.assertEqual((self.waiting.status, self.interrupted.status), (ImportJobItem.FAILED, ImportJobItem.FAILED))
+        self.assertFalse(Glossary.objects.exists())
+        self.assertFalse(os.path.exists(self.archive_path))
+
+
+class TextReaderTests(SimpleTestCase):
+    """ Encoding detection and rejection of bad rows in tab-delimited and CSV files. """
+
+    def read(self, reader_class, data):
+        reader = reader_class(io.BytesIO(data))
+        return list(reader), reader.report
+
+    def test_utf8_bom(self):
+        rows, report = self.read(TabDelimitedReader, "\ufeffりんご\tapple\n".encode("utf-8"))
+        self.assertEqual(rows, [("りんご", "apple", "")])
+        self.assertEqual(report.encoding, "utf-8-sig")
+
+    def test_shift_jis(self):
+        rows, report = self.read(TabDelimitedReader, "りんご\tapple\tくだもの\n".encode("cp932"))
+        self.assertEqual(rows, [("りんご", "apple", "くだもの")])
+        self.assertEqual(report.encoding, "cp932")
+
+    def test_utf16(self):
+        text = "りんご\tapple\nみかん\torange\n"
+        for data, encoding in (
+            (text.encode("utf-16"), "utf-16"),
+            (text.encode("utf-16-le"), "utf-16-le"),
+            (text.encode("utf-16-be"), "utf-16-be"),
+        ):
+            with self.subTest(encoding=encoding):
+                rows, report = self.read(TabDelimitedReader, data)
+                self.assertEqual(rows, [("りんご", "apple", ""), ("みかん", "orange", "")])
+                self.assertEqual(report.encoding, encoding)
+
+    def test_quoted_fields(self):
+        rows, _ = self.read(TabDelimitedReader, b'"a\tb"\t"say ""hi"""\n')
+        self.assertEqual(rows, [("a\tb", 'say "hi"', "")])
+        rows, _ = self.read(CsvReader, b'apple,"ringo, red","line 1\nline 2"\n')
+        self.assertEqual(rows, [("apple", "ringo, red", "line 1\nline 2")])
+
+    def test_rejection_report(self):
+        data = "\n".join([
+            "apple\tringo",
+            "no target",
+            "a\tb\tc\td",
+            "\tempty source",
+            "long\t" + "x" * 300,
+            "",
+            "orange\tmikan",
+        ]).encode()
+        rows, report = self.read(TabDelimitedReader, data)
+        self.assertEqual(rows, [("apple", "ringo", ""), ("orange", "mikan", "")])
+        self.assertEqual([rejection.line_number for rejection in report.rejected], [2, 3, 4, 5])
+        self.assertEqual(report.rejected_count, 4)
+        self.assertEqual(str(report.rejected[0]), "Line 2: No target term found.")
+
+    def test_bad_row_skipped(self):
+        # A field over the csv module's size limit raises csv.Error; the rows after it are still read
+        for reader_class, delimiter in ((CsvReader, ","), (TabDelimitedReader, "\t")):
+            with self.subTest(reader=reader_class.__name__):
+                data = f"apple{delimiter}ringo\nbig{delimiter}{'x' * 200000}\norange{delimiter}mikan\n".encode()
+                rows, report = self.read(reader_class, data)
+                self.assertEqual(rows, [("apple", "ringo", ""), ("orange", "mikan", "")])
+                self.assertEqual([rejection.line_number for rejection in report.rejected], [2])
+
+
+class TmxReaderTests(SimpleTestCase):
+    """ Pairing of the variants of TMX translation units. """
+
+    def read(self, units, srclang="en-US"):
+        data = f'<tmx version="1.4"><header srclang="{srclang}"/><body>{units}</body></tmx>'.encode()
+        return list(TmxReader(io.BytesIO(data)))
+
+    def test_regional_variants(self):
+        rows = self.read(
+            '<tu><tuv xml:lang="en-GB"><seg>colour</seg></tuv><tuv xml:lang="en-US"><seg>color</seg></tuv>'
+            '<tuv xml:lang="ja"><seg>色</seg></tuv></tu>'
+        )
+        self.assertEqual(rows, [("color", "colour", "en-us", "en-gb"), ("color", "色", "en-us", "ja")])
+
+    def test_base_language_source(self):
+        # A srclang without a region matches a variant with one
+        rows = self.read(
+            '<tu><tuv xml:lang="ja"><seg>色</seg></tuv><tuv xml:lang="en-US"><seg>color</seg></tuv></tu>', "en"
+        )
+        self.assertEqual(rows, [("color", "色", "en-us", "ja")])
+
+
+def read_all(reader_class, data, filename, keep=10):
+    """
+    Reads an in-memory file with a reader. Returns the first keep rows read, the number of rows
+    and the peak memory allocated meanwhile (the rows not kept are freed as they are counted).
+    """
+    file = io.BytesIO(data)
+    file.name = filename
+    rows = []
+    count = 0
+    tracemalloc.start()
+    try:
+        for row in reader_class(file):
+            if count < keep:
+                rows.append(row)
+            count += 1
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return rows, count, peak
+
+
+class StreamingImportTests(SimpleTestCase):
+    """ XML files are imported element by element, in constant memory. """
+    # Peak memory use when reading LARGE units may be at most this many times that for LARGE / 10 units
+    LARGE = 20000
+    MAX_GROWTH = 2
+
+    @staticmethod
+    def tbx(count):
+        entries = "".join(
+            f'<termEntry><langSet xml:lang="ja"><tig><term>用語{i}</term></tig></langSet>'
+            f'<langSet xml:lang="en"><tig><term>term {i}</term></tig></langSet></termEntry>'
+            for i in range(count)
+        )
+        return f'<martif xml:lang="ja"><text><body>{entries}</body></text></martif>'.encode()
+
+    @staticmethod
+    def tmx(count):
+        units = "".join(
+            f'<tu><tuv xml:lang="ja"><seg>原文{i}</seg></tuv><tuv xml:lang="en"><seg>Source {i}</seg></tuv>'
+            f'<tuv xml:lang="de"><seg>Quelle {i}</seg></tuv></tu>'
+            for i in range(count // 2)
+        )
+        return f'<tmx version="1.4"><header srclang="ja"/><body>{units}</body></tmx>'.encode()
+
+    @staticmethod
+    def xliff(count):
+        units = "".join(
+            f'<trans-unit id="{i}"><source>原文{i}</source><target>Target {i}</target></trans-unit>'
+            for i in range(count)
+        )
+        return (
+            '<xliff version="1.2"><file source-language="ja" target-language="en">'
+            f'<body><group>{units}</group></body></file></xliff>'
+        ).encode()
+
+    def assertConstantMemory(self, reader_class, make_file, filename):
+        _, _, small_peak = read_all(reader_class, make_file(self.LARGE // 10), filename)
+        _, count, peak = read_all(reader_class, make_file(self.LARGE), filename)
+        self.assertEqual(count, self.LARGE)
+        self.assertLess(peak, small_peak * self.MAX_GROWTH)
+
+    def test_tbx(self):
+        rows, _, _ = read_all(TbxReader, self.tbx(2), "terms.tbx")
+        self.assertEqual(rows, [("用語0", "term 0", ""), ("用語1", "term 1", "")])
+        self.assertConstantMemory(TbxReader, self.tbx, "terms.tbx")
+
+    def test_tmx(self):
+        rows, _, _ = read_all(TmxReader, self.tmx(2), "translation.tmx")
+        self.assertEqual(rows, [("原文0", "Source 0", "ja", "en"), ("原文0", "Quelle 0", "ja", "de")])
+        self.assertConstantMemory(TmxReader, self.tmx, "translation.tmx")
+
+    def test_xliff(self):
+        rows, _, _ = read_all(XliffReader, self.xliff(2), "translation.xlf")
+        self.assertEqual(rows, [("原文0", "Target 0", "ja", "en"), ("原文1", "Target 1", "ja", "en")])
+        self.assertConstantMemory(XliffReader, self.xliff, "translation.xlf")
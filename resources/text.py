@@ -0,0 +1,106 @@
+"""
+Text helpers shared by the importers, search and reports.
+"""
+import unicodedata
+
+from django.conf import settings
+
+
+def normalise_key(text):
+    """
+    Returns the key used to decide if two terms are the same term,
+    e.g. when merging a re-imported glossary into an existing one.
+    Full-width/half-width forms and case are folded, and surrounding or repeated
+    whitespace is ignored.
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+# Katakana (ァ-ヶ, ヽ, ヾ) -> hiragana (ぁ-ゖ, ゝ, ゞ)
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in [*range(0x30A1, 0x30F7), 0x30FD, 0x30FE]}
+
+
+def ngrams(text):
+    """
+    Returns the single characters and pairs of characters of a string, normalised with katakana
+    folded (see normalise_text()), so that whatever the SEARCH_FOLD_KANA setting, the segments
+    whose normalised form contains a query contain all its n-grams.
+    Used by the n-gram indexes of compressed and archived segments.
+    """
+    text = normalise_text(text, fold_kana=True)
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_ngrams(query):
+    """ Returns the n-grams which a string must contain in order for its normalised form to contain query. """
+    query = normalise_text(query, fold_kana=True)
+    if len(query) < 2:
+        return {query} if query else set()
+    return {query[i:i + 2] for i in range(len(query) - 1)}
+
+
+def normalise_text(text, fold_kana=None):
+    """
+    Returns the form of a string stored in the normalised search columns (source_norm and
+    target_norm) of entries and segments, and to which queries are converted before being
+    matched against them: full-width/half-width forms and case are folded, and katakana is
+    folded to hiragana if fold_kana (by default the SEARCH_FOLD_KANA setting) is set.
+    Unlike normalise_key(), whitespace is kept as it is, as queries may contain spaces.
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if fold_kana is None:
+        fold_kana = getattr(settings, "SEARCH_FOLD_KANA", False)
+    if fold_kana:
+        text = text.translate(KATAKANA_TO_HIRAGANA)
+    return text
+
+
+def normalised_positions(text):
+    """
+    Returns the normalise_text() form of text, and for each of its characters the start and
+    end positions of the characters of text it comes from, so that positions found in the
+    normalised form can be mapped back to the original text.
+    The text is normalised a few characters at a time: a character is normalised together
+    with the preceding ones if they combine, e.g. half-width "ｶﾞ" becomes "ガ", which comes
+    from both characters.
+    """
+    normalised = []
+    starts = []
+    ends = []
+    chunk_start = 0
+    chunk = ""
+    for index, char in enumerate(text):
+        if chunk and normalise_text(chunk + char) != normalise_text(chunk) + normalise_text(char):
+            chunk += char
+            continue
+        folded = normalise_text(chunk)
+        normalised.append(folded)
+        starts.extend([chunk_start] * len(folded))
+        ends.extend([index] * len(folded))
+        chunk_start, chunk = index, char
+    folded = normalise_text(chunk)
+    normalised.append(folded)
+    starts.extend([chunk_start] * len(folded))
+    ends.extend([len(text)] * len(folded))
+    return "".join(normalised), starts, ends
+
+
+def update_normalised_columns(model, batch_size):
+    """
+    Sets the normalised search columns of all rows of a model (Entry or Segment),
+    reading the rows in batches by primary key. Returns the number of rows updated.
+    """
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by("pk").only("source", "target")[:batch_size])
+        if not batch:
+            return updated
+        for obj in batch:
+            obj.source_norm = normalise_text(obj.source)
+            obj.target_norm = normalise_text(obj.target)
+        model.objects.bulk_update(batch, ["source_norm", "target_norm"])
+        updated += len(batch)
+        last_pk = batch[-1].pk
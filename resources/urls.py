@@ -2,6 +2,7 @@ from django.urls import path
 from .views import (
     HomePageView,
     SearchResultsView,
+    AutocompleteView,
     EntryCreateView,
     EntryDetailView,
     EntryUpdateView,
@@ -13,18 +14,31 @@ from .views import (
     GlossaryDeleteView,
     GlossaryAddEntryView,
     GlossaryAllEntryView,
+    GlossaryEntryBulkView,
     GlossaryUpdateView,
     TranslationDetailView,
     TranslationUpdateView,
     TranslationDeleteView,
     TranslationShowAllView,
     TranslationUploadView,
+    TranslationExportView,
+    ImportJobDetailView,
+    ChunkedUploadView,
+    TermCheckCreateView,
+    TermCheckDetailView,
+    TermExtractionDetailView,
+    TermCandidateReviewView,
+    DuplicateReportCreateView,
+    DuplicateReportDetailView,
+    SearchAnalyticsView,
 )
 
 
 urlpatterns = [
     path('', HomePageView.as_view(), name='home'),
     path('search/', SearchResultsView.as_view(), name='search_results'),
+    path('search/autocomplete/', AutocompleteView.as_view(), name='search_autocomplete'),
+    path('search/analytics/', SearchAnalyticsView.as_view(), name='search_analytics'),
 
     path('entry/new/', EntryCreateView.as_view(), name='entry_create'),
     path('entry/<int:pk>/detail/', EntryDetailView.as_view(), name='entry_detail'),
@@ -38,11 +52,24 @@ urlpatterns = [
     path('glossary/<int:pk>/delete/', GlossaryDeleteView.as_view(), name='glossary_delete'),
     path('glossary/<int:glossary>/add/', GlossaryAddEntryView.as_view(), name='glossary_add_entry'),
     path('glossary/<int:pk>/all/', GlossaryAllEntryView.as_view(), name='glossary_all_entries'),
+    path('glossary/<int:pk>/bulk/', GlossaryEntryBulkView.as_view(), name='glossary_bulk_entries'),
     path('glossary/<int:pk>/edit/', GlossaryUpdateView.as_view(), name='glossary_update'),
 
     path('translation/upload/', TranslationUploadView.as_view(), name='translation_upload'),
+    path('translation/upload/chunked/', ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('translation/upload/chunked/<uuid:pk>/', ChunkedUploadView.as_view(), name='chunked_upload_detail'),
+    path('translation/export/', TranslationExportView.as_view(), name='translation_export'),
+    path('translation/<int:pk>/export/', TranslationExportView.as_view(), name='translation_export_single'),
     path('translation/<int:pk>/', TranslationDetailView.as_view(), name='translation_detail'),
     path('translation/<int:pk>/edit/', TranslationUpdateView.as_view(), name='translation_update'),
     path('translation/<int:pk>/delete/', TranslationDeleteView.as_view(), name='translation_delete'),
+    path('translation/<int:pk>/check/', TermCheckCreateView.as_view(), name='term_check_create'),
+    path('check/<int:pk>/', TermCheckDetailView.as_view(), name='term_check_detail'),
+    path('terms/<int:pk>/', TermExtractionDetailView.as_view(), name='term_extraction_detail'),
+    path('terms/<int:pk>/review/', TermCandidateReviewView.as_view(), name='term_candidate_review'),
+    path('duplicates/new/', DuplicateReportCreateView.as_view(), name='duplicate_report_create'),
+    path('duplicates/<int:pk>/', DuplicateReportDetailView.as_view(), name='duplicate_report_detail'),
+    path('import/<int:pk>/', ImportJobDetailView.as_view(), name='import_job_detail'),
+
     path('translation/<int:pk>/all/', TranslationShowAllView.as_view(), name='translation_show_all'),
 ]
@@ -1,30 +1,56 @@
+import hashlib
 import os
-import csv
+import re
 import shutil
-from itertools import chain
+import time
+import zipfile
+from datetime import timedelta
+from itertools import chain, islice
+from urllib.parse import quote
 
+from django.conf import settings
 from django.views.generic import (
     View, TemplateView, ListView, DetailView, UpdateView, DeleteView, CreateView
 )
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Q
 from django.utils import timezone
-from django.urls import reverse_lazy
-from django.http import HttpResponseRedirect
-from django.shortcuts import render, redirect
+from django.urls import reverse, reverse_lazy
+from django.http import HttpResponse, HttpResponseRedirect, QueryDict
+from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic.base import ContextMixin
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.db.models.functions import Lower
-from django.http import FileResponse
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.paginator import Paginator
 
 from .forms import (
-    CreateEntryForm, GlossaryUploadForm, CreateGlossaryForm, AddEntryToGlossaryForm,
-    GlossaryExportForm, TranslationUploadForm
+    is_archive, CreateEntryForm, GlossaryUploadForm, CreateGlossaryForm, AddEntryToGlossaryForm,
+    GlossaryExportForm, TranslationUploadForm, EntryBulkActionForm, TranslationExportForm,
+    ChunkedUploadForm, TermCheckForm, TermCandidateReviewForm, EntryFilterForm
 )
 from .models import (
-    Entry, Glossary, Segment, Translation
+    Entry, Glossary, Segment, Translation, ImportJob, ImportJobItem, ChunkedUpload,
+    TermCheck, TermCheckIssue, TermExtraction, TermCandidate, DuplicateReport, DuplicateReportEntry, SearchLog
 )
-
-from translate.storage.tmx import tmxfile  # For reading tmx files (from translate-toolkit)
+from .search import SearchResults, run_search, search_querysets, text_search_sources
+from .search_cache import get_cached_results, refresh_search_cache
+from .pattern_search import PATTERN_MODES, PatternError, SearchPattern, pattern_search_sources
+from .concordance import add_concordance, concordance_queryset
+from .segment_store import iter_segments, segment_count, stored_segment_sources, write_segment_blocks
+from .autocomplete import get_prefix_index
+from .tasks import mark_for_deletion, run_in_background
+from .telemetry import record_search
+from .text import normalise_key, normalise_text
+from .termcheck import TermChecker
+from .duplicates import find_duplicates
+from .importers import (
+    get_glossary_reader, get_translation_reader, GLOSSARY_READERS, TRANSLATION_READERS
+)
+from .exporters import GLOSSARY_WRITERS, TRANSLATION_WRITERS, zip_chunks
 
 
 class ResourceListMixin(ContextMixin, View):
@@ -33,21 +59,30 @@ class ResourceListMixin(ContextMixin, View):
     Implemented as a base class to avoid repeating in each view.
     """
     def get_context_data(self, **kwargs):
-        glossaries = Glossary.objects.all().order_by(Lower("title"))
-        translations = Translation.objects.all().order_by(Lower("job_number"))
+        glossaries = Glossary.objects.available().order_by(Lower("title"))
+        translations = Translation.objects.available().order_by(Lower("job_number"))
         resources = chain(glossaries, translations)
         context = super().get_context_data(**kwargs)
         context["resources"] = resources
+        context["languages"] = get_translation_languages()
         return context
 
 
+def get_translation_languages():
+    """ Returns the language codes of all the segments of all available translations. """
+    languages = set()
+    for codes in Translation.objects.available().values_list("languages", flat=True):
+        languages.update(codes.split())
+    return sorted(languages)
+
+
 class HomePageView(LoginRequiredMixin, ResourceListMixin, TemplateView):
     template_name = "home.html"
 
     def get_context_data(self, **kwargs):
         # Get all available glossaries and translations and add to the context
-        glossaries = Glossary.objects.all().order_by("-id")
-        translations = Translation.objects.all().order_by("-id")
+        glossaries = Glossary.objects.available().order_by("-id")
+        translations = Translation.objects.available().order_by("-id")
         context = super(HomePageView, self).get_context_data(**kwargs)
         context.update({
             "glossaries": glossaries,
@@ -60,43 +95,120 @@ class SearchResultsView(LoginRequiredMixin, ResourceListMixin, ListView):
     model = Entry
     template_name = "search_results.html"
 
+    def get(self, request, *args, **kwargs):
+        started = time.monotonic()
+        response = super(SearchResultsView, self).get(request, *args, **kwargs)
+        # The time taken by the search itself (the template is rendered afterwards)
+        record_search(
+            request.GET.get("query", "").strip(),
+            request.GET.get("resource"),
+            self.search_results.hits,
+            time.monotonic() - started,
+            mode=request.GET.get("mode", ""),
+            language=request.GET.get("language", ""),
+        )
+        return response
+
     def get_queryset(self):
         query = self.request.GET.get("query").strip()
         resource = self.request.GET.get("resource")
-
-        if resource == "すべてのリソースを検索する":
-            glossary_queryset = Entry.objects.filter(
-                Q(source__icontains=query) | Q(target__icontains=query)
-            )
-            translation_queryset = Segment.objects.filter(
-                Q(source__icontains=query) | Q(target__icontains=query)
+        language = self.request.GET.get("language", "")
+        mode = self.request.GET.get("mode", "")
+        self.pattern = None
+        self.pattern_error = None
+        self.search_incomplete = False
+        # Concordance view of segments (text searches only)
+        self.concordance = bool(self.request.GET.get("kwic")) and mode not in PATTERN_MODES
+        self.concordance_width = getattr(settings, "CONCORDANCE_WIDTH", 40)
+
+        entries, segments, stored_translations = search_querysets(resource, language)
+
+        if mode in PATTERN_MODES:
+            try:
+                self.pattern = SearchPattern(query, mode)
+            except PatternError as e:
+                self.pattern_error = str(e)
+                self.search_results = SearchResults([], 0)
+                return self.search_results.items
+
+            # Candidates containing the literal parts of the pattern are found with the indexes,
+            # and the pattern is then applied to them with a time limit
+            sources = pattern_search_sources(
+                self.pattern,
+                [
+                    ("glossary", entries.select_related("glossary"), 0),
+                    ("translation", segments.select_related("translation"), 1),
+                ],
+                stored_segment_sources(
+                    list(stored_translations), self.pattern.longest_literal(), priority=1, language=language
+                ),
             )
         else:
-            glossary_queryset = Entry.objects.filter(
-                Q(glossary__title=resource),
-                Q(source__icontains=query) | Q(target__icontains=query)
-            )
-            translation_queryset = Segment.objects.filter(
-                Q(translation__job_number=resource),
-                Q(source__icontains=query) | Q(target__icontains=query)
-            )
-
-        queryset = list(chain(glossary_queryset, translation_queryset))
-
-        return queryset
+            if self.concordance:
+                # Only windows of text around the matches are fetched, not the whole segments
+                segments = concordance_queryset(segments, query, self.concordance_width)
+            else:
+                # Results of frequent searches are precomputed by the "warm_search_cache" command
+                cached = get_cached_results(query, resource, language)
+                if cached is not None:
+                    self.search_results = cached
+                    return self.search_results.items
+            sources = text_search_sources(query, entries, segments, stored_translations, language)
+
+        self.search_results = run_search(sources)
+        self.search_incomplete = any(getattr(source, "incomplete", False) for source in sources)
+        if self.concordance:
+            for item in self.search_results.items:
+                if isinstance(item, Segment):
+                    add_concordance(item, query, self.concordance_width)
+
+        return self.search_results.items
 
     def get_context_data(self, **kwargs):
         context = super(SearchResultsView, self).get_context_data(**kwargs)
         query = self.request.GET.get("query").strip()
         target_resource = self.request.GET.get("resource")
-        hits = len(self.get_queryset())
         context.update({
+            "target_language": self.request.GET.get("language", ""),
             "target_resource": target_resource,
-            "hits": hits,
+            "search_mode": self.request.GET.get("mode", ""),
+            "pattern": self.pattern,
+            "pattern_error": self.pattern_error,
+            "search_incomplete": self.search_incomplete,
+            "concordance": self.concordance,
+            "concordance_url": self.concordance_url(),
+            "hits": self.search_results.hits,
+            "shown": len(self.object_list),
             "query": query
         })
         return context
 
+    def concordance_url(self):
+        """ Returns the URL of the same search with the concordance view switched on or off. """
+        params = self.request.GET.copy()
+        if params.pop("kwic", None) is None:
+            params["kwic"] = "1"
+        return f"{self.request.path}?{params.urlencode()}"
+
+
+class AutocompleteView(LoginRequiredMixin, View):
+    """
+    Returns glossary terms starting with the "query" parameter as JSON.
+    Called by the search bar as the user types.
+    """
+    max_completions = 20
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("query", "").strip()
+        try:
+            limit = min(int(request.GET.get("limit", 10)), self.max_completions)
+        except ValueError:
+            limit = 10
+        started = time.monotonic()
+        completions = get_prefix_index().complete(query, limit) if query else []
+        record_search(query, None, len(completions), time.monotonic() - started, kind=SearchLog.AUTOCOMPLETE)
+        return JsonResponse({"query": query, "completions": completions})
+
 
 class EntryDetailView(LoginRequiredMixin, DetailView):
     model = Entry
@@ -113,6 +225,7 @@ class EntryCreateView(LoginRequiredMixin, CreateView):
         obj.created_by = self.request.user
         obj.updated_by = self.request.user
         obj.save()
+        refresh_search_cache([obj.glossary.title] if obj.glossary else [], texts=[obj.source, obj.target])
 
         # Sets user data on Glossary object if new Glossary is being created with the new Entry
         if obj.glossary.created_by is None and obj.glossary.updated_by is None:
@@ -147,7 +260,12 @@ class EntryUpdateView(LoginRequiredMixin, UpdateView):
            and sets the previous url as the success url if previous_url is present."""
         obj = form.save(commit=False)
         obj.updated_by = self.request.user
+        old = Entry.objects.select_related("glossary").get(pk=obj.pk)
         obj.save()
+        refresh_search_cache(
+            [glossary.title for glossary in (old.glossary, obj.glossary) if glossary],
+            texts=[old.source, old.target, obj.source, obj.target],
+        )
 
         if self.request.GET.get("previous_url"):
             previous_url = self.request.GET.get("previous_url")
@@ -176,6 +294,14 @@ class EntryDeleteView(LoginRequiredMixin, DeleteView):
 
         return reverse_lazy("home")
 
+    def form_valid(self, form):
+        response = super(EntryDeleteView, self).form_valid(form)
+        refresh_search_cache(
+            [self.object.glossary.title] if self.object.glossary else [],
+            texts=[self.object.source, self.object.target],
+        )
+        return response
+
     def post(self, request, *args, **kwargs):
         # If the cancel button has been pressed in the form, return to the previous URL
         if "cancel" in request.POST:
@@ -204,74 +330,237 @@ class GlossaryUploadView(LoginRequiredMixin, View):
 
         form = self.form_class(request.POST, request.FILES)
         if form.is_valid():
-            glossary_obj = Glossary(
-                glossary_file=form.cleaned_data["glossary_file"],
-                title=form.cleaned_data["title"],
-                notes=form.cleaned_data["notes"],
-                created_by=request.user,
-                updated_by=request.user,
-            )
-            glossary_obj.save()
-            build_entries(glossary_obj, request)
+            if is_archive(form.cleaned_data["glossary_file"]):
+                job = start_archive_import(
+                    "glossary",
+                    form.cleaned_data["glossary_file"],
+                    request.user,
+                    notes=form.cleaned_data["notes"],
+                )
+                return redirect(job)
+
+            if form.cleaned_data["mode"] == "merge":
+                glossary_obj = form.cleaned_data["glossary"]
+                glossary_obj.glossary_file = form.cleaned_data["glossary_file"]
+                if form.cleaned_data["notes"]:
+                    glossary_obj.notes = form.cleaned_data["notes"]
+                glossary_obj.updated_by = request.user
+                glossary_obj.save()
+                summary = merge_entries(glossary_obj, request.user, form.cleaned_data["delete_missing"])
+                report = summary["report"]
+                messages.success(
+                    request,
+                    f'"{glossary_obj}" updated: {summary["created"]} entries added, '
+                    f'{summary["updated"]} updated, {summary["deleted"]} deleted, '
+                    f'{summary["unchanged"]} unchanged.'
+                    + (f' {summary["skipped"]} repeated lines skipped.' if summary["skipped"] else '')
+                )
+            else:
+                glossary_obj = Glossary(
+                    glossary_file=form.cleaned_data["glossary_file"],
+                    title=form.cleaned_data["title"],
+                    notes=form.cleaned_data["notes"],
+                    created_by=request.user,
+                    updated_by=request.user,
+                )
+                glossary_obj.save()
+                report = build_entries(glossary_obj, request.user)
+                messages.success(request, f'{report.imported} entries imported into "{glossary_obj}".')
 
             # Return to the previous URL if included in request
             if request.GET.get("previous_url"):
                 previous_url = request.GET.get("previous_url")
-                return HttpResponseRedirect(previous_url)
+            else:
+                previous_url = reverse("home")
 
-            return redirect("home")
+            # Show the lines that could not be imported, if any
+            if report.rejected_count:
+                context = {
+                    "glossary": glossary_obj,
+                    "report": report,
+                    "previous_url": previous_url,
+                }
+                return render(request, "import_report.html", context)
+
+            return HttpResponseRedirect(previous_url)
 
         return render(request, self.template_name, {"form": form})
 
 
-def build_entries(glossary_obj, request):
+def build_entries(glossary_obj, user):
     """
     Helper method for GlossaryUploadView.
     Builds Entry objects from the content of an uploaded text file.
-    Receives new Glossary object.
-    """
-    new_entries = []
-    f = glossary_obj.glossary_file.open("r")
-    reader = csv.reader(f, delimiter="\t")
-
-    # Loop for creating new Entry objects from content of uploaded file
-    for row in reader:
-        # Each row should contain 2 or 3 elements, otherwise ignored
-        if (len(row) == 2) or (len(row) == 3):
-            # Handling for optional notes item
-            if len(row) == 3:
-                notes = row[2]
-            else:
-                notes = ""
-            # Create Entry object and append to new_entries list
-            new_entry = Entry(
-                source=row[0],
-                target=row[1],
-                glossary=glossary_obj,
-                notes=notes,
-                created_on=timezone.now(),
-                created_by=request.user,
-                updated_on=timezone.now(),
-                updated_by=request.user,
-            )
-            new_entries.append(new_entry)
+    Receives new Glossary object and the user importing it.
+    Entries are written in batches as the file is read, so memory use does not depend on
+    the size of the file. Returns an ImportReport listing any lines that were rejected.
+    """
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+    now = timezone.now()
+    reader = get_glossary_reader(glossary_obj.glossary_file.open("rb"))
+
+    new_entries = (
+        Entry(
+            source=source,
+            target=target,
+            source_norm=normalise_text(source),
+            target_norm=normalise_text(target),
+            glossary=glossary_obj,
+            notes=notes,
+            created_on=now,
+            created_by=user,
+            updated_on=now,
+            updated_by=user,
+        )
+        for source, target, notes in reader
+    )
 
-    # Add all new Entry objects to the database in one write
-    Entry.objects.bulk_create(new_entries)
+    with transaction.atomic():
+        while True:
+            batch = list(islice(new_entries, batch_size))
+            if not batch:
+                break
+            Entry.objects.bulk_create(batch)
+            reader.report.imported += len(batch)
 
     # Delete the uploaded text file after new Entry objects have been saved to DB
+    glossary_obj.glossary_file.close()
+    glossary_obj.glossary_file.delete()
+
+    # Cached results of searches of the glossary are out of date
+    refresh_search_cache([glossary_obj.title])
+
+    return reader.report
+
+
+def merge_entries(glossary_obj, user, delete_missing=True):
+    """
+    Helper method for GlossaryUploadView.
+    Updates an existing Glossary object to match the content of an uploaded text file.
+    Uploaded rows are matched to existing Entry objects by their normalised source and target
+    terms (a source term may have several targets), and only the differences are written:
+        - rows with a new source/target pair are inserted
+        - rows whose notes or exact spelling have changed are updated
+        - if delete_missing is set, entries whose source/target pair is not in the file,
+          and further entries having the same pair as another entry, are deleted
+    Nothing is deleted if any line of the file was rejected, as it may be a term that was
+    meant to be kept. Rows repeating a source/target pair already in the file are skipped.
+    Unchanged entries are not touched, so they keep their ids and created/updated fields.
+    Returns the number of entries created, updated, deleted and unchanged, the number of
+    rows skipped, and an ImportReport listing any lines that were rejected.
+    """
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+    now = timezone.now()
+
+    # Existing entries by normalised source and target terms.
+    # Any further entries having the same key are duplicates.
+    existing = {}
+    duplicates = []
+    entries = glossary_obj.entries.values_list("pk", "source", "target", "notes")
+    for pk, source, target, notes in entries.iterator():
+        key = (normalise_key(source), normalise_key(target))
+        if key in existing:
+            duplicates.append(pk)
+        else:
+            existing[key] = (pk, source, target, notes)
+
+    to_create = []
+    to_update = []
+    seen = set()
+    unchanged = 0
+    skipped = 0
+    reader = get_glossary_reader(glossary_obj.glossary_file.open("rb"))
+    for source, target, notes in reader:
+        key = (normalise_key(source), normalise_key(target))
+        # Only the first row for each source/target pair in the file is used
+        if key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+
+        if key not in existing:
+            to_create.append(Entry(
+                source=source,
+                target=target,
+                source_norm=normalise_text(source),
+                target_norm=normalise_text(target),
+                glossary=glossary_obj,
+                notes=notes,
+                created_on=now,
+                created_by=user,
+                updated_on=now,
+                updated_by=user,
+            ))
+        elif existing[key][1:] != (source, target, notes):
+            to_update.append(Entry(
+                pk=existing[key][0],
+                source=source,
+                target=target,
+                source_norm=normalise_text(source),
+                target_norm=normalise_text(target),
+                notes=notes,
+                updated_on=now,
+                updated_by=user,
+            ))
+        else:
+            unchanged += 1
+
+    # Rejected lines may be terms that were meant to be kept, so nothing is deleted in that case
+    if reader.report.rejected_count:
+        delete_missing = False
+
+    if delete_missing:
+        to_delete = duplicates + [pk for key, (pk, *_) in existing.items() if key not in seen]
+    else:
+        to_delete = []
+        unchanged += len(existing) - len(seen & existing.keys()) + len(duplicates)
+
+    with transaction.atomic():
+        Entry.objects.bulk_create(to_create, batch_size=batch_size)
+        Entry.objects.bulk_update(
+            to_update,
+            ["source", "target", "source_norm", "target_norm", "notes", "updated_on", "updated_by"],
+            batch_size=batch_size,
+        )
+        for i in range(0, len(to_delete), batch_size):
+            Entry.objects.filter(pk__in=to_delete[i:i + batch_size]).delete()
+
+    # Delete the uploaded text file after the changes have been saved to DB
+    glossary_obj.glossary_file.close()
     glossary_obj.glossary_file.delete()
 
+    refresh_search_cache([glossary_obj.title])
+
+    reader.report.imported = len(to_create) + len(to_update)
+    return {
+        "created": len(to_create),
+        "updated": len(to_update),
+        "deleted": len(to_delete),
+        "unchanged": unchanged,
+        "skipped": skipped,
+        "report": reader.report,
+    }
+
 
 class GlossaryDetailView(LoginRequiredMixin, DetailView):
     model = Glossary
+    queryset = Glossary.objects.available()
     template_name = "glossary_detail.html"
 
     def get_context_data(self, **kwargs):
         context = super(GlossaryDetailView, self).get_context_data(**kwargs)
         num_of_entries = context["glossary"].entries.all().count()
+        # Conflicting targets found for this glossary's entries by the latest duplicate report
+        duplicate_report = DuplicateReport.objects.filter(status=DuplicateReport.DONE).order_by("-pk").first()
+        conflict_count = 0
+        if duplicate_report is not None:
+            conflict_count = duplicate_report.items.filter(
+                glossary=context["glossary"], has_conflict=True
+            ).values("group").distinct().count()
         context.update({
             "num_of_entries": num_of_entries,
+            "duplicate_report": duplicate_report,
+            "conflict_count": conflict_count,
         })
         return context
 
@@ -304,9 +593,18 @@ class GlossaryCreateView(LoginRequiredMixin, CreateView):
 
 class GlossaryDeleteView(LoginRequiredMixin, DeleteView):
     model = Glossary
+    queryset = Glossary.objects.available()
     template_name = "glossary_delete.html"
     success_url = reverse_lazy("home")
 
+    def form_valid(self, form):
+        """
+        Overridden to hide the glossary immediately and delete its entries in batches
+        in the background, instead of deleting everything in one large transaction.
+        """
+        mark_for_deletion(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class GlossaryAddEntryView(LoginRequiredMixin, CreateView):
     """
@@ -324,6 +622,7 @@ class GlossaryAddEntryView(LoginRequiredMixin, CreateView):
         obj.created_by = self.request.user
         obj.updated_by = self.request.user
         obj.save()
+        refresh_search_cache([obj.glossary.title] if obj.glossary else [], texts=[obj.source, obj.target])
 
         if self.request.GET.get("previous_url"):
             previous_url = self.request.GET.get("previous_url")
@@ -342,6 +641,7 @@ class GlossaryAddEntryView(LoginRequiredMixin, CreateView):
 
 class GlossaryUpdateView(LoginRequiredMixin, UpdateView):
     model = Glossary
+    queryset = Glossary.objects.available()
     template_name = "glossary_update.html"
     fields = ("title", "notes")
 
@@ -349,24 +649,101 @@ class GlossaryUpdateView(LoginRequiredMixin, UpdateView):
         obj = form.save(commit=False)
         obj.updated_by = self.request.user
         obj.save()
+        if "title" in form.changed_data:
+            # Searches of the glossary are cached under its title. The entries searched by
+            # all resources are the same.
+            refresh_search_cache([form.initial["title"], obj.title], all_resources=False)
         return HttpResponseRedirect(obj.get_absolute_url())
 
 
 class GlossaryAllEntryView(LoginRequiredMixin, DetailView):
+    """
+    Lists the entries of a glossary, one page at a time, sorted and filtered
+    as set in the EntryFilterForm at the top of the page.
+    """
     model = Glossary
+    queryset = Glossary.objects.available()
     template_name = "glossary_all.html"
+    entries_per_page = 500
 
     def get_context_data(self, **kwargs):
         context = super(GlossaryAllEntryView, self).get_context_data(**kwargs)
-        all_entries = context["glossary"].entries.all()
-        num_of_entries = context["glossary"].entries.all().count()
+        glossary = context["glossary"]
+        # The sorting and filters are those of the query string, or of the page a bulk action was sent from
+        filters = kwargs.get("filters", self.request.GET)
+        filter_form = EntryFilterForm(filters, glossary=glossary)
+        all_entries = filter_form.filter(glossary.entries.all())
+        page = Paginator(all_entries, self.entries_per_page).get_page(filters.get("page"))
+
+        # Filters kept by the page links and after a bulk action
+        query = filters.copy()
+        query.pop("page", None)
         context.update({
-            "all_entries": all_entries,
-            "num_of_entries": num_of_entries,
+            "all_entries": page.object_list,
+            "page": page,
+            "num_of_entries": glossary.entries.all().count(),
+            "filter_form": filter_form,
+            "query": query.urlencode(),
+            "bulk_form": kwargs.get("bulk_form") or EntryBulkActionForm(glossary=glossary),
         })
         return context
 
 
+class GlossaryEntryBulkView(LoginRequiredMixin, View):
+    """
+    Applies an action (update, move or delete) to the entries selected on the glossary
+    entries page. Each action is a single UPDATE or DELETE statement run in one transaction.
+    """
+    form_class = EntryBulkActionForm
+
+    def post(self, request, *args, **kwargs):
+        glossary = get_object_or_404(Glossary.objects.available(), pk=self.kwargs["pk"])
+        form = self.form_class(request.POST, glossary=glossary)
+
+        if form.is_valid():
+            entries = form.cleaned_data["entries"]
+            action = form.cleaned_data["action"]
+            texts = list(chain.from_iterable(entries.values_list("source", "target")))
+            glossaries = [glossary.title]
+            changes = {
+                "updated_on": timezone.now(),
+                "updated_by": request.user,
+            }
+
+            with transaction.atomic():
+                if action == "delete":
+                    entries.delete()
+                else:
+                    if action == "move":
+                        changes["glossary"] = form.cleaned_data["glossary"]
+                        glossaries.append(form.cleaned_data["glossary"].title)
+                    else:
+                        if form.cleaned_data["target"]:
+                            texts.append(form.cleaned_data["target"])
+                            changes["target"] = form.cleaned_data["target"]
+                            changes["target_norm"] = normalise_text(form.cleaned_data["target"])
+                        if form.cleaned_data["notes"]:
+                            changes["notes"] = form.cleaned_data["notes"]
+                        elif form.cleaned_data["clear_notes"]:
+                            changes["notes"] = ""
+                    entries.update(**changes)
+            # Moving entries does not change the results of searches of all resources
+            refresh_search_cache(glossaries, texts=texts, all_resources=action != "move")
+
+            # Return to the same sorting and filters
+            url = reverse("glossary_all_entries", args=[glossary.pk])
+            if request.POST.get("query"):
+                url += "?" + QueryDict(request.POST["query"]).urlencode()
+            return HttpResponseRedirect(url)
+
+        # Redisplay the entries page with the errors
+        view = GlossaryAllEntryView(request=request, kwargs=self.kwargs, object=glossary)
+        context = view.get_context_data(
+            object=glossary, bulk_form=form, filters=QueryDict(request.POST.get("query", ""))
+        )
+        return render(request, view.template_name, context)
+
+
 class GlossaryExportView(LoginRequiredMixin, View):
     form_class = GlossaryExportForm
     template_name = "glossary_export.html"
@@ -386,17 +763,18 @@ class GlossaryExportView(LoginRequiredMixin, View):
         form = self.form_class(request.POST)
         if form.is_valid():
             glossaries = form.cleaned_data.get("glossaries")  # Glossary objects to be exported
-            response = build_download(glossaries)
+            file_format = form.cleaned_data.get("file_format")
+            response = build_download(glossaries, file_format)
             return response
 
         return render(request, self.template_name, {"form": form})
 
 
-def build_download(glossaries):
+def build_download(glossaries, file_format="txt"):
     """
     Helper function for GlossaryExportView.
-    Receives list of Glossary objects.
-    Converts each object into a text file.
+    Receives list of Glossary objects and the format to export them in.
+    Converts each object into a file in that format (see exporters.GLOSSARY_WRITERS).
     Zips all the text files together.
     Returns a FileResponse that causes the browser to download the zip file.
     """
@@ -406,19 +784,12 @@ def build_download(glossaries):
     if not os.path.isdir(export_folder):
         os.makedirs(export_folder)
 
-    # Create one tab-delim text file for each Glossary object and save to temporary folder
+    # Create one file for each Glossary object and save to temporary folder
+    writer, extension, description = GLOSSARY_WRITERS[file_format]
     for glossary in glossaries:
-        filename = export_folder + glossary.title + ".txt"
-        with open(filename, "w") as f:
-            for entry in glossary.entries.all():
-                f.write(entry.source + "\t" + entry.target)
-                if entry.notes:
-                    # Replace any newline and carriage return chars and append note
-                    new_note = entry.notes.replace("\r", " ")
-                    new_note = new_note.replace("\n", " ")
-                    new_note = new_note.replace("  ", " ")
-                    f.write("\t" + new_note)
-                f.write("\n")
+        filename = export_folder + glossary.title + "." + extension
+        with open(filename, "wb") as f:
+            writer(glossary, f)
 
     # Create single zip file from all files created
     shutil.make_archive(base_name="exported_files",  # Name of the zip file to create
@@ -441,19 +812,23 @@ def build_download(glossaries):
 
 class TranslationDetailView(LoginRequiredMixin, DetailView):
     model = Translation
+    queryset = Translation.objects.available()
     template_name = "translation_detail.html"
 
     def get_context_data(self, **kwargs):
         context = super(TranslationDetailView, self).get_context_data(**kwargs)
-        num_of_segments = context["translation"].segments.all().count()
+        num_of_segments = segment_count(context["translation"])
+        term_extraction = context["translation"].term_extractions.filter(status=TermExtraction.DONE).last()
         context.update({
             "num_of_segments": num_of_segments,
+            "term_extraction": term_extraction,
         })
         return context
 
 
 class TranslationUpdateView(LoginRequiredMixin, UpdateView):
     model = Translation
+    queryset = Translation.objects.available()
     template_name = "translation_update.html"
     fields = ("job_number", "field", "client", "notes")
 
@@ -461,23 +836,37 @@ class TranslationUpdateView(LoginRequiredMixin, UpdateView):
         obj = form.save(commit=False)
         obj.updated_by = self.request.user
         obj.save()
+        if "job_number" in form.changed_data:
+            # Searches of the translation are cached under its job number
+            refresh_search_cache([form.initial["job_number"], obj.job_number], all_resources=False)
         return HttpResponseRedirect(obj.get_absolute_url())
 
 
 class TranslationDeleteView(LoginRequiredMixin, DeleteView):
     model = Translation
+    queryset = Translation.objects.available()
     template_name = "translation_delete.html"
     success_url = reverse_lazy("home")
 
+    def form_valid(self, form):
+        """
+        Overridden to hide the translation immediately and delete its segments in batches
+        in the background, instead of deleting everything in one large transaction.
+        """
+        mark_for_deletion(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class TranslationShowAllView(LoginRequiredMixin, DetailView):
     model = Translation
+    queryset = Translation.objects.available()
     template_name = "translation_all.html"
 
     def get_context_data(self, **kwargs):
         context = super(TranslationShowAllView, self).get_context_data(**kwargs)
-        all_segs = context["translation"].segments.all()
-        num_of_segments = context["translation"].segments.all().count()
+        # Compressed segments are decompressed one block at a time as the page is rendered
+        all_segs = iter_segments(context["translation"])
+        num_of_segments = segment_count(context["translation"])
         context.update({
             "all_segs": all_segs,
             "num_of_segments": num_of_segments,
@@ -485,13 +874,81 @@ class TranslationShowAllView(LoginRequiredMixin, DetailView):
         return context
 
 
+class TranslationExportView(LoginRequiredMixin, View):
+    """
+    Exports translations as TMX or tab-delimited text files.
+    A single translation can also be downloaded directly with a GET request
+    (from the translation detail page) by passing its pk and the format.
+    """
+    form_class = TranslationExportForm
+    template_name = "translation_export.html"
+
+    def get(self, request, *args, **kwargs):
+        if "pk" in self.kwargs:
+            translation = get_object_or_404(Translation.objects.available(), pk=self.kwargs["pk"])
+            file_format = request.GET.get("format", "tmx")
+            if file_format not in TRANSLATION_WRITERS:
+                file_format = "tmx"
+            return build_translation_download([translation], file_format)
+
+        form = self.form_class()
+        return render(request, self.template_name, {"form": form})
+
+    def post(self, request, *args, **kwargs):
+
+        # If the cancel button has been pressed in the form, return to the previous URL
+        if "cancel" in request.POST:
+            if request.GET.get("previous_url"):
+                previous_url = request.GET.get("previous_url")
+                return HttpResponseRedirect(previous_url)
+
+        form = self.form_class(request.POST)
+        if form.is_valid():
+            translations = form.cleaned_data.get("translations")
+            file_format = form.cleaned_data.get("file_format")
+            return build_translation_download(translations, file_format)
+
+        return render(request, self.template_name, {"form": form})
+
+
+def build_translation_download(translations, file_format):
+    """
+    Helper function for TranslationExportView.
+    Receives list of Translation objects and the format to export them in.
+    Returns a StreamingHttpResponse so that the file is generated from the segments
+    as it is sent, rather than being built in memory or on disk first.
+    A single translation is sent as is; several translations are sent as one zip file.
+    """
+    writer, extension, description = TRANSLATION_WRITERS[file_format]
+
+    if len(translations) == 1:
+        translation = translations[0]
+        response = StreamingHttpResponse(writer(translation), content_type="application/octet-stream")
+        filename = f"{translation.job_number}.{extension}"
+    else:
+        files = ((f"{translation.job_number}.{extension}", writer(translation)) for translation in translations)
+        response = StreamingHttpResponse(zip_chunks(files), content_type="application/zip")
+        filename = "exported_translations.zip"
+
+    # Force browser to download
+    response["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
 class TranslationUploadView(LoginRequiredMixin, View):
     form_class = TranslationUploadForm
     template_name = "translation_upload.html"
 
+    def get_context_data(self, form):
+        # Large files are sent in chunks to ChunkedUploadView by the page's script
+        return {
+            "form": form,
+            "chunked_upload_threshold": getattr(settings, "CHUNKED_UPLOAD_THRESHOLD", 20 * 1024 * 1024),
+        }
+
     def get(self, request, *args, **kwargs):
         form = self.form_class()
-        return render(request, self.template_name, {"form": form})
+        return render(request, self.template_name, self.get_context_data(form))
 
     def post(self, request, *args, **kwargs):
 
@@ -503,6 +960,17 @@ class TranslationUploadView(LoginRequiredMixin, View):
 
         form = TranslationUploadForm(request.POST, request.FILES)
         if form.is_valid():
+            if is_archive(form.cleaned_data["translation_file"]):
+                job = start_archive_import(
+                    "translation",
+                    form.cleaned_data["translation_file"],
+                    request.user,
+                    field=form.cleaned_data["field"],
+                    client=form.cleaned_data["client"],
+                    notes=form.cleaned_data["notes"],
+                )
+                return redirect(job)
+
             translation_obj = Translation(
                 translation_file=form.cleaned_data["translation_file"],
                 job_number=form.cleaned_data["job_number"],
@@ -521,24 +989,709 @@ class TranslationUploadView(LoginRequiredMixin, View):
 
             return redirect("home")
 
-        return render(request, self.template_name, {"form": form})
+        return render(request, self.template_name, self.get_context_data(form))
 
 
 def build_segments(translation_obj):
     """
     Helper method for TranslationUploadView.
-    Builds Segment objects from the content of an uploaded tmx file.
+    Builds Segment objects from the content of an uploaded tmx, xliff or sdlxliff file.
     Receives new Translation object.
-    Uses "tmxfile" from translate-toolkit for parsing a tmx file.
-    """
-    new_segments = []
-    tmx_file = tmxfile(translation_obj.translation_file)
-    for node in tmx_file.unit_iter():
-        new_segment = Segment(
-            translation=translation_obj,
-            source=node.source,
-            target=node.target,
-        )
-        new_segments.append(new_segment)
-    Segment.objects.bulk_create(new_segments)
+    Segments are written in batches as the file is read, so memory use does not depend on
+    the size of the file. All language pairs in the file are imported.
+    If the SEGMENT_STORAGE setting is "compressed", the segments are written as compressed
+    blocks instead of Segment rows.
+    """
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+    reader = get_translation_reader(translation_obj.translation_file.open("rb"))
+
+    segments = iter(reader)
+    first_segment = next(segments, None)
+    if first_segment:
+        segments = chain([first_segment], segments)
+
+    translation_obj.storage = getattr(settings, "SEGMENT_STORAGE", Translation.ROWS)
+    num_of_segments = 0
+    with transaction.atomic():
+        if translation_obj.storage == Translation.COMPRESSED:
+            num_of_segments = write_segment_blocks(translation_obj, segments)
+        else:
+            new_segments = (
+                Segment(
+                    translation=translation_obj,
+                    source=source,
+                    target=target,
+                    source_norm=normalise_text(source),
+                    target_norm=normalise_text(target),
+                    source_lang=source_lang,
+                    target_lang=target_lang,
+                )
+                for source, target, source_lang, target_lang in segments
+            )
+            while True:
+                batch = list(islice(new_segments, batch_size))
+                if not batch:
+                    break
+                Segment.objects.bulk_create(batch)
+                num_of_segments += len(batch)
+
+        # The language pair of the first segment is taken as the main language pair
+        if first_segment:
+            translation_obj.source_lang = first_segment[2]
+            translation_obj.target_lang = first_segment[3]
+        translation_obj.languages = " ".join(lang for lang in reader.languages if lang)
+        translation_obj.save()
+
+    translation_obj.translation_file.close()
     translation_obj.translation_file.delete()  # File no longer needed
+
+    # Cached results of searches of the translation are out of date
+    refresh_search_cache([translation_obj.job_number])
+
+    return num_of_segments
+
+
+def start_archive_import(kind, archive_file, user, **details):
+    """
+    Helper method for GlossaryUploadView and TranslationUploadView.
+    Creates an ImportJob for an uploaded zip archive, with one ImportJobItem per file in it,
+    and starts importing the files in the background, several at a time.
+    Only the archive's directory is read here; each file is streamed out of the archive
+    by the task importing it. Imports whose tasks were lost are finished by the
+    "resume_import_jobs" management command.
+    kind is "glossary" or "translation"; details are applied to each imported resource.
+    """
+    job = ImportJob.objects.create(kind=kind, archive=archive_file, created_by=user, **details)
+    readers = GLOSSARY_READERS if kind == "glossary" else TRANSLATION_READERS
+
+    items = []
+    with zipfile.ZipFile(job.archive.open("rb")) as archive:
+        for info in archive.infolist():
+            basename = os.path.basename(info.filename)
+            # Ignore folders and files added by the operating system (e.g. "__MACOSX/", ".DS_Store")
+            if info.is_dir() or basename.startswith(".") or info.filename.startswith("__MACOSX/"):
+                continue
+            item = ImportJobItem(job=job, member_name=info.filename)
+            extension = os.path.splitext(basename)[1].lstrip(".").lower()
+            if extension not in readers:
+                item.status = ImportJobItem.SKIPPED
+                item.message = "Not a supported file type."
+            items.append(item)
+    job.archive.close()
+    ImportJobItem.objects.bulk_create(items)
+
+    for item_pk in job.items.filter(status=ImportJobItem.PENDING).values_list("pk", flat=True):
+        run_in_background(import_archive_member, item_pk)
+
+    # Nothing to import, so the archive is no longer needed
+    if job.is_finished:
+        job.archive.delete()
+
+    return job
+
+
+def import_archive_member(item_pk):
+    """
+    Background task started by start_archive_import.
+    Imports one file of a zip archive as a new Glossary or Translation object named after
+    the file, and records the result in its ImportJobItem.
+    """
+    item = ImportJobItem.objects.select_related("job__created_by").get(pk=item_pk)
+    job = item.job
+    ImportJobItem.objects.filter(pk=item.pk).update(status=ImportJobItem.RUNNING)
+
+    filename = os.path.basename(item.member_name)
+    name = os.path.splitext(filename)[0]
+    resource = None
+    try:
+        with zipfile.ZipFile(job.archive.open("rb")) as archive:
+            with archive.open(item.member_name) as member:
+                if job.kind == "glossary":
+                    name = name[:Glossary._meta.get_field("title").max_length]
+                    if Glossary.objects.available().filter(title__iexact=name).exists():
+                        item.status = ImportJobItem.SKIPPED
+                        item.message = "A glossary with that title already exists."
+                    else:
+                        resource = Glossary(
+                            glossary_file=File(member, name=filename),
+                            title=name,
+                            notes=job.notes,
+                            created_by=job.created_by,
+                            updated_by=job.created_by,
+                        )
+                        resource.save()
+                        report = build_entries(resource, job.created_by)
+                        item.glossary = resource
+                        item.imported = report.imported
+                        item.rejected = report.rejected_count
+                        item.message = "; ".join(str(rejection) for rejection in report.rejected[:10])
+                        item.status = ImportJobItem.DONE
+                else:
+                    if Translation.objects.available().filter(job_number__iexact=name).exists():
+                        item.status = ImportJobItem.SKIPPED
+                        item.message = "A translation with that job number already exists."
+                    else:
+                        resource = Translation(
+                            translation_file=File(member, name=filename),
+                            job_number=name,
+                            field=job.field,
+                            client=job.client,
+                            notes=job.notes,
+                            uploaded_by=job.created_by,
+                        )
+                        resource.save()
+                        item.imported = build_segments(resource)
+                        item.translation = resource
+                        item.status = ImportJobItem.DONE
+    except Exception as e:
+        # Don't leave a partly imported resource behind
+        if resource is not None and resource.pk:
+            uploaded_file = resource.glossary_file if job.kind == "glossary" else resource.translation_file
+            uploaded_file.close()
+            uploaded_file.delete(save=False)
+            resource.delete()
+        item.glossary = None
+        item.translation = None
+        item.status = ImportJobItem.FAILED
+        item.message = str(e) or e.__class__.__name__
+    finally:
+        item.save()
+        job.archive.close()
+
+    # The archive is deleted once all its files have been imported
+    if job.is_finished and job.archive:
+        job.archive.delete()
+
+
+class ImportJobDetailView(LoginRequiredMixin, DetailView):
+    """ Shows the progress and result of importing each file of a zip archive. """
+    model = ImportJob
+    template_name = "import_job_detail.html"
+
+    def get_context_data(self, **kwargs):
+        context = super(ImportJobDetailView, self).get_context_data(**kwargs)
+        items = context["object"].items.select_related("glossary", "translation")
+        context.update({
+            "items": items,
+            "is_finished": context["object"].is_finished,
+        })
+        return context
+
+
+class ChunkedUploadView(LoginRequiredMixin, View):
+    """
+    Resumable upload of a large translation file (or zip archive of translation files)
+    in chunks, each sent in its own short request.
+
+    POST with the file's name, size, optional SHA-256 checksum and translation details
+    starts an upload. Chunks are then sent in order with PATCH requests to the upload's URL,
+    each having an "Upload-Offset" header with the position of the chunk in the file and
+    optionally an "Upload-Checksum: sha256 <hex>" header. The last chunk may also have an
+    "Upload-File-Checksum: sha256 <hex>" header with the hash of the whole file, if it was
+    not given when the upload was started. GET returns the upload's progress,
+    e.g. the offset from which to resume an interrupted upload, and DELETE cancels it.
+    Once the last chunk has been received, the file is imported in the background.
+    """
+    def get_upload(self, request, pk, for_update=False):
+        uploads = ChunkedUpload.objects.select_for_update() if for_update else ChunkedUpload.objects
+        return get_object_or_404(uploads, pk=pk, created_by=request.user)
+
+    def get(self, request, pk, *args, **kwargs):
+        return chunked_upload_response(self.get_upload(request, pk))
+
+    def post(self, request, pk=None, *args, **kwargs):
+        if pk is not None:
+            return JsonResponse({"error": "Chunks must be sent with PATCH requests."}, status=405)
+
+        form = ChunkedUploadForm(request.POST)
+        if not form.is_valid():
+            return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+
+        upload = form.save(commit=False)
+        upload.created_by = request.user
+        extension = os.path.splitext(upload.filename)[1].lower()
+        # The chunks are written into an empty file created up front
+        upload.upload_file.save(f"{upload.pk}{extension}", ContentFile(b""))
+        return chunked_upload_response(upload, status=201)
+
+    def patch(self, request, pk, *args, **kwargs):
+        chunk_size = getattr(settings, "CHUNKED_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers["Content-Length"])
+        except (KeyError, ValueError):
+            return JsonResponse({"error": "The Upload-Offset and Content-Length headers are required."}, status=400)
+        if length > chunk_size:
+            return JsonResponse({"error": f"Chunks must not be larger than {chunk_size} bytes."}, status=413)
+
+        try:
+            checksum = checksum_header(request, "Upload-Checksum")
+            whole_file_checksum = checksum_header(request, "Upload-File-Checksum")
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+
+        # The upload is locked while the chunk is written, so chunks cannot be written twice
+        with transaction.atomic():
+            upload = self.get_upload(request, pk, for_update=True)
+            if upload.status != ChunkedUpload.UPLOADING or offset != upload.offset:
+                # The client resumes from the offset in the response
+                return chunked_upload_response(upload, status=409)
+            if offset + length > upload.size:
+                return JsonResponse({"error": "The chunk extends past the end of the file."}, status=400)
+
+            error = append_chunk(upload, request, length, checksum)
+            if error:
+                return JsonResponse({"error": error, "offset": upload.offset}, status=400)
+
+            upload.offset += length
+            if upload.is_complete:
+                upload.checksum = upload.checksum or whole_file_checksum or ""
+                upload.status = ChunkedUpload.IMPORTING
+                run_in_background(finish_chunked_upload, upload.pk)
+            upload.save()
+
+        return chunked_upload_response(upload)
+
+    def delete(self, request, pk, *args, **kwargs):
+        upload = self.get_upload(request, pk)
+        if upload.status != ChunkedUpload.UPLOADING:
+            return chunked_upload_response(upload, status=409)
+        upload.upload_file.delete(save=False)
+        upload.delete()
+        return HttpResponse(status=204)
+
+
+def chunked_upload_response(upload, status=200):
+    """ Helper method for ChunkedUploadView. Describes the progress of a chunked upload. """
+    if upload.translation:
+        redirect_url = upload.translation.get_absolute_url()
+    elif upload.import_job:
+        redirect_url = upload.import_job.get_absolute_url()
+    else:
+        redirect_url = ""
+
+    return JsonResponse({
+        "id": str(upload.pk),
+        "url": reverse("chunked_upload_detail", args=[upload.pk]),
+        "filename": upload.filename,
+        "size": upload.size,
+        "offset": upload.offset,
+        "chunk_size": getattr(settings, "CHUNKED_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024),
+        "status": upload.status,
+        "message": upload.message,
+        "redirect_url": redirect_url,
+    }, status=status)
+
+
+def checksum_header(request, header):
+    """
+    Helper method for ChunkedUploadView.
+    Returns the hash in a "sha256 <hex>" header of the request, or None if there is no such header.
+    """
+    if not request.headers.get(header):
+        return None
+    algorithm, _, checksum = request.headers[header].partition(" ")
+    if algorithm.lower() != "sha256" or not re.fullmatch(r"[0-9a-fA-F]{64}", checksum):
+        raise ValueError(f"The {header} header must be a SHA-256 hash in hexadecimal.")
+    return checksum.lower()
+
+
+def append_chunk(upload, request, length, checksum=None):
+    """
+    Helper method for ChunkedUploadView.
+    Writes a chunk read from the body of the request at the end of the upload's file.
+    The chunk is streamed to disk rather than read into memory.
+    If the chunk is incomplete or does not match its checksum, it is discarded and an
+    error message is returned.
+    """
+    digest = hashlib.sha256()
+    remaining = length
+    with open(upload.upload_file.path, "r+b") as f:
+        f.seek(upload.offset)
+        while remaining:
+            data = request.read(min(remaining, 64 * 1024))
+            if not data:
+                break
+            f.write(data)
+            digest.update(data)
+            remaining -= len(data)
+
+        if remaining:
+            error = "The chunk is incomplete."
+        elif checksum and digest.hexdigest() != checksum.lower():
+            error = "The checksum of the chunk does not match."
+        else:
+            error = None
+
+        # Drop the rejected chunk, and anything left after an earlier rejected chunk
+        f.truncate(upload.offset if error else upload.offset + length)
+    return error
+
+
+def file_checksum(path):
+    """ Returns the SHA-256 hash of a file in hexadecimal. """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finish_chunked_upload(upload_pk):
+    """
+    Background task started by ChunkedUploadView once all chunks of a file have been received.
+    Checks the file against its checksum and imports it as a new Translation object,
+    or as an ImportJob in the case of a zip archive.
+    The assembled file is handed over to the import rather than copied.
+    """
+    upload = ChunkedUpload.objects.select_related("created_by").get(pk=upload_pk)
+    translation_obj = None
+    try:
+        if upload.checksum and file_checksum(upload.upload_file.path) != upload.checksum:
+            raise ValueError("The checksum of the uploaded file does not match. Please upload the file again.")
+
+        if upload.filename.lower().endswith(".zip"):
+            if not zipfile.is_zipfile(upload.upload_file.path):
+                raise ValueError("The uploaded file is not a valid zip archive.")
+            # The job deletes the archive once its files have been imported
+            upload.import_job = start_archive_import(
+                "translation",
+                upload.upload_file,
+                upload.created_by,
+                field=upload.field,
+                client=upload.client,
+                notes=upload.notes,
+            )
+            upload.upload_file = None
+        else:
+            if Translation.objects.available().filter(job_number__iexact=upload.job_number).exists():
+                raise ValueError("A translation with that job number already exists.")
+            translation_obj = Translation(
+                translation_file=upload.upload_file.name,
+                job_number=upload.job_number,
+                field=upload.field,
+                client=upload.client,
+                notes=upload.notes,
+                uploaded_by=upload.created_by,
+            )
+            translation_obj.save()
+            # build_segments deletes the file once it has been imported
+            upload.upload_file = None
+            build_segments(translation_obj)
+            upload.translation = translation_obj
+        upload.status = ChunkedUpload.DONE
+    except Exception as e:
+        # Don't leave a partly imported translation behind
+        if translation_obj is not None and translation_obj.pk:
+            translation_obj.translation_file.close()
+            translation_obj.translation_file.delete(save=False)
+            translation_obj.delete()
+        elif upload.upload_file:
+            upload.upload_file.delete(save=False)
+        upload.status = ChunkedUpload.FAILED
+        upload.message = str(e) or e.__class__.__name__
+    finally:
+        upload.save()
+
+
+class TermCheckCreateView(LoginRequiredMixin, View):
+    """ Starts a check of the terms used in a translation against the selected glossaries. """
+    form_class = TermCheckForm
+    template_name = "term_check_create.html"
+
+    def get(self, request, pk, *args, **kwargs):
+        translation = get_object_or_404(Translation.objects.available(), pk=pk)
+        form = self.form_class()
+        return render(request, self.template_name, {"form": form, "translation": translation})
+
+    def post(self, request, pk, *args, **kwargs):
+        translation = get_object_or_404(Translation.objects.available(), pk=pk)
+
+        # If the cancel button has been pressed in the form, return to the translation
+        if "cancel" in request.POST:
+            return redirect(translation)
+
+        form = self.form_class(request.POST)
+        if form.is_valid():
+            term_check = TermCheck.objects.create(translation=translation, created_by=request.user)
+            term_check.glossaries.set(form.cleaned_data["glossaries"])
+            run_in_background(run_term_check, term_check.pk)
+            return redirect(term_check)
+
+        return render(request, self.template_name, {"form": form, "translation": translation})
+
+
+def run_term_check(term_check_pk):
+    """
+    Background task started by TermCheckCreateView.
+    Checks every segment of the translation against all entries of the selected glossaries
+    in a single pass, and saves the issues found in batches.
+    Only the first TERM_CHECK_MAX_ISSUES issues are saved, but all of them are counted.
+    """
+    term_check = TermCheck.objects.select_related("translation").get(pk=term_check_pk)
+    TermCheck.objects.filter(pk=term_check.pk).update(status=TermCheck.RUNNING)
+    max_issues = getattr(settings, "TERM_CHECK_MAX_ISSUES", 10000)
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+
+    try:
+        entries = Entry.objects.filter(glossary__in=term_check.glossaries.all())
+        checker = TermChecker(entries.values_list("pk", "source", "target").iterator())
+        term_check.num_of_terms = checker.num_of_terms
+
+        batch = []
+        for issue in checker.check(iter_segments(term_check.translation)):
+            term_check.issue_count += 1
+            if term_check.issue_count > max_issues:
+                continue
+            batch.append(
+                TermCheckIssue(
+                    term_check=term_check,
+                    segment_number=issue.segment_number,
+                    source=issue.source,
+                    target=issue.target,
+                    term_source=issue.term.source,
+                    term_target=issue.term.target,
+                    entry_id=issue.term.entry_id,
+                )
+            )
+            if len(batch) >= batch_size:
+                TermCheckIssue.objects.bulk_create(batch)
+                batch = []
+        TermCheckIssue.objects.bulk_create(batch)
+
+        term_check.segments_checked = checker.segments_checked
+        term_check.status = TermCheck.DONE
+    except Exception as e:
+        term_check.status = TermCheck.FAILED
+        term_check.message = str(e) or e.__class__.__name__
+    finally:
+        term_check.finished_on = timezone.now()
+        term_check.save()
+
+
+class TermCheckDetailView(LoginRequiredMixin, DetailView):
+    """ Shows the result of a term check, one page of issues at a time. """
+    model = TermCheck
+    template_name = "term_check_detail.html"
+    issues_per_page = 200
+
+    def get_context_data(self, **kwargs):
+        context = super(TermCheckDetailView, self).get_context_data(**kwargs)
+        issues = context["object"].issues.all()
+        page = Paginator(issues, self.issues_per_page).get_page(self.request.GET.get("page"))
+        context.update({
+            "page": page,
+            "issues": page.object_list,
+            "glossaries": context["object"].glossaries.order_by(Lower("title")),
+        })
+        return context
+
+
+class TermExtractionDetailView(LoginRequiredMixin, DetailView):
+    """
+    Lists the term candidates found by the extract_terms management command,
+    best scoring first, for them to be added to a glossary or rejected.
+    """
+    model = TermExtraction
+    template_name = "term_extraction_detail.html"
+
+    def get_context_data(self, **kwargs):
+        context = super(TermExtractionDetailView, self).get_context_data(**kwargs)
+        candidates = context["object"].candidates.all()
+        context.update({
+            "proposed": candidates.filter(status=TermCandidate.PROPOSED),
+            "reviewed": candidates.exclude(status=TermCandidate.PROPOSED).select_related("entry__glossary"),
+            "review_form": kwargs.get("review_form") or TermCandidateReviewForm(extraction=context["object"]),
+        })
+        return context
+
+
+class TermCandidateReviewView(LoginRequiredMixin, View):
+    """
+    Adds the term candidates selected on the term extraction page to a glossary as new entries,
+    or marks them as rejected so that they are no longer proposed.
+    """
+    form_class = TermCandidateReviewForm
+
+    def post(self, request, *args, **kwargs):
+        extraction = get_object_or_404(TermExtraction, pk=self.kwargs["pk"])
+        form = self.form_class(request.POST, extraction=extraction)
+
+        if form.is_valid():
+            candidates = form.cleaned_data["candidates"]
+            with transaction.atomic():
+                if form.cleaned_data["action"] == "reject":
+                    candidates.update(status=TermCandidate.REJECTED)
+                else:
+                    glossary = form.cleaned_data["glossary"]
+                    for candidate in candidates:
+                        candidate.entry = Entry.objects.create(
+                            source=candidate.source,
+                            target=candidate.target,
+                            glossary=glossary,
+                            created_by=request.user,
+                            updated_by=request.user,
+                        )
+                        candidate.status = TermCandidate.ACCEPTED
+                        candidate.save()
+                    refresh_search_cache(
+                        [glossary.title],
+                        texts=[text for candidate in candidates for text in (candidate.source, candidate.target)],
+                    )
+                    messages.success(request, f"{len(candidates)} entries added to {glossary}.")
+            return redirect(extraction)
+
+        # Redisplay the candidates with the errors
+        view = TermExtractionDetailView(request=request, kwargs=self.kwargs, object=extraction)
+        return render(request, view.template_name, view.get_context_data(object=extraction, review_form=form))
+
+
+class DuplicateReportCreateView(LoginRequiredMixin, View):
+    """
+    Starts a search for duplicate source terms across all glossaries.
+    If the search is started from a glossary, its result is shown for that glossary.
+    """
+    def post(self, request, *args, **kwargs):
+        report = DuplicateReport.objects.create(
+            threshold=getattr(settings, "DUPLICATE_SIMILARITY", 0.7),
+            created_by=request.user,
+        )
+        run_in_background(run_duplicate_report, report.pk)
+
+        url = report.get_absolute_url()
+        if request.POST.get("glossary", "").isdigit():
+            url += f"?glossary={request.POST['glossary']}"
+        return HttpResponseRedirect(url)
+
+
+def run_duplicate_report(report_pk):
+    """
+    Background task started by DuplicateReportCreateView.
+    Finds the groups of entries having the same or similar source terms in all glossaries,
+    and saves them in batches.
+    """
+    report = DuplicateReport.objects.get(pk=report_pk)
+    DuplicateReport.objects.filter(pk=report.pk).update(status=DuplicateReport.RUNNING)
+    batch_size = getattr(settings, "IMPORT_BATCH_SIZE", 2000)
+
+    try:
+        entries = Entry.objects.exclude(glossary__is_deleting=True)
+        report.num_of_entries = entries.count()
+        groups = find_duplicates(
+            entries.values_list("pk", "glossary_id", "source", "target").iterator(),
+            threshold=report.threshold,
+        )
+
+        batch = []
+        for number, group in enumerate(groups, start=1):
+            for entry in group.entries:
+                batch.append(
+                    DuplicateReportEntry(
+                        report=report,
+                        group=number,
+                        is_exact=group.is_exact,
+                        has_conflict=group.has_conflict,
+                        entry_id=entry.entry_id,
+                        glossary_id=entry.glossary_id,
+                        source=entry.source,
+                        target=entry.target,
+                    )
+                )
+            if len(batch) >= batch_size:
+                DuplicateReportEntry.objects.bulk_create(batch)
+                batch = []
+        DuplicateReportEntry.objects.bulk_create(batch)
+
+        report.group_count = len(groups)
+        report.conflict_count = sum(1 for group in groups if group.has_conflict)
+        report.status = DuplicateReport.DONE
+    except Exception as e:
+        report.status = DuplicateReport.FAILED
+        report.message = str(e) or e.__class__.__name__
+    finally:
+        report.finished_on = timezone.now()
+        report.save()
+
+
+class DuplicateReportDetailView(LoginRequiredMixin, DetailView):
+    """
+    Shows the groups of duplicate source terms found by a duplicate report, one page of
+    groups at a time. The groups can be limited to those containing entries of a glossary
+    (?glossary=<pk>) and to those having conflicting targets (?conflicts=1).
+    """
+    model = DuplicateReport
+    template_name = "duplicate_report_detail.html"
+    groups_per_page = 100
+
+    def get_context_data(self, **kwargs):
+        context = super(DuplicateReportDetailView, self).get_context_data(**kwargs)
+        items = context["object"].items.all()
+
+        group_items = items
+        glossary = None
+        if self.request.GET.get("glossary", "").isdigit():
+            glossary = Glossary.objects.available().filter(pk=self.request.GET["glossary"]).first()
+            if glossary is not None:
+                group_items = group_items.filter(glossary=glossary)
+        conflicts_only = bool(self.request.GET.get("conflicts"))
+        if conflicts_only:
+            group_items = group_items.filter(has_conflict=True)
+
+        group_numbers = group_items.order_by("group").values_list("group", flat=True).distinct()
+        page = Paginator(group_numbers, self.groups_per_page).get_page(self.request.GET.get("page"))
+        context.update({
+            "page": page,
+            "items": items.filter(group__in=list(page.object_list)).select_related("glossary"),
+            "filter_glossary": glossary,
+            "conflicts_only": conflicts_only,
+        })
+        return context
+
+
+class SearchAnalyticsView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Shows the most frequent, zero-hit and slowest queries of the last days (?days=<n>),
+    from the search logs recorded by telemetry.record_search(). Staff only.
+    Searches are counted by normalised query and resource; ?kind=autocomplete shows the
+    queries of the search bar completions instead of searches.
+    """
+    template_name = "search_analytics.html"
+    period_choices = (1, 7, 30, 90)
+    rows = 50
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get_context_data(self, **kwargs):
+        context = super(SearchAnalyticsView, self).get_context_data(**kwargs)
+        try:
+            days = int(self.request.GET.get("days", 7))
+        except ValueError:
+            days = 7
+        kind = self.request.GET.get("kind", SearchLog.SEARCH)
+        if kind not in dict(SearchLog.KIND_CHOICES):
+            kind = SearchLog.SEARCH
+
+        logs = SearchLog.objects.filter(kind=kind, created_on__gte=timezone.now() - timedelta(days=days))
+        # One row per normalised query and resource, showing one of the queries as typed
+        queries = logs.values("query_norm", "resource").annotate(
+            query=Max("query"),
+            searches=Count("id"),
+            avg_hits=Avg("hits"),
+            avg_latency=Avg("latency"),
+            max_latency=Max("latency"),
+        )
+        context.update({
+            "days": days,
+            "kind": kind,
+            "period_choices": self.period_choices,
+            "summary": logs.aggregate(
+                searches=Count("id"),
+                avg_latency=Avg("latency"),
+                zero_hits=Count("id", filter=Q(hits=0)),
+            ),
+            "top_queries": queries.order_by("-searches", "query_norm")[:self.rows],
+            "zero_hit_queries": queries.filter(avg_hits=0).order_by("-searches", "query_norm")[:self.rows],
+            "slowest_queries": queries.order_by("-avg_latency", "query_norm")[:self.rows],
+        })
+        return context
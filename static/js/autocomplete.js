@@ -0,0 +1,50 @@
+// Fills the search bar's datalist with glossary terms starting with the text typed so far.
+// Requests are debounced so that only one request is sent once the user pauses typing.
+
+(function () {
+    var input = document.querySelector("input[data-autocomplete-url]");
+    if (!input) {
+        return;
+    }
+
+    var datalist = document.getElementById(input.getAttribute("list"));
+    var url = input.getAttribute("data-autocomplete-url");
+    var delay = 200;  // milliseconds
+    var timer = null;
+    var lastQuery = "";
+
+    function showCompletions(completions) {
+        datalist.innerHTML = "";
+        completions.forEach(function (term) {
+            var option = document.createElement("option");
+            option.value = term;
+            datalist.appendChild(option);
+        });
+    }
+
+    function fetchCompletions() {
+        var query = input.value.trim();
+        if (query === lastQuery) {
+            return;
+        }
+        lastQuery = query;
+        if (query === "") {
+            showCompletions([]);
+            return;
+        }
+        fetch(url + "?query=" + encodeURIComponent(query), {credentials: "same-origin"})
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                // Ignore responses to queries the user has already typed past
+                if (data.query === input.value.trim()) {
+                    showCompletions(data.completions);
+                }
+            })
+            .catch(function () {});
+    }
+
+    input.addEventListener("input", function () {
+        clearTimeout(timer);
+        timer = setTimeout(fetchCompletions, delay);
+    });
+})();
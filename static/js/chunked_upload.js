@@ -0,0 +1,194 @@
+// Uploads large translation files in chunks, each sent in its own request, so that an
+// interrupted upload can be resumed from the last chunk received rather than started again.
+// The upload's URL is kept in localStorage, so choosing the same file again resumes it.
+// Each chunk is sent with its SHA-256 hash, and the last one with the hash of the whole file
+// (computed as the chunks are sent, see sha256.js), which the server checks before importing it.
+
+(function () {
+    var form = document.querySelector("form[data-chunked-upload-url]");
+    if (!form) {
+        return;
+    }
+
+    var fileInput = form.querySelector("input[type=file]");
+    var url = form.getAttribute("data-chunked-upload-url");
+    var threshold = parseInt(form.getAttribute("data-chunked-upload-threshold"), 10);
+    var csrfToken = form.querySelector("input[name=csrfmiddlewaretoken]").value;
+    var progress = document.getElementById("chunked-upload-progress");
+    var progressBar = progress.querySelector(".progress-bar");
+    var messages = document.getElementById("chunked-upload-messages");
+    var maxRetries = 5;
+
+    function wait(milliseconds) {
+        return new Promise(function (resolve) { setTimeout(resolve, milliseconds); });
+    }
+
+    function storageKey(file) {
+        return "chunked-upload:" + file.name + ":" + file.size + ":" + file.lastModified;
+    }
+
+    function showMessages(lines, isError) {
+        messages.innerHTML = "";
+        lines.forEach(function (line) {
+            var div = document.createElement("div");
+            div.className = isError ? "form-error mt-2" : "mt-2";
+            div.textContent = line;
+            messages.appendChild(div);
+        });
+    }
+
+    function showProgress(upload) {
+        var percent = Math.floor(100 * upload.offset / upload.size);
+        progress.hidden = false;
+        progressBar.style.width = percent + "%";
+        progressBar.textContent = percent + "%";
+    }
+
+    async function request(method, requestUrl, body, headers) {
+        var response = await fetch(requestUrl, {
+            method: method,
+            body: body,
+            headers: Object.assign({"X-CSRFToken": csrfToken}, headers || {}),
+            credentials: "same-origin",
+        });
+        return {status: response.status, data: await response.json()};
+    }
+
+    async function sha256(buffer) {
+        // The browser's own implementation is faster, but only available on pages served
+        // over HTTPS (or from localhost)
+        if (!window.crypto || !window.crypto.subtle) {
+            return new window.Sha256().update(buffer).hexDigest();
+        }
+        var digest = new Uint8Array(await window.crypto.subtle.digest("SHA-256", buffer));
+        return Array.from(digest, function (byte) { return byte.toString(16).padStart(2, "0"); }).join("");
+    }
+
+    // Brings the hash of the file up to offset, e.g. when resuming an upload
+    async function hashUpTo(file, fileHash, offset, chunkSize) {
+        if (fileHash.length > offset) {
+            fileHash = new window.Sha256();
+        }
+        while (fileHash.length < offset) {
+            var end = Math.min(fileHash.length + chunkSize, offset);
+            fileHash.update(await file.slice(fileHash.length, end).arrayBuffer());
+        }
+        return fileHash;
+    }
+
+    async function startUpload(file) {
+        var savedUrl = localStorage.getItem(storageKey(file));
+        if (savedUrl) {
+            try {
+                var saved = await request("GET", savedUrl);
+                if (saved.status === 200 && saved.data.status === "uploading") {
+                    return saved.data;
+                }
+            } catch (error) {}
+        }
+
+        var body = new FormData(form);
+        body.delete(fileInput.name);
+        body.set("filename", file.name);
+        body.set("size", file.size);
+        var created = await request("POST", url, body);
+        if (created.status !== 201) {
+            var errors = [];
+            Object.values(created.data.errors || {}).forEach(function (fieldErrors) {
+                fieldErrors.forEach(function (error) { errors.push(error.message); });
+            });
+            throw new Error(errors.join("\n") || "The upload could not be started.");
+        }
+        localStorage.setItem(storageKey(file), created.data.url);
+        return created.data;
+    }
+
+    async function sendChunks(file, upload) {
+        var retries = 0;
+        var needsStatus = false;
+        var fileHash = new window.Sha256();
+        while (true) {
+            try {
+                // After an error, ask the server where to resume from
+                if (needsStatus) {
+                    upload = (await request("GET", upload.url)).data;
+                    needsStatus = false;
+                }
+                if (upload.status !== "uploading") {
+                    return upload;
+                }
+                showProgress(upload);
+
+                var end = Math.min(upload.offset + upload.chunk_size, upload.size);
+                var chunk = await file.slice(upload.offset, end).arrayBuffer();
+                var headers = {
+                    "Content-Type": "application/octet-stream",
+                    "Upload-Offset": String(upload.offset),
+                };
+                headers["Upload-Checksum"] = "sha256 " + await sha256(chunk);
+                fileHash = await hashUpTo(file, fileHash, upload.offset, upload.chunk_size);
+                if (end === upload.size) {
+                    headers["Upload-File-Checksum"] = "sha256 " + fileHash.copy().update(chunk).hexDigest();
+                }
+
+                var response = await request("PATCH", upload.url, chunk, headers);
+                // 409 means the server has a different offset, from which the upload continues
+                if (response.status !== 200 && response.status !== 409) {
+                    throw new Error(response.data.error || "The chunk could not be uploaded.");
+                }
+                if (response.status === 200) {
+                    fileHash.update(chunk);
+                }
+                upload = response.data;
+                retries = 0;
+            } catch (error) {
+                retries += 1;
+                if (retries > maxRetries) {
+                    throw error;
+                }
+                needsStatus = true;
+                await wait(retries * 2000);
+            }
+        }
+    }
+
+    async function waitForImport(upload) {
+        showMessages(["The file has been uploaded and is being imported..."], false);
+        while (upload.status === "importing") {
+            await wait(3000);
+            try {
+                upload = (await request("GET", upload.url)).data;
+            } catch (error) {}
+        }
+        return upload;
+    }
+
+    async function uploadFile(file) {
+        var upload = await startUpload(file);
+        upload = await sendChunks(file, upload);
+        showProgress(upload);
+        upload = await waitForImport(upload);
+        localStorage.removeItem(storageKey(file));
+        if (upload.status === "failed") {
+            throw new Error(upload.message);
+        }
+        window.location = upload.redirect_url;
+    }
+
+    form.addEventListener("submit", function (event) {
+        var file = fileInput.files[0];
+        var isCancel = event.submitter && event.submitter.name === "cancel";
+        if (isCancel || !file || file.size <= threshold || !window.fetch) {
+            return;  // Sent as a normal form
+        }
+        event.preventDefault();
+
+        var buttons = form.querySelectorAll("button");
+        buttons.forEach(function (button) { button.disabled = true; });
+        showMessages([], false);
+        uploadFile(file).catch(function (error) {
+            showMessages(error.message.split("\n"), true);
+            buttons.forEach(function (button) { button.disabled = false; });
+        });
+    });
+})();
@@ -0,0 +1,115 @@
+// Incremental SHA-256, used by chunked_upload.js to hash files too large to be read into memory
+// at once. window.crypto.subtle can only hash a whole buffer, and only on pages served over HTTPS.
+
+(function () {
+    var K = new Uint32Array([
+        0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+        0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+        0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+        0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+        0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+        0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+        0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+        0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+    ]);
+
+    function Sha256() {
+        this.state = new Uint32Array([
+            0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+        ]);
+        this.buffer = new Uint8Array(64);  // Bytes waiting for a complete 64-byte block
+        this.bufferLength = 0;
+        this.length = 0;  // Number of bytes hashed
+        this.words = new Uint32Array(64);
+    }
+
+    function rotate(x, n) {
+        return (x >>> n) | (x << (32 - n));
+    }
+
+    // Hashes the 64-byte block of bytes starting at offset
+    Sha256.prototype.compress = function (bytes, offset) {
+        var w = this.words;
+        var i;
+        for (i = 0; i < 16; i++) {
+            var j = offset + i * 4;
+            w[i] = (bytes[j] << 24) | (bytes[j + 1] << 16) | (bytes[j + 2] << 8) | bytes[j + 3];
+        }
+        for (i = 16; i < 64; i++) {
+            var s0 = rotate(w[i - 15], 7) ^ rotate(w[i - 15], 18) ^ (w[i - 15] >>> 3);
+            var s1 = rotate(w[i - 2], 17) ^ rotate(w[i - 2], 19) ^ (w[i - 2] >>> 10);
+            w[i] = (w[i - 16] + s0 + w[i - 7] + s1) | 0;
+        }
+
+        var s = this.state;
+        var a = s[0], b = s[1], c = s[2], d = s[3], e = s[4], f = s[5], g = s[6], h = s[7];
+        for (i = 0; i < 64; i++) {
+            var t1 = (h + (rotate(e, 6) ^ rotate(e, 11) ^ rotate(e, 25)) + ((e & f) ^ (~e & g)) + K[i] + w[i]) | 0;
+            var t2 = ((rotate(a, 2) ^ rotate(a, 13) ^ rotate(a, 22)) + ((a & b) ^ (a & c) ^ (b & c))) | 0;
+            h = g;
+            g = f;
+            f = e;
+            e = (d + t1) | 0;
+            d = c;
+            c = b;
+            b = a;
+            a = (t1 + t2) | 0;
+        }
+        s[0] += a;
+        s[1] += b;
+        s[2] += c;
+        s[3] += d;
+        s[4] += e;
+        s[5] += f;
+        s[6] += g;
+        s[7] += h;
+    };
+
+    // Adds an ArrayBuffer or Uint8Array to the data hashed
+    Sha256.prototype.update = function (data) {
+        var bytes = data instanceof Uint8Array ? data : new Uint8Array(data);
+        var i = 0;
+        this.length += bytes.length;
+        if (this.bufferLength) {
+            i = Math.min(64 - this.bufferLength, bytes.length);
+            this.buffer.set(bytes.subarray(0, i), this.bufferLength);
+            this.bufferLength += i;
+            if (this.bufferLength < 64) {
+                return this;
+            }
+            this.compress(this.buffer, 0);
+            this.bufferLength = 0;
+        }
+        for (; i + 64 <= bytes.length; i += 64) {
+            this.compress(bytes, i);
+        }
+        this.buffer.set(bytes.subarray(i), 0);
+        this.bufferLength = bytes.length - i;
+        return this;
+    };
+
+    Sha256.prototype.copy = function () {
+        var copy = new Sha256();
+        copy.state.set(this.state);
+        copy.buffer.set(this.buffer);
+        copy.bufferLength = this.bufferLength;
+        copy.length = this.length;
+        return copy;
+    };
+
+    // Returns the hash of the data added so far in hexadecimal; more data can still be added
+    Sha256.prototype.hexDigest = function () {
+        var final = this.copy();
+        var bits = this.length * 8;
+        var padLength = (this.bufferLength < 56 ? 56 : 120) - this.bufferLength;
+        var padding = new Uint8Array(padLength + 8);
+        var view = new DataView(padding.buffer);
+        padding[0] = 0x80;
+        view.setUint32(padLength, Math.floor(bits / 0x100000000));
+        view.setUint32(padLength + 4, bits % 0x100000000);
+        final.update(padding);
+        return Array.from(final.state, function (word) { return word.toString(16).padStart(8, "0"); }).join("");
+    };
+
+    window.Sha256 = Sha256;
+})();